@@ -1,109 +1,241 @@
 import pandas as pd
 import numpy as np
+from itertools import islice
 
-def top5(res):
+
+def to_frame(rows, columns, chunk_size=10000):
     """
-    Анализирует входящие данные и выбирает топ-5 клиентов по количеству сделанных ими заказов.
+    Формирует DataFrame из строк данных, считывая их порциями.
+
+    Позволяет строить датафрейм из итератора строк (например, из потокового
+    курсора базы данных), не создавая промежуточный список всех строк.
+
+    Parameters
+    ----------
+    rows : iterable
+        Список или итератор кортежей с данными.
+    columns : list
+        Наименования столбцов.
+    chunk_size : int, optional
+        Количество строк в одной порции.
+
+    Returns
+    -------
+    pd.DataFrame
+        DataFrame с переданными данными.
+    """
+    iterator = iter(rows)
+    chunks = []
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            break
+        chunks.append(pd.DataFrame(chunk, columns=columns))
+    if not chunks:
+        return pd.DataFrame(columns=columns)
+    if len(chunks) == 1:
+        return chunks[0]
+    return pd.concat(chunks, ignore_index=True)
+
+
+# Метрики рейтинга покупателей: имя метрики -> наименование столбца результата
+TOP_METRIC_COLUMNS = {
+    'orders': 'number_of_orders',
+    'revenue': 'revenue',
+}
+
+
+def top5(res, k=5, metric='orders'):
+    """
+    Анализирует входящие данные и выбирает топ-k клиентов по количеству сделанных ими заказов
+    или по сумме заказов.
+
+    Полные таблицы клиентов и заказов обрабатываются в pandas; для отображения графика
+    используется top_k, получающий уже агрегированные строки из базы данных.
 
     Parameters
     ----------
     res : list
-        Входящие данные из базы данных. Представляют собой список кортежей с двумя частями:
+        Входящие данные из базы данных. Представляют собой список кортежей с двумя частями
+        (строки могут передаваться списком или итератором):
         - res[0]: кортеж (список клиентов, список заголовков);
         - res[1]: кортеж (список заказов, список заголовков).
+    k : int, optional
+        Количество клиентов в рейтинге.
+    metric : str, optional
+        Метрика из TOP_METRIC_COLUMNS: 'orders' — число заказов, 'revenue' — сумма заказов.
 
     Returns
     -------
     pd.DataFrame
-        DataFrame с именем клиента и числом заказов, упорядоченный по количеству заказов в обратном порядке.
+        DataFrame с именем клиента и значением метрики, упорядоченный по значению в обратном порядке.
+
+    Raises
+    ------
+    ValueError
+        Если метрика не поддерживается.
 
     Notes
     -----
     Используется объединение двух датафреймов (клиентов и заказов) для определения частоты заказов.
     """
+    if metric not in TOP_METRIC_COLUMNS:
+        raise ValueError(f"Неизвестная метрика: {metric}")
+    column = TOP_METRIC_COLUMNS[metric]
+
     # Формируем датафреймы из полученных данных
-    df_customers = pd.DataFrame(res[0][0], columns=res[0][1])
-    df_orders = pd.DataFrame(res[1][0], columns=res[1][1])
+    df_customers = to_frame(res[0][0], res[0][1])
+    df_orders = to_frame(res[1][0], res[1][1])
 
     # Объединяем заказы и клиентов по внешнему ключу
     df = df_orders.merge(df_customers, left_on='customer_id', right_on='id', how='left')
 
-    # Группа по имени клиента и подсчёт числа заказов
-    top_customers = df.groupby('name')['id_x'].count().reset_index().rename(columns={'id_x': 'number_of_orders'})
+    # Группа по имени клиента и подсчёт числа заказов или суммы заказов
+    if metric == 'orders':
+        top_customers = df.groupby('name')['id_x'].count().reset_index().rename(columns={'id_x': column})
+    else:
+        top_customers = df.groupby('name')['total_amount'].sum().reset_index().rename(columns={'total_amount': column})
 
-    # Отбираем пять лучших клиентов и сортируем по количеству заказов
-    top_customers = top_customers.nlargest(5, 'number_of_orders')
-    top_customers.sort_values(by='number_of_orders', ascending=False, inplace=True)
+    # Отбираем лучших клиентов и сортируем по значению метрики
+    top_customers = top_customers.nlargest(k, column)
+    top_customers.sort_values(by=column, ascending=False, inplace=True)
 
     return top_customers
 
 
-def orders_per_day(res):
+def top_k(rows, metric='orders'):
+    """
+    Формирует DataFrame рейтинга клиентов из строк, агрегированных в базе данных.
+
+    Parameters
+    ----------
+    rows : list
+        Список кортежей (имя клиента, значение метрики), упорядоченный по убыванию значения.
+    metric : str, optional
+        Метрика из TOP_METRIC_COLUMNS, по которой построен рейтинг.
+
+    Returns
+    -------
+    pd.DataFrame
+        DataFrame со столбцами 'name' и столбцом метрики (как у top5).
     """
-    Обрабатывает поступающие данные и формирует отчет по количеству заказов в разные дни.
+    return pd.DataFrame(rows, columns=['name', TOP_METRIC_COLUMNS[metric]])
+
+
+# Интервалы группировки заказов по датам: имя интервала -> период pandas
+DATE_BUCKET_PERIODS = {
+    'day': 'D',
+    # Недели с понедельника по воскресенье
+    'week': 'W-SUN',
+    'month': 'M',
+}
+
+
+def orders_per_day(res, bucket='day', date_from=None, date_to=None):
+    """
+    Обрабатывает поступающие данные и формирует отчет по количеству заказов в разные дни
+    (недели, месяцы).
+
+    Полная таблица заказов обрабатывается в pandas; для отображения графика используется
+    order_counts, получающий уже сгруппированные строки из базы данных.
 
     Parameters
     ----------
     res : tuple
-        Входящий кортеж с одним элементом: список заказов и список заголовков.
+        Входящий кортеж с одним элементом: список (или итератор) заказов и список заголовков.
+    bucket : str, optional
+        Интервал группировки из DATE_BUCKET_PERIODS: 'day', 'week' или 'month'.
+    date_from : datetime.date, optional
+        Первый день периода (включительно).
+    date_to : datetime.date, optional
+        Последний день периода (включительно).
 
     Returns
     -------
     pd.DataFrame
-        DataFrame с двумя колонками: дата и количество заказов за день.
+        DataFrame с двумя колонками: дата начала интервала и количество заказов за интервал.
 
     Notes
     -----
     Данные объединяются по нормированной дате (без учета времени суток), что позволяет считать общее количество заказов по дням.
     """
     # Формируем датафрейм из входящих данных
-    df_orders = pd.DataFrame(res[0], columns=res[1])
+    df_orders = to_frame(res[0], res[1])
 
-    # Преобразуем даты в нужный формат
-    df_orders['date_created'] = df_orders['date_created'].apply(lambda x: x.split('.')[0])
-    df_orders['date_created'] = pd.to_datetime(df_orders['date_created'], format='%Y-%m-%d %H:%M:%S')
+    # Преобразуем даты векторно: дробная часть секунд отбрасывается срезом строки
+    dates = pd.to_datetime(df_orders['date_created'].astype(str).str.slice(0, 19), format='%Y-%m-%d %H:%M:%S')
 
-    # Группируем по нормализованной дате и считаем количество заказов
-    orders_p_day = df_orders.groupby(df_orders['date_created'].dt.normalize()).size().reset_index(name='counts')
+    # Оставляем заказы указанного периода
+    if date_from is not None:
+        dates = dates[dates >= pd.Timestamp(date_from)]
+    if date_to is not None:
+        dates = dates[dates < pd.Timestamp(date_to) + pd.Timedelta(days=1)]
+
+    # Группируем по началу интервала и считаем количество заказов
+    periods = dates.dt.to_period(DATE_BUCKET_PERIODS[bucket]).dt.start_time.rename('date_created')
+    orders_p_day = periods.groupby(periods).size().reset_index(name='counts')
 
     # Преобразуем формат даты для удобочитаемости
     orders_p_day['date_created'] = orders_p_day['date_created'].dt.strftime('%d-%m-%Y')
 
-    # Чистим данные от возможных пустых значений
-    orders_p_day = orders_p_day.query('counts.notnull() & counts != ""')
-
     return orders_p_day
 
 
-def client_connections(res):
+def order_counts(rows):
+    """
+    Формирует DataFrame количества заказов из строк, сгруппированных в базе данных.
+
+    Parameters
+    ----------
+    rows : list
+        Список кортежей (дата начала интервала в формате ГГГГ-ММ-ДД, количество заказов).
+
+    Returns
+    -------
+    pd.DataFrame
+        DataFrame с колонками 'date_created' и 'counts' (как у orders_per_day).
+    """
+    df = pd.DataFrame(rows, columns=['date_created', 'counts'])
+    df['date_created'] = pd.to_datetime(df['date_created'], format='%Y-%m-%d').dt.strftime('%d-%m-%Y')
+    return df
+
+
+def client_connections(res, min_weight=0, top_k=None, max_nodes=None):
     """
     Анализирует данные о клиентах и продуктах, формируя рёбра графа для визуализации взаимодействия клиентов по общим товарам.
 
     Parameters
     ----------
     res : list
-        Входящие данные из базы данных в виде четырёх кортежей:
+        Входящие данные из базы данных в виде четырёх кортежей (строки могут передаваться списком или итератором):
         - res[0]: кортеж (список клиентов, список заголовков);
         - res[1]: кортеж (список продуктов, список заголовков);
         - res[2]: кортеж (список заказов, список заголовков);
         - res[3]: кортеж (список позиций заказов, список заголовков).
+    min_weight : float, optional
+        Минимальный вес ребра.
+    top_k : int, optional
+        Число сильнейших соседей, сохраняемых для каждого клиента.
+    max_nodes : int, optional
+        Максимальное число вершин графа (по убыванию степени).
 
     Returns
     -------
     list
         Список рёбер графа в виде кортежей (node1, node2, weight), где:
-        - node1 и node2 — имена клиентов;
+        - node1 и node2 — имена клиентов, node1 < node2 (каждая пара встречается один раз);
         - weight — количество общих товаров.
 
     Notes
     -----
     Данный метод объединяет различные сущности (клиенты, продукты, позиции заказов) и создаёт матрицу сходства клиентов по общим покупкам.
+    Матрица смежности вычисляется в разреженном виде функцией co_purchase_edges.
     """
     # Создаём датафреймы из входящих данных
-    df_customers = pd.DataFrame(res[0][0], columns=res[0][1])
-    df_products = pd.DataFrame(res[1][0], columns=res[1][1])
-    df_orders = pd.DataFrame(res[2][0], columns=res[2][1])
-    df_order_items = pd.DataFrame(res[3][0], columns=res[3][1])
+    df_customers = to_frame(res[0][0], res[0][1])
+    df_products = to_frame(res[1][0], res[1][1])
+    df_orders = to_frame(res[2][0], res[2][1])
+    df_order_items = to_frame(res[3][0], res[3][1])
 
     # Последовательное соединение данных для анализа общих товаров
     merged_df = df_orders.merge(df_customers, left_on='customer_id', right_on='id', how='left',
@@ -112,20 +244,151 @@ def client_connections(res):
     final_df = merged_df2.merge(df_products, left_on='product_id', right_on='id', how='inner',
                               suffixes=('_customer', '_product'))[['name_customer', 'name_product']]
 
-    # Определяем частоту совместного приобретения товаров разными клиентами
+    # Определяем частоту приобретения товаров клиентами: разреженная матрица клиент × товар в виде троек
     client_conn = final_df.groupby(['name_customer', 'name_product']).size().reset_index(name='common_orders')
-    client_pairs = client_conn.pivot(index='name_customer', columns='name_product', values='common_orders').fillna(0)
+    client_conn.columns = ['customer', 'product', 'counts']
+
+    return co_purchase_edges(client_conn, min_weight, top_k, max_nodes)
+
+
+# Наибольшее число строк соединения троек по товару, обрабатываемых за один шаг в co_purchase_edges
+PAIR_CHUNK_SIZE = 1_000_000
+
+
+def _product_pair_chunks(triples, chunk_size):
+    """
+    Соединяет тройки покупок по товару частями не больше chunk_size строк.
+
+    Товары берутся подряд, пока сумма квадратов числа их покупателей не превысит chunk_size;
+    тройки товара, у которого покупателей больше, соединяются со всеми покупателями этого
+    товара блоками по chunk_size // n строк.
+
+    Yields
+    ------
+    pd.DataFrame
+        Часть соединения со столбцами 'customer_src', 'customer_dest', 'counts_src' и 'counts_dest'.
+    """
+    triples = triples.sort_values('product', kind='stable', ignore_index=True)
+    sizes = triples.groupby('product', sort=True).size().to_numpy()
+    ends = np.cumsum(sizes)
+    start = batch_start = batch_pairs = 0
+    for size, end in zip(sizes.tolist(), ends.tolist()):
+        if batch_pairs + size * size > chunk_size and batch_pairs:
+            batch = triples.iloc[batch_start:start]
+            yield batch.merge(batch, on='product', suffixes=('_src', '_dest'))
+            batch_start, batch_pairs = start, 0
+        if size * size > chunk_size:
+            # Популярный товар: соединение блоков его покупателей со всеми покупателями
+            group = triples.iloc[start:end]
+            step = max(1, chunk_size // size)
+            for block_start in range(0, size, step):
+                block = group.iloc[block_start:block_start + step]
+                yield block.merge(group, on='product', suffixes=('_src', '_dest'))
+            batch_start = end
+        else:
+            batch_pairs += size * size
+        start = end
+    if batch_start < start:
+        batch = triples.iloc[batch_start:start]
+        yield batch.merge(batch, on='product', suffixes=('_src', '_dest'))
+
+
+def _sum_pair_weights(keys, weights):
+    """
+    Суммирует веса пар клиентов с одинаковыми ключами.
+    """
+    keys, inverse = np.unique(keys, return_inverse=True)
+    return keys, np.bincount(inverse, weights=weights, minlength=len(keys))
+
+
+def co_purchase_edges(purchases, min_weight=0, top_k=None, max_nodes=None, chunk_size=PAIR_CHUNK_SIZE):
+    """
+    Формирует рёбра графа связей клиентов по разреженной матрице покупок клиент × товар.
+
+    Матрица смежности A·Aᵀ вычисляется без построения плотных матриц: тройки соединяются
+    по товару, после чего веса пар клиентов суммируются векторно через numpy. Соединение
+    выполняется частями не больше chunk_size строк (товар с n покупателями даёт n² строк,
+    поэтому покупатели популярного товара обрабатываются блоками), а веса пар суммируются
+    после каждой части. Память ограничена размером части и числом различных пар клиентов,
+    а не суммой квадратов числа покупателей товаров.
+
+    Рёбра прореживаются по порядку: порог веса, top_k сильнейших соседей, ограничение числа вершин.
+
+    Parameters
+    ----------
+    purchases : list or pd.DataFrame
+        Тройки (имя клиента, наименование товара, количество позиций) — ненулевые элементы матрицы;
+        у датафрейма столбцы 'customer', 'product' и 'counts'.
+    min_weight : float, optional
+        Минимальный вес ребра; более слабые связи отбрасываются.
+    top_k : int, optional
+        Для каждого клиента сохраняются только top_k рёбер с наибольшим весом
+        (ребро остаётся, если оно входит в top_k хотя бы одного из концов).
+    max_nodes : int, optional
+        Максимальное число вершин графа: сохраняются вершины с наибольшей степенью
+        и рёбра между ними.
+    chunk_size : int, optional
+        Наибольшее число строк соединения по товару, обрабатываемых за один шаг.
+
+    Returns
+    -------
+    list
+        Список рёбер графа в виде кортежей (node1, node2, weight), где node1 < node2,
+        упорядоченный по именам клиентов; weight — число с плавающей точкой.
+    """
+    df = pd.DataFrame(purchases, columns=['customer', 'product', 'counts'])
+    # Имена заменяются целочисленными кодами; сортировка кодов совпадает с сортировкой имён
+    customer_codes, customers = pd.factorize(df['customer'], sort=True)
+    product_codes, _ = pd.factorize(df['product'])
+    triples = pd.DataFrame({'customer': customer_codes, 'product': product_codes,
+                            'counts': df['counts'].to_numpy(dtype=float)})
+
+    # Произведение матрицы на транспонированную: соединение троек по товару частями
+    size = len(customers)
+    keys, weights = [np.empty(0, dtype=np.int64)], [np.empty(0)]
+    pending = 0
+    for pairs in _product_pair_chunks(triples, chunk_size):
+        src = pairs['customer_src'].to_numpy(dtype=np.int64)
+        dest = pairs['customer_dest'].to_numpy(dtype=np.int64)
+        pair_weights = pairs['counts_src'].to_numpy() * pairs['counts_dest'].to_numpy()
+        mask = src < dest  # Матрица симметрична: оставляем по одному ребру на пару, без само-связей
+        # Суммируем веса по парам клиентов, закодированным одним числом
+        chunk_keys, chunk_weights = _sum_pair_weights(src[mask] * size + dest[mask], pair_weights[mask])
+        keys.append(chunk_keys)
+        weights.append(chunk_weights)
+        pending += len(chunk_keys)
+        # Суммы частей объединяются, когда их становится больше уже объединённых пар,
+        # поэтому каждая пара пересуммируется лишь логарифмическое число раз
+        if pending > max(chunk_size, len(keys[0])):
+            merged_keys, merged_weights = _sum_pair_weights(np.concatenate(keys), np.concatenate(weights))
+            keys, weights, pending = [merged_keys], [merged_weights], 0
+    keys, weights = _sum_pair_weights(np.concatenate(keys), np.concatenate(weights))
+    src, dest = keys // size, keys % size
+
+    # Порог веса
+    keep = weights >= min_weight
+    src, dest, weights = src[keep], dest[keep], weights[keep]
+
+    # Сильнейшие соседи: ранг ребра среди рёбер каждого из его концов
+    if top_k is not None and len(weights):
+        directed = pd.DataFrame({'node': np.concatenate([src, dest]),
+                                 'weight': np.concatenate([weights, weights]),
+                                 'edge': np.tile(np.arange(len(weights)), 2)})
+        directed.sort_values(['node', 'weight', 'edge'], ascending=[True, False, True], inplace=True)
+        ranks = directed.groupby('node').cumcount().to_numpy()
+        keep = np.zeros(len(weights), dtype=bool)
+        keep[directed['edge'].to_numpy()[ranks < top_k]] = True
+        src, dest, weights = src[keep], dest[keep], weights[keep]
 
-    # Матрица смежности для графического представления связей
-    adjacency_matrix = client_pairs.dot(client_pairs.T)
-    np.fill_diagonal(adjacency_matrix.values, 0)  # Убираем само-связи
+    # Ограничение числа вершин: вершины с наибольшей степенью, при равенстве — по порядку имён
+    if max_nodes is not None:
+        degree = np.bincount(np.concatenate([src, dest]), minlength=size)
+        order = np.lexsort((np.arange(size), -degree))
+        selected = np.zeros(size, dtype=bool)
+        selected[order[:max_nodes]] = True
+        keep = selected[src] & selected[dest]
+        src, dest, weights = src[keep], dest[keep], weights[keep]
 
     # Генерируем рёбра графа
-    clients = adjacency_matrix.index
-    edges = []
-    for src in clients:
-        for dest in clients:
-            if adjacency_matrix.loc[src, dest] > 0:
-                edges.append((src, dest, adjacency_matrix.loc[src, dest]))
-
-    return edges
\ No newline at end of file
+    names = np.asarray(customers, dtype=object)
+    return list(zip(names[src].tolist(), names[dest].tolist(), weights.tolist()))
@@ -0,0 +1,290 @@
+"""
+Кэш результатов запросов к базе данных.
+
+Результаты функций чтения модуля db хранятся в LRU-кэше, ключом служат функция и её аргументы.
+Каждая запись помнит поколения таблиц, из которых она прочитана; функции записи увеличивают
+поколения изменённых таблиц, после чего устаревшие записи перестают выдаваться.
+Изменения, сделанные другими процессами, обнаруживаются по PRAGMA data_version, которая
+проверяется не чаще одного раза за DATA_VERSION_CHECK_INTERVAL в каждом потоке.
+"""
+
+import functools
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+# Минимальный интервал (в секундах) между проверками PRAGMA data_version в одном потоке:
+# обращения к кэшу в рамках одного действия пользователя обходятся без запросов к базе данных
+DATA_VERSION_CHECK_INTERVAL = 0.1
+
+
+class CacheInfo(NamedTuple):
+    """
+    Статистика работы кэша запросов.
+
+    Attributes
+    ----------
+    hits : int
+        Количество обращений, обслуженных из кэша.
+    misses : int
+        Количество обращений, потребовавших запроса к базе данных.
+    invalidations : int
+        Количество изменений таблиц, сделавших записи кэша устаревшими.
+    maxsize : int
+        Максимальное количество записей в кэше.
+    currsize : int
+        Текущее количество записей в кэше.
+    """
+    hits: int
+    misses: int
+    invalidations: int
+    maxsize: int
+    currsize: int
+
+
+def copy_result(value):
+    """
+    Копирует результат запроса, чтобы изменения у вызывающего кода не затрагивали кэш.
+
+    Списки, словари и объекты моделей копируются, неизменяемые значения возвращаются как есть.
+
+    Parameters
+    ----------
+    value : object
+        Результат функции чтения.
+
+    Returns
+    -------
+    object
+        Независимая копия результата.
+    """
+    if isinstance(value, list):
+        return [copy_result(item) for item in value]
+    if isinstance(value, dict):
+        return {key: copy_result(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        items = [copy_result(item) for item in value]
+        return value._make(items) if hasattr(value, '_make') else tuple(items)
+    if hasattr(type(value), '__dataclass_fields__'):
+        # Копирование через __dict__ заметно быстрее copy.copy для объектов моделей
+        result = object.__new__(type(value))
+        result.__dict__ = {key: copy_result(item) if isinstance(item, (list, dict)) else item
+                           for key, item in value.__dict__.items()}
+        return result
+    return value
+
+
+def _freeze(value):
+    """
+    Приводит аргумент функции к хешируемому виду для ключа кэша.
+
+    Parameters
+    ----------
+    value : object
+        Аргумент функции.
+
+    Returns
+    -------
+    object
+        Хешируемое представление аргумента.
+
+    Raises
+    ------
+    TypeError
+        Если аргумент нельзя использовать в ключе (например, итератор).
+    """
+    if isinstance(value, list):
+        return ('list', tuple(_freeze(item) for item in value))
+    if isinstance(value, (set, frozenset)):
+        return ('set', frozenset(value))
+    if hasattr(value, '__next__'):
+        # Итератор расходуется при вызове, повторить такой запрос из кэша нельзя
+        raise TypeError("Итератор не может быть частью ключа кэша")
+    hash(value)
+    return value
+
+
+class QueryCache:
+    """
+    LRU-кэш результатов функций чтения с инвалидацией по поколениям таблиц.
+
+    Attributes
+    ----------
+    maxsize : int
+        Максимальное количество записей в кэше.
+    enabled : bool
+        Признак того, что кэш используется (при False функции всегда обращаются к базе данных).
+    check_interval : float
+        Минимальный интервал (в секундах) между проверками PRAGMA data_version в одном потоке.
+    """
+
+    def __init__(self, maxsize=256, connection_getter=None, check_interval=DATA_VERSION_CHECK_INTERVAL):
+        """
+        Parameters
+        ----------
+        maxsize : int, optional
+            Максимальное количество записей в кэше.
+        connection_getter : callable, optional
+            Функция, возвращающая соединение текущего потока. Если задана,
+            перед обращением к кэшу проверяется PRAGMA data_version.
+        check_interval : float, optional
+            Минимальный интервал (в секундах) между проверками PRAGMA data_version в одном потоке.
+            Изменения других процессов становятся видны не позже чем через этот интервал.
+        """
+        self.maxsize = maxsize
+        self.enabled = True
+        self.check_interval = check_interval
+        self._connection_getter = connection_getter
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def cached(self, *tables):
+        """
+        Декоратор функции чтения, результат которой зависит от указанных таблиц.
+
+        Parameters
+        ----------
+        *tables : str
+            Таблицы, из которых читает функция.
+
+        Returns
+        -------
+        callable
+            Декоратор.
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                try:
+                    key = (func.__qualname__, _freeze(args), _freeze(tuple(sorted(kwargs.items()))))
+                except TypeError:
+                    return func(*args, **kwargs)
+                self._check_data_version()
+                with self._lock:
+                    generations = tuple(self._generations.get(table, 0) for table in tables)
+                    entry = self._entries.get(key)
+                    if entry is not None and entry[0] == generations:
+                        self._entries.move_to_end(key)
+                        self._hits += 1
+                        return copy_result(entry[1])
+                    self._misses += 1
+                result = func(*args, **kwargs)
+                with self._lock:
+                    # Если таблицы изменились во время запроса, результат не сохраняется
+                    if generations == tuple(self._generations.get(table, 0) for table in tables):
+                        self._entries[key] = (generations, copy_result(result))
+                        self._entries.move_to_end(key)
+                        while len(self._entries) > self.maxsize:
+                            self._entries.popitem(last=False)
+                return result
+            return wrapper
+        return decorator
+
+    def invalidates(self, *tables, table_arg=None):
+        """
+        Декоратор функции записи, изменяющей указанные таблицы.
+
+        Поколения таблиц увеличиваются после вызова, в том числе если функция завершилась ошибкой.
+
+        Parameters
+        ----------
+        *tables : str
+            Таблицы, которые изменяет функция.
+        table_arg : str, optional
+            Имя аргумента функции, содержащего название изменяемой таблицы.
+
+        Returns
+        -------
+        callable
+            Декоратор.
+        """
+        def decorator(func):
+            signature = inspect.signature(func) if table_arg is not None else None
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                changed = list(tables)
+                if signature is not None:
+                    changed.append(signature.bind(*args, **kwargs).arguments[table_arg])
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.invalidate(*changed)
+            return wrapper
+        return decorator
+
+    def invalidate(self, *tables):
+        """
+        Отмечает таблицы изменёнными, делая устаревшими зависящие от них записи.
+
+        Parameters
+        ----------
+        *tables : str
+            Изменённые таблицы.
+        """
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+            self._invalidations += 1
+
+    def clear(self):
+        """
+        Удаляет все записи кэша и забывает наблюдавшиеся версии данных.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._local = threading.local()
+
+    def recheck(self):
+        """
+        Проверяет PRAGMA data_version при следующем обращении к кэшу в текущем потоке,
+        не дожидаясь окончания check_interval.
+        """
+        self._local.checked_at = None
+
+    def cache_info(self):
+        """
+        Возвращает статистику работы кэша.
+
+        Returns
+        -------
+        CacheInfo
+            Количество попаданий, промахов, инвалидаций и текущий размер кэша.
+        """
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self._invalidations, self.maxsize, len(self._entries))
+
+    def _check_data_version(self):
+        """
+        Сбрасывает кэш, если база данных была изменена через другое соединение.
+
+        PRAGMA data_version меняется только при фиксации транзакций другими соединениями,
+        поэтому собственные записи текущего соединения её не затрагивают (их учитывают
+        поколения таблиц). Версия запрашивается не чаще одного раза за check_interval.
+        """
+        if self._connection_getter is None:
+            return
+        conn = self._connection_getter()
+        local = self._local
+        now = time.monotonic()
+        known = getattr(local, 'conn', None) is conn
+        if known and local.checked_at is not None and now - local.checked_at < self.check_interval:
+            return
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        local.checked_at = now
+        if known and local.version == version:
+            return
+        # Для нового соединения прежние изменения неизвестны, поэтому кэш также сбрасывается
+        with self._lock:
+            self._entries.clear()
+            self._invalidations += 1
+        local.conn, local.version = conn, version
@@ -0,0 +1,228 @@
+"""
+Менеджер соединений с базой данных SQLite.
+
+Хранит по одному долгоживущему соединению на поток, чтобы функции модуля db
+не открывали и не закрывали файл базы данных при каждом запросе.
+"""
+
+import sqlite3
+import threading
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class PragmaProfile:
+    """
+    Набор настроек PRAGMA, применяемых к каждому новому соединению.
+
+    Attributes
+    ----------
+    journal_mode : str
+        Режим журнала (WAL позволяет читать базу во время записи).
+    synchronous : str
+        Уровень синхронизации с диском при фиксации транзакций.
+    cache_size : int
+        Размер страничного кэша (отрицательное значение задаётся в КиБ).
+    mmap_size : int
+        Объём файла базы данных, отображаемого в память (в байтах).
+    temp_store : str
+        Место хранения временных таблиц и индексов.
+    busy_timeout : int
+        Время ожидания (в миллисекундах) снятия блокировки базы данных.
+    """
+    journal_mode: str = "WAL"
+    synchronous: str = "FULL"
+    cache_size: int = -8000
+    mmap_size: int = 0
+    temp_store: str = "DEFAULT"
+    busy_timeout: int = 5000
+
+    def statements(self):
+        """
+        Формирует список выражений PRAGMA для применения к соединению.
+
+        Returns
+        -------
+        list
+            Список строк вида "PRAGMA name = value".
+        """
+        return [
+            f"PRAGMA journal_mode = {self.journal_mode}",
+            f"PRAGMA synchronous = {self.synchronous}",
+            f"PRAGMA cache_size = {self.cache_size}",
+            f"PRAGMA mmap_size = {self.mmap_size}",
+            f"PRAGMA temp_store = {self.temp_store}",
+            f"PRAGMA busy_timeout = {self.busy_timeout}",
+        ]
+
+
+# Предустановленные профили: "durable" — каждая фиксация доходит до диска,
+# "fast" — синхронизация только на контрольных точках WAL, крупный кэш и mmap
+PRAGMA_PROFILES = {
+    "durable": PragmaProfile(),
+    "fast": PragmaProfile(
+        synchronous="NORMAL",
+        cache_size=-64000,
+        mmap_size=256 * 1024 * 1024,
+        temp_store="MEMORY",
+    ),
+}
+
+DEFAULT_PROFILE = "durable"
+
+
+class ConnectionManager:
+    """
+    Менеджер переиспользуемых соединений SQLite (по одному на поток).
+
+    Attributes
+    ----------
+    db_path : str
+        Путь к файлу базы данных.
+    cached_statements : int
+        Размер кэша подготовленных выражений каждого соединения.
+    timeout : float
+        Время ожидания (в секундах) снятия блокировки базы данных.
+    profile : PragmaProfile
+        Настройки PRAGMA, применяемые к каждому новому соединению.
+    factory : type
+        Класс создаваемых соединений (подкласс sqlite3.Connection).
+    """
+
+    def __init__(self, db_path, cached_statements=256, timeout=5.0, profile=DEFAULT_PROFILE,
+                 factory=sqlite3.Connection):
+        """
+        Parameters
+        ----------
+        db_path : str
+            Путь к файлу базы данных.
+        cached_statements : int, optional
+            Размер кэша подготовленных выражений каждого соединения.
+        timeout : float, optional
+            Время ожидания (в секундах) снятия блокировки базы данных.
+        profile : str or PragmaProfile, optional
+            Имя предустановленного профиля из PRAGMA_PROFILES или сам профиль.
+        factory : type, optional
+            Класс создаваемых соединений (например, инструментированное соединение).
+        """
+        self.db_path = db_path
+        self.cached_statements = cached_statements
+        self.timeout = timeout
+        self.profile = resolve_profile(profile)
+        self.factory = factory
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        self._is_open = False
+
+    @property
+    def is_open(self):
+        """
+        Признак того, что менеджер открыт и выдаёт соединения.
+        """
+        return self._is_open
+
+    def open(self, db_path=None, profile=None):
+        """
+        Открывает менеджер соединений.
+
+        Если менеджер уже открыт для другого файла или с другим профилем,
+        существующие соединения закрываются.
+
+        Parameters
+        ----------
+        db_path : str, optional
+            Путь к файлу базы данных. По умолчанию используется текущий путь.
+        profile : str or PragmaProfile, optional
+            Профиль PRAGMA. По умолчанию сохраняется текущий профиль.
+        """
+        if db_path is not None and db_path != self.db_path:
+            self.close()
+            self.db_path = db_path
+        if profile is not None:
+            profile = resolve_profile(profile)
+            if profile != self.profile:
+                self.close()
+                self.profile = profile
+        self._is_open = True
+
+    def get(self):
+        """
+        Возвращает соединение текущего потока, создавая его при первом обращении.
+
+        Returns
+        -------
+        sqlite3.Connection
+            Соединение с базой данных, закреплённое за текущим потоком.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            if not self._is_open:
+                self.open()
+            conn = self._connect()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        """
+        Закрывает все соединения, открытые менеджером во всех потоках.
+        """
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        # Старые объекты соединений в thread-local хранилищах больше недействительны
+        self._local = threading.local()
+        self._is_open = False
+
+    def _connect(self):
+        """
+        Создаёт новое соединение с базой данных.
+
+        Returns
+        -------
+        sqlite3.Connection
+            Новое соединение.
+        """
+        # check_same_thread=False нужен только для закрытия соединений из главного потока,
+        # сами соединения используются исключительно потоком-владельцем
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            cached_statements=self.cached_statements,
+            check_same_thread=False,
+            factory=self.factory
+        )
+        for statement in self.profile.statements():
+            conn.execute(statement)
+        return conn
+
+
+def resolve_profile(profile):
+    """
+    Возвращает профиль PRAGMA по имени или сам переданный профиль.
+
+    Parameters
+    ----------
+    profile : str or PragmaProfile
+        Имя профиля из PRAGMA_PROFILES или объект PragmaProfile.
+
+    Returns
+    -------
+    PragmaProfile
+        Профиль настроек PRAGMA.
+
+    Raises
+    ------
+    ValueError
+        Если профиль с указанным именем не существует.
+    """
+    if isinstance(profile, PragmaProfile):
+        return profile
+    try:
+        return PRAGMA_PROFILES[profile]
+    except KeyError:
+        raise ValueError(f"Неизвестный профиль PRAGMA: {profile}. "
+                         f"Доступные профили: {', '.join(PRAGMA_PROFILES)}")
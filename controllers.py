@@ -3,15 +3,22 @@ from datetime import datetime
 from db import (
     insert_customer, select_customers, delete_customer, update_customer,
     insert_product, select_products, delete_product, update_product,
-    insert_order, select_orders, delete_order, delete_order_list, insert_order_item,
+    insert_order, select_orders, select_order_rows, seek_order_rows, count_orders,
+    delete_order, delete_order_list, insert_order_item,
     find_customer_by_id, find_product_by_id, find_order_by_id, find_order_list_by_id,
+    find_customers_by_ids, find_products_by_ids, find_orders_by_ids, find_products_by_names, insert_order_items,
     select_orders_by_customer_id, select_orders_by_product_id, update_order,
-    select_data, truncate_table, bulk_insert_data, create_tables, select_all_orders_with_items,
-    select_analysis_data
+    select_data, bulk_insert_data, bulk_insert_many, merge_data, merge_orders_details, create_tables, select_all_orders_with_items,
+    select_analysis_data, iter_data, iter_analysis_data, iter_all_orders_with_items, open_connections, close_connections, checkout_order, InsufficientStockError,
+    fulltext_search_customers, fulltext_search_products, fulltext_search_orders, FULLTEXT_MIN_LENGTH, DB_PATH,
+    select_top_customers, select_order_counts, select_customer_purchases, query_cache
 )
+from connection import DEFAULT_PROFILE
+from store import EntityStore
+from instrumentation import instrumentation
 import re
 import csv, json
-from analysis import top5, orders_per_day, client_connections
+from analysis import top5, top_k, orders_per_day, order_counts, client_connections, co_purchase_edges
 
 class DatetimeEncoder(json.JSONEncoder):
     """
@@ -22,11 +29,105 @@ class DatetimeEncoder(json.JSONEncoder):
             return obj.isoformat()
         return super().default(obj)
 
+def dump_json_stream(items, file, **kwargs):
+    """
+    Записывает элементы итератора в файл как JSON-массив, не собирая их в список.
+
+    Результат совпадает с json.dump(list(items), file, indent=4, ...).
+
+    Parameters
+    ----------
+    items : iterable
+        Сериализуемые элементы массива.
+    file : file object
+        Файл, открытый на запись.
+    **kwargs
+        Дополнительные параметры json.dumps (cls, ensure_ascii и т.п.).
+    """
+    kwargs.setdefault('indent', 4)
+    indent = ' ' * kwargs['indent']
+    empty = True
+    for item in items:
+        file.write('[\n' if empty else ',\n')
+        empty = False
+        # Сдвигаем каждый элемент на один уровень вложенности внутрь массива
+        file.write('\n'.join(indent + line for line in json.dumps(item, **kwargs).splitlines()))
+    file.write('[]' if empty else '\n]')
+
+def init_analysis_worker(db_path, db_profile=DEFAULT_PROFILE, instrumentation_settings=None):
+    """
+    Открывает базу данных в процессе пула аналитики (инициализатор пула процессов).
+
+    Процесс пула запускается заново (spawn) и не наследует настройки главного процесса,
+    поэтому профиль SQLite и настройки журнала медленных запросов передаются явно.
+
+    Parameters
+    ----------
+    db_path : str
+        Путь к файлу базы данных.
+    db_profile : str, optional
+        Профиль настроек SQLite ("durable" или "fast").
+    instrumentation_settings : dict, optional
+        Настройки инструментирования запросов главного процесса (QueryInstrumentation.settings).
+    """
+    if instrumentation_settings is not None:
+        instrumentation.apply_settings(instrumentation_settings)
+    open_connections(db_path, profile=db_profile)
+
+
+def compute_analysis(top_metric, bucket, date_from, date_to, graph_options):
+    """
+    Вычисляет данные всех графиков вкладки аналитики.
+
+    Функция определена на уровне модуля, чтобы её можно было выполнить в процессе
+    пула аналитики (см. tasks.TaskRunner и init_analysis_worker).
+
+    Parameters
+    ----------
+    top_metric : str
+        Метрика рейтинга покупателей: 'orders' или 'revenue'.
+    bucket : str
+        Интервал группировки заказов: 'day', 'week' или 'month'.
+    date_from : datetime.date or None
+        Первый день периода графика заказов.
+    date_to : datetime.date or None
+        Последний день периода графика заказов.
+    graph_options : dict
+        Параметры прореживания графа связей (min_weight, top_k, max_nodes).
+
+    Returns
+    -------
+    tuple
+        Рейтинг покупателей (pd.DataFrame), количество заказов по интервалам (pd.DataFrame)
+        и рёбра графа связей покупателей (list).
+    """
+    return (top_k(select_top_customers(5, top_metric), top_metric),
+            order_counts(select_order_counts(bucket, date_from, date_to)),
+            compute_connections(graph_options))
+
+
+def compute_connections(graph_options):
+    """
+    Вычисляет рёбра графа связей покупателей (может выполняться в процессе пула аналитики).
+
+    Parameters
+    ----------
+    graph_options : dict
+        Параметры прореживания графа связей (min_weight, top_k, max_nodes).
+
+    Returns
+    -------
+    list
+        Список рёбер графа (имя покупателя, имя другого покупателя, вес).
+    """
+    return co_purchase_edges(select_customer_purchases(), **graph_options)
+
+
 class AppController:
     """
     Контроллер приложения, ответственный за управление данными и координацию взаимодействия различных частей системы.
     """
-    def __init__(self, main_app):
+    def __init__(self, main_app, db_profile=DEFAULT_PROFILE, db_path=DB_PATH, use_entity_store=True):
         """
         Инициализирует контроллер приложения и создаёт таблицы в базе данных.
 
@@ -34,10 +135,51 @@ class AppController:
         ----------
         main_app : object
             Главное приложение, в котором работает контроллер.
+        db_profile : str, optional
+            Профиль настроек SQLite ("durable" или "fast").
+        db_path : str, optional
+            Путь к файлу базы данных.
+        use_entity_store : bool, optional
+            Если True, клиенты и товары читаются из хранилища в памяти, а не из базы данных.
         """
         self.main_app = main_app
+        self.db_path = db_path
+        self.db_profile = db_profile
         self.cart_items = []  # Временное хранилище корзины покупок
+        open_connections(db_path, profile=db_profile)  # Открывает переиспользуемые соединения с базой данных
         create_tables()  # Создает таблицы в базе данных при инициализации контроллера
+        # Клиенты и товары загружаются в память при первом обращении
+        self.store = EntityStore() if use_entity_store else None
+
+    def close(self):
+        """
+        Закрывает соединения с базой данных при завершении работы приложения.
+        """
+        close_connections()
+
+    def get_cache_info(self):
+        """
+        Возвращает статистику кэша запросов к базе данных.
+
+        Returns
+        -------
+        CacheInfo
+            Количество попаданий, промахов, инвалидаций и текущий размер кэша.
+        """
+        return query_cache.cache_info()
+
+    def get_query_stats(self):
+        """
+        Возвращает статистику выполненных запросов к базе данных.
+
+        Returns
+        -------
+        dict
+            Общее количество запросов, количество медленных запросов, статистика по тексту
+            запроса и количество запросов по методам контроллера (для всех запросов —
+            при включённом instrumentation.track_callers, иначе только для медленных).
+        """
+        return instrumentation.summary()
 
     def load_customers(self):
         """
@@ -48,6 +190,8 @@ class AppController:
         list
             Список объектов Customer.
         """
+        if self.store is not None:
+            return self.store.customers()
         return select_customers()
 
     def load_products(self):
@@ -59,6 +203,8 @@ class AppController:
         list
             Список объектов Product.
         """
+        if self.store is not None:
+            return self.store.products()
         return select_products()
 
     def load_orders(self):
@@ -72,31 +218,43 @@ class AppController:
         """
         return select_orders()
 
-    def load_sort_orders(self, sort_params):
+    def seek_orders(self, sort_params, after=None, until=None, skip=0, limit=100):
         """
-        Загружает список заказов, отсортированный по заданным параметрам.
+        Загружает участок отсортированного списка заказов, отсчитанный от известной строки (keyset).
 
         Parameters
         ----------
         sort_params : dict
             Словарь с параметрами сортировки (ключ 'heading' определяет столбец сортировки, ключ '<column>' —
             направление сортировки ('asc' или 'desc')).
+        after : tuple, optional
+            Курсор строки, после которой начинается участок. None — от начала списка.
+        until : tuple, optional
+            Курсор строки, которой заканчивается участок (участок читается назад).
+        skip : int, optional
+            Количество строк, пропускаемых между курсором и участком.
+        limit : int, optional
+            Максимальное число строк участка.
 
         Returns
         -------
-        list
-            Список объектов Order, отсортированный по заданным критериям.
+        tuple
+            Список объектов OrderRow и список курсоров этих строк.
         """
-        orders = select_orders()
         column = sort_params.get("heading", "id")
         direction = sort_params.get(column, "asc")
-        if column == "id":
-            orders.sort(key=lambda x: x.id, reverse=(direction == "desc"))
-        elif column == "date":
-            orders.sort(key=lambda x: x.date_created, reverse=(direction == "desc"))
-        elif column == "amount":
-            orders.sort(key=lambda x: x.total_amount, reverse=(direction == "desc"))
-        return orders
+        return seek_order_rows(order_by=column, direction=direction, after=after, until=until, skip=skip, limit=limit)
+
+    def count_orders(self):
+        """
+        Возвращает количество заказов (для размера полосы прокрутки виртуального списка).
+
+        Returns
+        -------
+        int
+            Количество заказов.
+        """
+        return count_orders()
 
     def search_customers(self, keyword):
         """
@@ -112,7 +270,10 @@ class AppController:
         list
             Список объектов Customer, удовлетворяющих условиям поиска.
         """
-        customers = select_customers()
+        # Полнотекстовый индекс находит подстроки от трёх символов, более короткие ищутся перебором
+        if len(keyword) >= FULLTEXT_MIN_LENGTH:
+            return fulltext_search_customers(keyword)
+        customers = self.load_customers()
         normalized_keyword = keyword.lower()
         filtered_customers = []
         for customer in customers:
@@ -139,7 +300,10 @@ class AppController:
         list
             Список объектов Product, удовлетворяющих условиям поиска.
         """
-        products = select_products()
+        # Полнотекстовый индекс находит подстроки от трёх символов, более короткие ищутся перебором
+        if len(keyword) >= FULLTEXT_MIN_LENGTH:
+            return fulltext_search_products(keyword)
+        products = self.load_products()
         normalized_keyword = keyword.lower()
         filtered_products = []
         for product in products:
@@ -164,17 +328,19 @@ class AppController:
         Returns
         -------
         list
-            Список объектов Order, удовлетворяющих условиям поиска.
+            Список объектов OrderRow, удовлетворяющих условиям поиска.
         """
-        orders = select_orders()
+        # Полнотекстовый индекс находит подстроки от трёх символов, более короткие ищутся перебором
+        if len(keyword) >= FULLTEXT_MIN_LENGTH:
+            return fulltext_search_orders(keyword)
+        orders = select_order_rows()
         normalized_keyword = keyword.lower()
         filtered_orders = []
         for order in orders:
-            customer = find_customer_by_id(order.customer_id)
-            if customer:
+            if order.customer_name is not None:
                 if (
                     normalized_keyword in str(order.id).lower() or
-                    normalized_keyword in customer.name.lower() or
+                    normalized_keyword in order.customer_name.lower() or
                     normalized_keyword in str(order.date_created).lower() or
                     normalized_keyword in order.status.lower() or
                     normalized_keyword in str(order.total_amount).lower()
@@ -196,6 +362,8 @@ class AppController:
         Customer
             Объект Customer, соответствующий данному идентификатору.
         """
+        if self.store is not None:
+            return self.store.get_customer(customer_id)
         return find_customer_by_id(customer_id)
 
     def find_product_by_id(self, product_id):
@@ -212,6 +380,8 @@ class AppController:
         Product
             Объект Product, соответствующий данному идентификатору.
         """
+        if self.store is not None:
+            return self.store.get_product(product_id)
         return find_product_by_id(product_id)
 
     def find_order_by_id(self, order_id):
@@ -230,6 +400,58 @@ class AppController:
         """
         return find_order_by_id(order_id)
 
+    def find_customers_by_ids(self, customer_ids):
+        """
+        Находит клиентов по набору идентификаторов.
+
+        Parameters
+        ----------
+        customer_ids : iterable
+            Идентификаторы клиентов.
+
+        Returns
+        -------
+        dict
+            Словарь {идентификатор: Customer} для найденных клиентов.
+        """
+        if self.store is not None:
+            return self.store.get_customers(customer_ids)
+        return find_customers_by_ids(customer_ids)
+
+    def find_products_by_ids(self, product_ids):
+        """
+        Находит товары по набору идентификаторов.
+
+        Parameters
+        ----------
+        product_ids : iterable
+            Идентификаторы товаров.
+
+        Returns
+        -------
+        dict
+            Словарь {идентификатор: Product} для найденных товаров.
+        """
+        if self.store is not None:
+            return self.store.get_products(product_ids)
+        return find_products_by_ids(product_ids)
+
+    def find_orders_by_ids(self, order_ids):
+        """
+        Находит заказы по набору идентификаторов.
+
+        Parameters
+        ----------
+        order_ids : iterable
+            Идентификаторы заказов.
+
+        Returns
+        -------
+        dict
+            Словарь {идентификатор: Order} для найденных заказов.
+        """
+        return find_orders_by_ids(order_ids)
+
     def find_order_list_by_id(self, order_id):
         """
         Находит состав заказа по его идентификатору.
@@ -267,15 +489,16 @@ class AppController:
             Сообщение об ошибке (при неуспешном выполнении).
         """
         try:
+            # Данные читаются потоково, поэтому таблица целиком в памяти не хранится
             if entity_name == 'orders-details':
-                raw_data = select_all_orders_with_items()
+                headers, raw_data = None, iter_all_orders_with_items()
             else:
-                raw_data = select_data(entity_name)
+                headers, raw_data = iter_data(entity_name)
 
             if format_type.lower() == 'csv':
                 with open(filename, mode='w', newline='', encoding='utf-8-sig') as file:
-                    if isinstance(raw_data, list) and raw_data and isinstance(raw_data[0], dict):
-                        writer = csv.DictWriter(file, fieldnames=raw_data[0].keys())
+                    if headers is not None:
+                        writer = csv.DictWriter(file, fieldnames=headers)
                         writer.writeheader()
                         writer.writerows(raw_data)
                     else:
@@ -291,17 +514,22 @@ class AppController:
                                 ])
             elif format_type.lower() == 'json':
                 with open(filename, mode='w', encoding='utf-8') as file:
-                    json.dump(raw_data, file, cls=DatetimeEncoder, ensure_ascii=False, indent=4)
+                    dump_json_stream(raw_data, file, cls=DatetimeEncoder, ensure_ascii=False, indent=4)
             else:
                 raise ValueError("Формат экспорта не поддерживается.")
             return True, None
         except Exception as e:
             return False, str(e)
 
-    def import_data(self, filename, entity_name, format_type):
+    def import_data(self, filename, entity_name, format_type, mode='replace', delete_missing=False, progress=None):
         """
         Импортирует данные из файла (CSV или JSON) в базу данных.
 
+        В режиме 'replace' содержимое таблицы заменяется данными из файла. В режиме 'merge'
+        записи из файла объединяются с таблицей по идентификатору: новые добавляются,
+        изменённые обновляются, остальные строки не перезаписываются. Записи читаются
+        и вставляются потоково, порциями, поэтому размер файла не ограничен объёмом памяти.
+
         Parameters
         ----------
         filename : str
@@ -310,81 +538,150 @@ class AppController:
             Название сущности (таблицы), в которую импортируются данные.
         format_type : str
             Тип формата импорта ('csv' или 'json').
+        mode : str, optional
+            Режим импорта ('replace' или 'merge').
+        delete_missing : bool, optional
+            В режиме 'merge' удаляет записи, отсутствующие в файле.
+        progress : callable, optional
+            Функция progress(rows_done, rows_per_sec), вызываемая по мере загрузки.
 
         Returns
         -------
         bool
             Результат операции (успех или ошибка).
         str
-            Сообщение об ошибке (при неуспешном выполнении).
+            Сводка изменений в режиме 'merge' или сообщение об ошибке (при неуспешном выполнении).
         """
+        if self.store is not None:
+            # Импорт меняет таблицы целиком, хранилище перезагружается при следующем обращении
+            self.store.invalidate()
         try:
+            if format_type.lower() not in ('csv', 'json'):
+                raise ValueError("Формат импорта не поддерживается.")
+            if mode not in ('replace', 'merge'):
+                raise ValueError(f"Неизвестный режим импорта: {mode}.")
             if entity_name == 'orders-details':
-                truncate_table('orders')
-                truncate_table('order_items')
+                # Источник читается дважды: сначала заказы, затем их позиции
+                orders = (order for order, _ in self.read_orders_details(filename, format_type))
+                items = (item for _, order_items in self.read_orders_details(filename, format_type)
+                         for item in order_items)
+                if mode == 'merge':
+                    counts = merge_orders_details(orders, items, delete_missing=delete_missing, progress=progress)
+                    return True, self.format_merge_counts(counts)
+                bulk_insert_many([('orders', orders), ('order_items', items)], bulk_pragmas=True, progress=progress)
             else:
-                truncate_table(entity_name)
-
-            if format_type.lower() == 'csv':
-                with open(filename, mode='r', newline='', encoding='utf-8-sig') as file:
-                    reader = csv.reader(file)
-                    header = next(reader)  # Пропускаем заголовочную строку
-                    if entity_name == 'orders-details':
-                        all_data = []
-                        for row in reader:
-                            order_id, customer_id, date_created, status, total_amount, items_json = row
-                            parsed_date = datetime.strptime(date_created, '%Y-%m-%d %H:%M:%S')
-                            fixed_items_json = items_json.replace("'", '"')
-                            items = json.loads(fixed_items_json)
-                            order_data = [{
-                                'id': order_id,
-                                'customer_id': customer_id,
-                                'date_created': parsed_date,
-                                'status': status,
-                                'total_amount': total_amount
-                            }]
-                            item_data = [{
-                                'order_id': order_id,
-                                'product_id': item['product_id'],
-                                'quantity': item['quantity']
-                            } for item in items]
-                            all_data.extend(order_data)
-                            all_data.extend(item_data)
-                        bulk_insert_data('orders', [d for d in all_data if 'order_id' not in d])
-                        bulk_insert_data('order_items', [d for d in all_data if 'order_id' in d])
-                    else:
-                        data = [{key: val for key, val in zip(header, row)} for row in reader]
-                        bulk_insert_data(entity_name, data)
-            elif format_type.lower() == 'json':
-                with open(filename, mode='r', encoding='utf-8') as file:
-                    data = json.load(file)
-                    if entity_name == 'orders-details':
-                        all_data = []
-                        for entry in data:
-                            parsed_date = datetime.fromisoformat(entry['date_created'])
-                            order_data = [{
-                                'id': entry['id'],
-                                'customer_id': entry['customer_id'],
-                                'date_created': parsed_date,
-                                'status': entry['status'],
-                                'total_amount': entry['total_amount']
-                            }]
-                            item_data = [{
-                                'order_id': entry['id'],
-                                'product_id': item['product_id'],
-                                'quantity': item['quantity']
-                            } for item in entry['items']]
-                            all_data.extend(order_data)
-                            all_data.extend(item_data)
-                        bulk_insert_data('orders', [d for d in all_data if 'order_id' not in d])
-                        bulk_insert_data('order_items', [d for d in all_data if 'order_id' in d])
-                    else:
-                        bulk_insert_data(entity_name, data)
-            else:
-                raise ValueError("Формат импорта не поддерживается.")
+                records = self.read_records(filename, format_type)
+                if mode == 'merge':
+                    counts = merge_data(entity_name, records, delete_missing=delete_missing, progress=progress)
+                    return True, self.format_merge_counts(counts)
+                bulk_insert_data(entity_name, records, replace=True, bulk_pragmas=True, progress=progress)
             return True, None
         except Exception as e:
             return False, str(e)
+        finally:
+            if self.store is not None:
+                # При импорте в фоновом потоке хранилище могло быть загружено до его завершения
+                self.store.invalidate()
+
+    def format_merge_counts(self, counts):
+        """
+        Формирует сводку результатов объединения данных.
+
+        Parameters
+        ----------
+        counts : dict
+            Количество записей по категориям, возвращённое merge_data.
+
+        Returns
+        -------
+        str
+            Текстовая сводка для пользователя.
+        """
+        return (f"Добавлено: {counts['inserted']}, обновлено: {counts['updated']}, "
+                f"без изменений: {counts['unchanged']}, удалено: {counts['deleted']}.")
+
+    def read_records(self, filename, format_type):
+        """
+        Читает записи таблицы из файла импорта.
+
+        Parameters
+        ----------
+        filename : str
+            Имя файла для импорта.
+        format_type : str
+            Тип формата импорта ('csv' или 'json').
+
+        Yields
+        ------
+        dict
+            Очередная запись: ключи — имена столбцов, значения — данные.
+        """
+        if format_type.lower() == 'csv':
+            with open(filename, mode='r', newline='', encoding='utf-8-sig') as file:
+                reader = csv.reader(file)
+                header = next(reader)  # Заголовочная строка содержит имена столбцов
+                for row in reader:
+                    yield {key: val for key, val in zip(header, row)}
+        else:
+            with open(filename, mode='r', encoding='utf-8') as file:
+                yield from json.load(file)
+
+    def read_orders_details(self, filename, format_type):
+        """
+        Читает заказы вместе с их позициями из файла импорта.
+
+        Parameters
+        ----------
+        filename : str
+            Имя файла для импорта.
+        format_type : str
+            Тип формата импорта ('csv' или 'json').
+
+        Yields
+        ------
+        tuple
+            Словарь с данными заказа и список словарей с позициями заказа.
+        """
+        if format_type.lower() == 'csv':
+            with open(filename, mode='r', newline='', encoding='utf-8-sig') as file:
+                reader = csv.reader(file)
+                next(reader)  # Пропускаем заголовочную строку
+                for row in reader:
+                    order_id, customer_id, date_created, status, total_amount, items_json = row
+                    parsed_date = datetime.strptime(date_created, '%Y-%m-%d %H:%M:%S')
+                    fixed_items_json = items_json.replace("'", '"')
+                    items = json.loads(fixed_items_json)
+                    order_data = {
+                        'id': order_id,
+                        'customer_id': customer_id,
+                        'date_created': parsed_date,
+                        'status': status,
+                        'total_amount': total_amount
+                    }
+                    item_data = [{
+                        'order_id': order_id,
+                        'product_id': item['product_id'],
+                        'quantity': item['quantity']
+                    } for item in items]
+                    yield order_data, item_data
+        else:
+            with open(filename, mode='r', encoding='utf-8') as file:
+                data = json.load(file)
+            for entry in data:
+                parsed_date = datetime.fromisoformat(entry['date_created'])
+                order_data = {
+                    'id': entry['id'],
+                    'customer_id': entry['customer_id'],
+                    'date_created': parsed_date,
+                    'status': entry['status'],
+                    'total_amount': entry['total_amount']
+                }
+                item_data = [{
+                    'order_id': entry['id'],
+                    'product_id': item['product_id'],
+                    'quantity': item['quantity']
+                } for item in entry['items']]
+                yield order_data, item_data
 
     def export_orders(self, filename, format_type):
         """
@@ -405,7 +702,7 @@ class AppController:
             Сообщение об ошибке (при неуспешном выполнении).
         """
         try:
-            raw_data = select_all_orders_with_items()
+            raw_data = iter_all_orders_with_items()
             if format_type.lower() == 'csv':
                 with open(filename, mode='w', newline='', encoding='utf-8-sig') as file:
                     writer = csv.writer(file)
@@ -420,20 +717,18 @@ class AppController:
                             ])
             elif format_type.lower() == 'json':
                 with open(filename, mode='w', encoding='utf-8') as file:
-                    processed_data = []
-                    for order in raw_data:
-                        processed_data.append({
-                            'order_id': order['id'],
-                            'customer_id': order['customer_id'],
-                            'date_created': order['date_created'].strftime('%Y-%m-%d %H:%M:%S'),
-                            'status': order['status'],
-                            'total_amount': order['total_amount'],
-                            'items': [
-                                {'product_id': item['product_id'], 'quantity': item['quantity']} for item in
-                                order['items']
-                            ]
-                        })
-                    json.dump(processed_data, file, ensure_ascii=False, indent=4)
+                    processed_data = ({
+                        'order_id': order['id'],
+                        'customer_id': order['customer_id'],
+                        'date_created': order['date_created'].strftime('%Y-%m-%d %H:%M:%S'),
+                        'status': order['status'],
+                        'total_amount': order['total_amount'],
+                        'items': [
+                            {'product_id': item['product_id'], 'quantity': item['quantity']} for item in
+                            order['items']
+                        ]
+                    } for order in raw_data)
+                    dump_json_stream(processed_data, file, ensure_ascii=False, indent=4)
             else:
                 raise ValueError("Формат экспорта не поддерживается.")
             return True, None
@@ -480,7 +775,9 @@ class AppController:
         if errors:
             return False, "\n".join(errors)
         try:
-            insert_customer(Customer(**data))
+            customer_id = insert_customer(Customer(**data))
+            if self.store is not None:
+                self.store.refresh_customers([customer_id])
             return True, ""
         except Exception as e:
             if "UNIQUE constraint failed" in str(e):
@@ -523,6 +820,8 @@ class AppController:
             return False, "\n".join(errors)
         try:
             update_customer(Customer(id=customer_id, **data))
+            if self.store is not None:
+                self.store.refresh_customers([customer_id])
             return True, ""
         except Exception as e:
             if "UNIQUE constraint failed" in str(e):
@@ -546,13 +845,51 @@ class AppController:
         """
         related_orders = select_orders_by_customer_id(customer_id)
         if related_orders:
-            customer = find_customer_by_id(customer_id)
+            customer = self.find_customer_by_id(customer_id)
             error_message = f"У покупателя {customer.name} есть оформленные заказы. Удаление запрещено."
             return False, error_message
         else:
             delete_customer(customer_id)
+            if self.store is not None:
+                self.store.refresh_customers([customer_id])
             return True, None
 
+    def find_product_by_name(self, name):
+        """
+        Ищет товар по его наименованию.
+
+        Parameters
+        ----------
+        name : str
+            Наименование товара.
+
+        Returns
+        -------
+        Product
+            Объект Product с наименованием name (None, если товар не найден).
+        """
+        if self.store is not None:
+            return self.store.get_product_by_name(name)
+        return next((p for p in select_products() if p.name == name), None)
+
+    def find_products_by_names(self, names):
+        """
+        Находит товары по набору наименований.
+
+        Parameters
+        ----------
+        names : iterable
+            Наименования товаров.
+
+        Returns
+        -------
+        dict
+            Словарь {наименование: Product} для найденных товаров.
+        """
+        if self.store is not None:
+            return self.store.get_products_by_names(names)
+        return find_products_by_names(list(names))
+
     def find_product_id_by_name(self, name):
         """
                 Ищет товар по его наименованию
@@ -567,7 +904,7 @@ class AppController:
                 id : int
                     id товара с наименованием name
                 """
-        product = next((p for p in select_products() if p.name == name), None)
+        product = self.find_product_by_name(name)
         return product.id if product else None
 
     def add_product(self, data):
@@ -609,7 +946,9 @@ class AppController:
         if errors:
             return False, "\n".join(errors)
         try:
-            insert_product(Product(**data))
+            product_id = insert_product(Product(**data))
+            if self.store is not None:
+                self.store.refresh_products([product_id])
             return True, ""
         except Exception as e:
             return False, f"Возникла непредвиденная ошибка: {str(e)}"
@@ -651,6 +990,8 @@ class AppController:
             return False, "\n".join(errors)
         try:
             update_product(Product(id=product_id, **data))
+            if self.store is not None:
+                self.store.refresh_products([product_id])
             return True, ""
         except Exception as e:
             return False, f"Возникла непредвиденная ошибка: {str(e)}"
@@ -671,11 +1012,13 @@ class AppController:
         """
         related_items = select_orders_by_product_id(product_id)
         if related_items:
-            product = find_product_by_id(product_id)
+            product = self.find_product_by_id(product_id)
             error_message = f"Товар {product.name} состоит в оформленном заказе. Удаление запрещено."
             return False, error_message
         else:
             delete_product(product_id)
+            if self.store is not None:
+                self.store.refresh_products([product_id])
             return True, None
 
     def add_order_item(self, order_id, item_dict):
@@ -692,6 +1035,20 @@ class AppController:
         order_item = OrderItem(product_id=item_dict["product_id"], quantity=item_dict["quantity"])
         insert_order_item(order_id, order_item)
 
+    def add_order_items(self, order_id, item_dicts):
+        """
+        Добавляет несколько позиций заказа в базу данных одним запросом.
+
+        Parameters
+        ----------
+        order_id : int
+            Идентификатор заказа.
+        item_dicts : list
+            Список словарей с полями 'product_id' и 'quantity'.
+        """
+        insert_order_items(order_id, [OrderItem(product_id=item["product_id"], quantity=item["quantity"])
+                                      for item in item_dicts])
+
     def calculate_total(self, cart_items):
         """
         Рассчитывает общую сумму заказа.
@@ -706,9 +1063,10 @@ class AppController:
         float
             Общая сумма заказа.
         """
+        products = self.find_products_by_ids([i["product_id"] for i in cart_items])
         t_sum = 0
         for i in cart_items:
-            price = find_product_by_id(i["product_id"]).price
+            price = products[i["product_id"]].price
             t_sum += price * i["quantity"]
         return t_sum
 
@@ -733,23 +1091,17 @@ class AppController:
         zero_items = [item for item in cart_items if item["quantity"] == 0]
         if zero_items:
             return False, "Некоторые товары имеют нулевое количество, оформление заказа отменено."
-        order = Order(
-            customer_id=customer_id,
-            total_amount=self.calculate_total(cart_items),
-            status="Новый",
-            date_created=datetime.now()
-        )
-        order_id = insert_order(order)
-        for item in cart_items:
-            order_item = OrderItem(
-                product_id=item["product_id"],
-                quantity=item["quantity"]
-            )
-            insert_order_item(order_id, order_item)
-            product = find_product_by_id(item["product_id"])
-            if product:
-                product.quantity -= item["quantity"]
-                update_product(product)
+        order_items = [OrderItem(product_id=item["product_id"], quantity=item["quantity"]) for item in cart_items]
+        try:
+            # Заказ, его позиции и списание со склада фиксируются одной транзакцией
+            checkout_order(customer_id, order_items, status="Новый")
+        except InsufficientStockError as e:
+            product = self.find_product_by_id(e.product_id)
+            product_name = product.name if product else e.product_id
+            return False, f"Недостаточно товара '{product_name}' на складе, оформление заказа отменено."
+        if self.store is not None:
+            # Остатки списанных товаров изменились
+            self.store.refresh_products(item.product_id for item in order_items)
         self.cart_items.clear()  # Очищаем корзину после оформления заказа
         return True, "Заказ успешно оформлен!"
 
@@ -788,7 +1140,6 @@ class AppController:
             Идентификатор заказа.
         """
         delete_order(order_id)
-        self.load_orders()
 
     def delete_order_list(self, order_id):
         """
@@ -800,7 +1151,6 @@ class AppController:
             Идентификатор заказа.
         """
         delete_order_list(order_id)
-        self.load_orders()
 
     def validate_email(self, email):
         """
@@ -837,8 +1187,8 @@ class AppController:
         list
             Список кортежей с данными для построения графика.
         """
-        res_ord, col_ord = select_analysis_data('orders')
-        res_cust, col_cust = select_analysis_data('customers')
+        res_ord, col_ord = iter_analysis_data('orders')
+        res_cust, col_cust = iter_analysis_data('customers')
         res = [(res_cust, col_cust), (res_ord, col_ord)]
         return res
 
@@ -851,7 +1201,7 @@ class AppController:
         tuple
             Кортеж с данными для построения графика.
         """
-        res_ord, col_ord = select_analysis_data('orders')
+        res_ord, col_ord = iter_analysis_data('orders')
         res = (res_ord, col_ord)
         return res
 
@@ -864,10 +1214,10 @@ class AppController:
         list
             Список кортежей с данными для построения графа.
         """
-        res_cust, col_cust = select_analysis_data('customers')
-        res_prod, col_prod = select_analysis_data('products')
-        res_ord, col_ord = select_analysis_data('orders')
-        res_ord_it, col_ord_it = select_analysis_data('order_items')
+        res_cust, col_cust = iter_analysis_data('customers')
+        res_prod, col_prod = iter_analysis_data('products')
+        res_ord, col_ord = iter_analysis_data('orders')
+        res_ord_it, col_ord_it = iter_analysis_data('order_items')
         res = [(res_cust, col_cust), (res_prod, col_prod), (res_ord, col_ord), (res_ord_it, col_ord_it)]
         return res
 
@@ -887,6 +1237,27 @@ class AppController:
         """
         return top5(res)
 
+    def c_top(self, k=5, metric='orders'):
+        """
+        Формирует данные для графика "Топ покупателей" по агрегату, вычисленному в базе данных.
+
+        В отличие от c_top5, в приложение передаются только k итоговых строк,
+        поэтому время обновления графика не зависит от размера таблиц.
+
+        Parameters
+        ----------
+        k : int, optional
+            Количество покупателей в рейтинге.
+        metric : str, optional
+            Метрика рейтинга: 'orders' — число заказов, 'revenue' — сумма заказов.
+
+        Returns
+        -------
+        pd.DataFrame
+            Датафрейм со столбцами 'name' и значением метрики.
+        """
+        return top_k(select_top_customers(k, metric), metric)
+
     def c_orders_per_day(self, res):
         """
         Передаёт данные в анализатор для построения графика "Динамика количества заказов по датам".
@@ -903,6 +1274,88 @@ class AppController:
         """
         return orders_per_day(res)
 
+    def parse_date(self, value):
+        """
+        Преобразует дату из формата ДД-ММ-ГГГГ, в котором даты показываются на графике.
+
+        Parameters
+        ----------
+        value : str
+            Дата в формате ДД-ММ-ГГГГ или пустая строка.
+
+        Returns
+        -------
+        datetime.date or None
+            Дата или None, если значение пустое.
+
+        Raises
+        ------
+        ValueError
+            Если дата указана в неверном формате.
+        """
+        value = value.strip()
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, '%d-%m-%Y').date()
+        except ValueError:
+            raise ValueError(f"Некорректный формат даты: {value}.\nПример: 21-08-2025")
+
+    def c_order_counts(self, bucket='day', date_from='', date_to=''):
+        """
+        Формирует данные для графика "Динамика количества заказов" по группировке в базе данных.
+
+        В отличие от c_orders_per_day, в приложение передаются только итоговые строки
+        за указанный период.
+
+        Parameters
+        ----------
+        bucket : str, optional
+            Интервал группировки: 'day', 'week' или 'month'.
+        date_from : str, optional
+            Первый день периода в формате ДД-ММ-ГГГГ; пустая строка — без ограничения.
+        date_to : str, optional
+            Последний день периода в формате ДД-ММ-ГГГГ; пустая строка — без ограничения.
+
+        Returns
+        -------
+        pd.DataFrame
+            Датафрейм с колонками 'date_created' и 'counts'.
+
+        Raises
+        ------
+        ValueError
+            Если дата указана в неверном формате или начало периода позже его конца.
+        """
+        start, end = self.parse_date_range(date_from, date_to)
+        return order_counts(select_order_counts(bucket, start, end))
+
+    def parse_date_range(self, date_from, date_to):
+        """
+        Преобразует период графика заказов из формата ДД-ММ-ГГГГ.
+
+        Parameters
+        ----------
+        date_from : str
+            Первый день периода; пустая строка — без ограничения.
+        date_to : str
+            Последний день периода; пустая строка — без ограничения.
+
+        Returns
+        -------
+        tuple
+            Первый и последний день периода (datetime.date или None).
+
+        Raises
+        ------
+        ValueError
+            Если дата указана в неверном формате или начало периода позже его конца.
+        """
+        start, end = self.parse_date(date_from), self.parse_date(date_to)
+        if start is not None and end is not None and start > end:
+            raise ValueError("Начало периода не может быть позже его окончания.")
+        return start, end
+
     def c_client_connections(self, res):
         """
         Передаёт данные в анализатор для построения графа "Связь покупателей по общим товарам".
@@ -917,4 +1370,27 @@ class AppController:
         list
             Список рёбер графа с результатами анализа.
         """
-        return client_connections(res)
\ No newline at end of file
+        return client_connections(res)
+
+    def c_connections(self, min_weight=0, top_k=None, max_nodes=None):
+        """
+        Формирует рёбра графа "Связь покупателей по общим товарам" по покупкам, сгруппированным в базе данных.
+
+        В отличие от c_client_connections, в приложение передаются только ненулевые элементы
+        матрицы покупатель × товар, а не полные таблицы.
+
+        Parameters
+        ----------
+        min_weight : float, optional
+            Минимальный вес ребра.
+        top_k : int, optional
+            Число сильнейших соседей, сохраняемых для каждого покупателя.
+        max_nodes : int, optional
+            Максимальное число вершин графа (по убыванию степени).
+
+        Returns
+        -------
+        list
+            Список рёбер графа (имя покупателя, имя другого покупателя, вес), каждая пара один раз.
+        """
+        return compute_connections({'min_weight': min_weight, 'top_k': top_k, 'max_nodes': max_nodes})
\ No newline at end of file
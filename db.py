@@ -1,55 +1,75 @@
-import sqlite3
-from typing import List, Optional
-from models import Customer, Product, Order, OrderItem
-from datetime import datetime
+import time
+from contextlib import contextmanager
+from itertools import chain, islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from models import Customer, Product, Order, OrderItem, OrderRow
+from datetime import date, datetime
+from connection import ConnectionManager, DEFAULT_PROFILE
+from cache import QueryCache
+from instrumentation import InstrumentedConnection
+from migrations import migrate
 
 # Устанавливаем путь к базе данных
 DB_PATH = 'data/products.sqlite'
 
+# Общий менеджер соединений: все функции модуля работают через него,
+# а каждое выражение учитывается в instrumentation
+connection_manager = ConnectionManager(DB_PATH, factory=InstrumentedConnection)
+
+# Кэш результатов функций чтения: функции записи отмечают изменённые таблицы,
+# а изменения из других соединений обнаруживаются по PRAGMA data_version
+query_cache = QueryCache(connection_getter=connection_manager.get)
+
+
+def open_connections(db_path: str = DB_PATH, profile=DEFAULT_PROFILE) -> None:
+    """
+    Открывает менеджер соединений для указанного файла базы данных.
+
+    Parameters
+    ----------
+    db_path : str, optional
+        Путь к файлу базы данных.
+    profile : str or PragmaProfile, optional
+        Профиль PRAGMA ("durable" или "fast"), применяемый к каждому соединению.
+    """
+    connection_manager.open(db_path, profile)
+    query_cache.clear()
+
+
+def close_connections() -> None:
+    """
+    Закрывает все соединения с базой данных.
+    """
+    connection_manager.close()
+    query_cache.clear()
+
+
+def get_connection():
+    """
+    Возвращает соединение с базой данных для текущего потока.
+
+    Returns
+    -------
+    sqlite3.Connection
+        Переиспользуемое соединение текущего потока.
+    """
+    return connection_manager.get()
+
 
 def create_tables():
     """
-    Создает таблицы в базе данных, если они еще не созданы.
-
-    Creates database tables if they do not exist yet.
-    """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.executescript("""
-        CREATE TABLE IF NOT EXISTS customers (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            email TEXT UNIQUE CHECK(email IS NOT NULL),
-            phone TEXT
-        );
-
-        CREATE TABLE IF NOT EXISTS products (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            price REAL NOT NULL CHECK(price >= 0),
-            quantity INTEGER NOT NULL CHECK(quantity >= 0)
-        );
-
-        CREATE TABLE IF NOT EXISTS orders (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            customer_id INTEGER REFERENCES customers(id),
-            date_created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            status TEXT DEFAULT 'Новый',
-            total_amount REAL NOT NULL CHECK(total_amount >= 0)
-        );
-
-        CREATE TABLE IF NOT EXISTS order_items (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            order_id INTEGER REFERENCES orders(id),
-            product_id INTEGER REFERENCES products(id),
-            quantity INTEGER NOT NULL CHECK(quantity > 0)
-        );
-    """)
-    conn.commit()
-    conn.close()
-
-
-def insert_customer(customer: Customer) -> None:
+    Приводит схему базы данных к актуальной версии с помощью миграций.
+
+    Если схема уже актуальна, выполняется только чтение PRAGMA user_version.
+
+    Brings the database schema up to date by applying pending migrations.
+    """
+    if migrate(get_connection()):
+        query_cache.clear()
+
+
+@query_cache.invalidates('customers')
+def insert_customer(customer: Customer) -> int:
     """
     Добавляет нового клиента в базу данных.
 
@@ -57,16 +77,23 @@ def insert_customer(customer: Customer) -> None:
     ----------
     customer : Customer
         Объект класса Customer, содержащий данные нового клиента.
+
+    Returns
+    -------
+    int
+        Идентификатор добавленного клиента.
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(
             "INSERT INTO customers (name, email, phone) VALUES (?, ?, ?)",
             (customer.name, customer.email, customer.phone)
         )
         conn.commit()
+        return cursor.lastrowid
 
 
+@query_cache.cached('customers')
 def select_customers(filter_by: str = '') -> List[Customer]:
     """
     Возвращает список всех клиентов с возможностью фильтрации по имени или email.
@@ -81,7 +108,7 @@ def select_customers(filter_by: str = '') -> List[Customer]:
     List[Customer]
         Список объектов Customer, удовлетворяющих критерию фильтрации.
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         query = "SELECT * FROM customers WHERE name LIKE ? OR email LIKE ?"
         filter_pattern = f'%{filter_by}%'
@@ -89,6 +116,7 @@ def select_customers(filter_by: str = '') -> List[Customer]:
         return [Customer.from_tuple(row) for row in results]
 
 
+@query_cache.cached('customers')
 def find_customer_by_id(customer_id: int) -> Optional[Customer]:
     """
     Находит клиента по его идентификатору.
@@ -103,7 +131,7 @@ def find_customer_by_id(customer_id: int) -> Optional[Customer]:
     Optional[Customer]
         Объект Customer, если клиент найден, иначе None.
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         query = "SELECT * FROM customers WHERE id=?"
         result = cursor.execute(query, (customer_id,)).fetchone()
@@ -112,6 +140,69 @@ def find_customer_by_id(customer_id: int) -> Optional[Customer]:
         return None
 
 
+# Максимальное число параметров в одном запросе (с запасом до SQLITE_MAX_VARIABLE_NUMBER)
+MAX_QUERY_VARIABLES = 900
+
+
+def _select_by_ids(table_name: str, ids: Iterable, factory, column: str = 'id') -> dict:
+    """
+    Выбирает записи таблицы по набору значений столбца, разбивая его на порции.
+
+    Каждая порция выбирается одним запросом с условием IN, размер порции
+    не превышает MAX_QUERY_VARIABLES.
+
+    Parameters
+    ----------
+    table_name : str
+        Название таблицы.
+    ids : Iterable
+        Искомые значения столбца (повторы и None игнорируются).
+    factory : callable
+        Функция, создающая объект модели из кортежа данных.
+    column : str, optional
+        Столбец поиска. Если значение встречается в нескольких записях,
+        в результат попадает запись с наименьшим идентификатором.
+
+    Returns
+    -------
+    dict
+        Словарь {значение: объект}. Ненайденные значения в словарь не попадают.
+    """
+    unique_ids = list(dict.fromkeys(i for i in ids if i is not None))
+    found = {}
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        for start in range(0, len(unique_ids), MAX_QUERY_VARIABLES):
+            chunk = unique_ids[start:start + MAX_QUERY_VARIABLES]
+            placeholders = ", ".join(["?"] * len(chunk))
+            results = cursor.execute(
+                f"SELECT * FROM {table_name} WHERE {column} IN ({placeholders}) ORDER BY id", chunk
+            ).fetchall()
+            for row in results:
+                obj = factory(row)
+                found.setdefault(getattr(obj, column), obj)
+    return found
+
+
+@query_cache.cached('customers')
+def find_customers_by_ids(customer_ids: Iterable[int]) -> Dict[int, Customer]:
+    """
+    Находит клиентов по набору идентификаторов.
+
+    Parameters
+    ----------
+    customer_ids : Iterable[int]
+        Идентификаторы клиентов.
+
+    Returns
+    -------
+    Dict[int, Customer]
+        Словарь {идентификатор: Customer} для найденных клиентов.
+    """
+    return _select_by_ids('customers', customer_ids, Customer.from_tuple)
+
+
+@query_cache.invalidates('customers')
 def update_customer(customer: Customer) -> None:
     """
     Обновляет данные клиента в базе данных.
@@ -121,7 +212,7 @@ def update_customer(customer: Customer) -> None:
     customer : Customer
         Объект класса Customer с обновленными данными.
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(
             "UPDATE customers SET name=?, email=?, phone=? WHERE id=?",
@@ -130,6 +221,7 @@ def update_customer(customer: Customer) -> None:
         conn.commit()
 
 
+@query_cache.invalidates('customers')
 def delete_customer(customer_id: int) -> None:
     """
     Удаляет клиента по его идентификатору.
@@ -139,13 +231,14 @@ def delete_customer(customer_id: int) -> None:
     customer_id : int
         Идентификатор клиента.
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("DELETE FROM customers WHERE id=?", (customer_id,))
         conn.commit()
 
 
-def insert_product(product: Product) -> None:
+@query_cache.invalidates('products')
+def insert_product(product: Product) -> int:
     """
     Добавляет новый продукт в базу данных.
 
@@ -153,16 +246,23 @@ def insert_product(product: Product) -> None:
     ----------
     product : Product
         Объект класса Product, содержащий данные нового продукта.
+
+    Returns
+    -------
+    int
+        Идентификатор добавленного продукта.
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(
             "INSERT INTO products (name, price, quantity) VALUES (?, ?, ?)",
             (product.name, product.price, product.quantity)
         )
         conn.commit()
+        return cursor.lastrowid
 
 
+@query_cache.cached('products')
 def select_products(filter_by: str = '') -> List[Product]:
     """
     Возвращает список всех продуктов с возможностью фильтрации по названию.
@@ -177,7 +277,7 @@ def select_products(filter_by: str = '') -> List[Product]:
     List[Product]
         Список объектов Product, удовлетворяющих критерию фильтрации.
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         query = "SELECT * FROM products WHERE name LIKE ?"
         filter_pattern = f'%{filter_by}%'
@@ -185,6 +285,7 @@ def select_products(filter_by: str = '') -> List[Product]:
         return [Product.from_tuple(row) for row in results]
 
 
+@query_cache.cached('products')
 def find_product_by_id(product_id: int) -> Optional[Product]:
     """
     Находит продукт по его идентификатору.
@@ -199,7 +300,7 @@ def find_product_by_id(product_id: int) -> Optional[Product]:
     Optional[Product]
         Объект Product, если продукт найден, иначе None.
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         query = "SELECT * FROM products WHERE id=?"
         result = cursor.execute(query, (product_id,)).fetchone()
@@ -208,6 +309,44 @@ def find_product_by_id(product_id: int) -> Optional[Product]:
         return None
 
 
+@query_cache.cached('products')
+def find_products_by_ids(product_ids: Iterable[int]) -> Dict[int, Product]:
+    """
+    Находит продукты по набору идентификаторов.
+
+    Parameters
+    ----------
+    product_ids : Iterable[int]
+        Идентификаторы продуктов.
+
+    Returns
+    -------
+    Dict[int, Product]
+        Словарь {идентификатор: Product} для найденных продуктов.
+    """
+    return _select_by_ids('products', product_ids, Product.from_tuple)
+
+
+@query_cache.cached('products')
+def find_products_by_names(names: Iterable[str]) -> Dict[str, Product]:
+    """
+    Находит товары по набору наименований.
+
+    Parameters
+    ----------
+    names : Iterable[str]
+        Наименования товаров.
+
+    Returns
+    -------
+    Dict[str, Product]
+        Словарь {наименование: Product} для найденных товаров
+        (при совпадении наименований — товар с наименьшим идентификатором).
+    """
+    return _select_by_ids('products', names, Product.from_tuple, column='name')
+
+
+@query_cache.invalidates('products')
 def update_product(product: Product) -> None:
     """
     Обновляет данные продукта в базе данных.
@@ -217,7 +356,7 @@ def update_product(product: Product) -> None:
     product : Product
         Объект класса Product с обновленными данными.
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(
             "UPDATE products SET name=?, price=?, quantity=? WHERE id=?",
@@ -226,6 +365,7 @@ def update_product(product: Product) -> None:
         conn.commit()
 
 
+@query_cache.invalidates('products')
 def delete_product(product_id: int) -> None:
     """
     Удаляет продукт по его идентификатору.
@@ -235,12 +375,13 @@ def delete_product(product_id: int) -> None:
     product_id : int
         Идентификатор продукта.
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("DELETE FROM products WHERE id=?", (product_id,))
         conn.commit()
 
 
+@query_cache.invalidates('orders')
 def insert_order(order: Order) -> int:
     """
     Добавляет новый заказ в базу данных и возвращает его идентификатор.
@@ -255,7 +396,7 @@ def insert_order(order: Order) -> int:
     int
         Идентификатор вновь созданного заказа.
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(
             "INSERT INTO orders (customer_id, total_amount, status) VALUES (?, ?, ?)",
@@ -266,6 +407,7 @@ def insert_order(order: Order) -> int:
         return order_id
 
 
+@query_cache.invalidates('order_items')
 def insert_order_item(order_id: int, item: OrderItem) -> None:
     """
     Добавляет новую позицию в заказ.
@@ -277,13 +419,261 @@ def insert_order_item(order_id: int, item: OrderItem) -> None:
     item : OrderItem
         Объект класса OrderItem, содержащий данные новой позиции.
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("INSERT INTO order_items (order_id, product_id, quantity) VALUES (?,?,?)",
                        (order_id, item.product_id, item.quantity))
         conn.commit()
 
 
+@query_cache.invalidates('order_items')
+def insert_order_items(order_id: int, items: List[OrderItem]) -> None:
+    """
+    Добавляет в заказ несколько позиций одним выражением executemany.
+
+    Parameters
+    ----------
+    order_id : int
+        Идентификатор заказа.
+    items : List[OrderItem]
+        Новые позиции заказа.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany("INSERT INTO order_items (order_id, product_id, quantity) VALUES (?,?,?)",
+                           [(order_id, item.product_id, item.quantity) for item in items])
+        conn.commit()
+
+
+class InsufficientStockError(Exception):
+    """
+    Исключение, возникающее при нехватке товара на складе во время оформления заказа.
+
+    Attributes
+    ----------
+    product_id : int
+        Идентификатор товара, которого не хватило.
+    """
+    def __init__(self, product_id: int):
+        super().__init__(f"Недостаточно товара с идентификатором {product_id} на складе.")
+        self.product_id = product_id
+
+
+@query_cache.invalidates('orders', 'order_items', 'products')
+def checkout_order(customer_id: int, items: List[OrderItem], status: str = 'Новый') -> int:
+    """
+    Оформляет заказ в одной транзакции: создает заказ и его позиции и списывает товар со склада.
+
+    Сумма заказа рассчитывается по ценам из базы данных внутри той же транзакции.
+    Остатки проверяются под блокировкой на запись, а списание выполняется условным UPDATE,
+    поэтому параллельно работающие менеджеры не могут продать больше товара, чем есть на складе.
+
+    Parameters
+    ----------
+    customer_id : int
+        Идентификатор покупателя.
+    items : List[OrderItem]
+        Позиции заказа.
+    status : str, optional
+        Статус нового заказа.
+
+    Returns
+    -------
+    int
+        Идентификатор вновь созданного заказа.
+
+    Raises
+    ------
+    InsufficientStockError
+        Если какого-либо товара нет в базе данных или на складе его меньше, чем требуется.
+        В этом случае транзакция откатывается целиком.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        # Блокировка на запись берется сразу, чтобы цены и остатки не изменились до фиксации
+        cursor.execute("BEGIN IMMEDIATE")
+        product_ids = list({item.product_id for item in items})
+        placeholders = ", ".join(["?"] * len(product_ids))
+        stock = {row[0]: (row[1], row[2]) for row in cursor.execute(
+            f"SELECT id, price, quantity FROM products WHERE id IN ({placeholders})", product_ids
+        )}
+        prices = {product_id: price for product_id, (price, _) in stock.items()}
+        # Остатки проверяются в порядке позиций, с учётом повторов одного товара
+        remaining = {product_id: quantity for product_id, (_, quantity) in stock.items()}
+        for item in items:
+            if remaining.get(item.product_id, 0) < item.quantity:
+                raise InsufficientStockError(item.product_id)
+            remaining[item.product_id] -= item.quantity
+        total_amount = sum(prices[item.product_id] * item.quantity for item in items)
+
+        cursor.execute(
+            "INSERT INTO orders (customer_id, total_amount, status) VALUES (?, ?, ?)",
+            (customer_id, total_amount, status)
+        )
+        order_id = cursor.lastrowid
+        cursor.executemany(
+            "INSERT INTO order_items (order_id, product_id, quantity) VALUES (?,?,?)",
+            [(order_id, item.product_id, item.quantity) for item in items]
+        )
+        cursor.executemany(
+            "UPDATE products SET quantity = quantity - ? WHERE id = ? AND quantity >= ?",
+            [(item.quantity, item.product_id, item.quantity) for item in items]
+        )
+        if cursor.rowcount != len(items):
+            # Под блокировкой на запись не происходит; условие в UPDATE остаётся последней защитой.
+            # rowcount суммируется по всем выражениям, поэтому товар, которого не хватило,
+            # определяется по остатку, отличающемуся от ожидаемого
+            cursor.execute(f"SELECT id, quantity FROM products WHERE id IN ({placeholders})", product_ids)
+            actual = dict(cursor.fetchall())
+            raise InsufficientStockError(next(product_id for product_id in product_ids
+                                              if actual.get(product_id) != remaining[product_id]))
+        conn.commit()
+        return order_id
+
+
+# Метрики рейтинга покупателей: имя метрики -> агрегат по заказам покупателя
+TOP_CUSTOMER_METRICS = {
+    'orders': 'COUNT(*)',
+    'revenue': 'SUM(total_amount)',
+}
+
+
+@query_cache.cached('orders', 'customers')
+def select_top_customers(k: int = 5, metric: str = 'orders') -> List[Tuple[str, float]]:
+    """
+    Возвращает k покупателей с наибольшим значением метрики по их заказам.
+
+    Агрегация выполняется в SQLite по индексу (customer_id, total_amount), имена
+    покупателей подставляются только для уже сгруппированных строк. При равенстве
+    значений покупатели упорядочиваются по имени.
+
+    Parameters
+    ----------
+    k : int, optional
+        Количество покупателей в рейтинге.
+    metric : str, optional
+        Метрика из TOP_CUSTOMER_METRICS: 'orders' — число заказов, 'revenue' — сумма заказов.
+
+    Returns
+    -------
+    List[Tuple[str, float]]
+        Список пар (имя покупателя, значение метрики) по убыванию значения.
+
+    Raises
+    ------
+    ValueError
+        Если метрика не поддерживается.
+    """
+    if metric not in TOP_CUSTOMER_METRICS:
+        raise ValueError(f"Неизвестная метрика: {metric}. Доступные метрики: {', '.join(TOP_CUSTOMER_METRICS)}")
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT c.name, t.value
+            FROM (
+                SELECT customer_id, {TOP_CUSTOMER_METRICS[metric]} AS value
+                FROM orders
+                GROUP BY customer_id
+            ) AS t
+            JOIN customers AS c ON c.id = t.customer_id
+            ORDER BY t.value DESC, c.name ASC
+            LIMIT ?
+        """, (k,))
+        return cursor.fetchall()
+
+
+# Интервалы группировки заказов по датам: имя интервала -> выражение даты начала интервала по дню заказа
+ORDER_DATE_BUCKETS = {
+    'day': "day",
+    # Понедельник недели, в которую попадает день
+    'week': "date(day, '-6 days', 'weekday 1')",
+    'month': "date(day, 'start of month')",
+}
+
+
+@query_cache.cached('orders')
+def select_order_counts(bucket: str = 'day', date_from: Optional[date] = None,
+                        date_to: Optional[date] = None) -> List[Tuple[str, int]]:
+    """
+    Возвращает количество заказов по дням, неделям или месяцам за указанный период.
+
+    Заказы группируются по дню в SQLite по индексу idx_orders_day (без сортировки всех заказов),
+    затем дни объединяются в недели или месяцы. Фильтр по периоду также использует этот индекс,
+    поэтому читаются только заказы видимого диапазона.
+
+    Parameters
+    ----------
+    bucket : str, optional
+        Интервал группировки из ORDER_DATE_BUCKETS: 'day', 'week' или 'month'.
+    date_from : datetime.date, optional
+        Первый день периода (включительно). Если не задан, период не ограничен снизу.
+    date_to : datetime.date, optional
+        Последний день периода (включительно). Если не задан, период не ограничен сверху.
+
+    Returns
+    -------
+    List[Tuple[str, int]]
+        Список пар (дата начала интервала в формате ГГГГ-ММ-ДД, количество заказов) по возрастанию даты.
+
+    Raises
+    ------
+    ValueError
+        Если интервал группировки не поддерживается.
+    """
+    if bucket not in ORDER_DATE_BUCKETS:
+        raise ValueError(f"Неизвестный интервал: {bucket}. Доступные интервалы: {', '.join(ORDER_DATE_BUCKETS)}")
+    conditions, params = [], []
+    if date_from is not None:
+        conditions.append("date(date_created) >= ?")
+        params.append(date_from.isoformat())
+    if date_to is not None:
+        conditions.append("date(date_created) <= ?")
+        params.append(date_to.isoformat())
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT {ORDER_DATE_BUCKETS[bucket]} AS period, SUM(counts)
+            FROM (
+                SELECT date(date_created) AS day, COUNT(*) AS counts
+                FROM orders
+                {where}
+                GROUP BY day
+            )
+            GROUP BY period
+            ORDER BY period
+        """, params)
+        return cursor.fetchall()
+
+
+@query_cache.cached('customers', 'products', 'orders', 'order_items')
+def select_customer_purchases() -> List[Tuple[str, str, int]]:
+    """
+    Возвращает количество позиций каждого товара, купленного каждым покупателем.
+
+    Результат — разреженная матрица покупатель × товар в виде троек: в приложение передаются
+    только ненулевые элементы вместо полных таблиц клиентов, товаров, заказов и позиций.
+    Покупатели и товары группируются по наименованию, как в analysis.client_connections.
+
+    Returns
+    -------
+    List[Tuple[str, str, int]]
+        Список троек (имя покупателя, наименование товара, количество позиций).
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT c.name, p.name, COUNT(*)
+            FROM order_items AS oi
+            JOIN orders AS o ON o.id = oi.order_id
+            JOIN customers AS c ON c.id = o.customer_id
+            JOIN products AS p ON p.id = oi.product_id
+            GROUP BY c.name, p.name
+        """)
+        return cursor.fetchall()
+
+
+@query_cache.cached('orders')
 def select_orders() -> List[Order]:
     """
     Возвращает список всех заказов.
@@ -293,13 +683,143 @@ def select_orders() -> List[Order]:
     List[Order]
         Список объектов Order.
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM orders")
         results = cursor.fetchall()
         return [Order.from_tuple(row) for row in results]
 
 
+@query_cache.cached('orders', 'customers')
+def select_order_rows() -> List[OrderRow]:
+    """
+    Возвращает список всех заказов вместе с именами покупателей одним запросом.
+
+    Returns
+    -------
+    List[OrderRow]
+        Список объектов OrderRow, упорядоченный по идентификатору заказа.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT o.id, o.customer_id, c.name, o.date_created, o.status, o.total_amount
+            FROM orders AS o
+            LEFT JOIN customers AS c ON c.id = o.customer_id
+            ORDER BY o.id
+        """)
+        return [OrderRow.from_tuple(row) for row in cursor.fetchall()]
+
+
+# Допустимые поля сортировки списка заказов: ключ сортировки -> столбец
+ORDER_SORT_COLUMNS = {
+    'id': 'o.id',
+    'date': 'o.date_created',
+    'amount': 'o.total_amount',
+}
+
+
+@query_cache.cached('orders', 'customers')
+def seek_order_rows(order_by: str = 'id', direction: str = 'asc', after: Optional[tuple] = None,
+                    until: Optional[tuple] = None, skip: int = 0,
+                    limit: int = 100) -> Tuple[List[OrderRow], List[tuple]]:
+    """
+    Возвращает участок отсортированного списка заказов, найденный по ключу (keyset).
+
+    Участок отсчитывается от известной строки списка: вперёд от строки после курсора after
+    или назад от строки курсора until включительно. Курсор строки — значения ключа сортировки
+    (столбец сортировки и идентификатор заказа), поэтому продолжение списка с известной строки
+    не зависит от её номера. Если до участка нужно пропустить skip строк, они пропускаются
+    по покрывающему индексу столбца сортировки во вложенном запросе, а имена покупателей
+    присоединяются только к строкам участка.
+
+    Parameters
+    ----------
+    order_by : str, optional
+        Ключ сортировки из ORDER_SORT_COLUMNS ('id', 'date' или 'amount').
+    direction : str, optional
+        Направление сортировки ('asc' или 'desc').
+    after : tuple, optional
+        Курсор строки, после которой начинается участок. None — участок отсчитывается от начала списка.
+    until : tuple, optional
+        Курсор строки, которой (с учётом skip) заканчивается участок; участок читается назад.
+    skip : int, optional
+        Количество строк, пропускаемых между курсором (или началом списка) и участком.
+    limit : int, optional
+        Максимальное число строк участка.
+
+    Returns
+    -------
+    tuple
+        Список объектов OrderRow в порядке сортировки и список курсоров этих строк.
+
+    Raises
+    ------
+    ValueError
+        Если указан неизвестный ключ или направление сортировки либо заданы оба курсора.
+    """
+    if order_by not in ORDER_SORT_COLUMNS:
+        raise ValueError(f"Неизвестное поле сортировки: {order_by}")
+    if direction not in ('asc', 'desc'):
+        raise ValueError(f"Неизвестное направление сортировки: {direction}")
+    if after is not None and until is not None:
+        raise ValueError("Участок задаётся только одним курсором")
+    column = ORDER_SORT_COLUMNS[order_by]
+    backward = until is not None
+    # При чтении назад порядок сортировки обращается, а найденные строки переставляются обратно
+    sql_direction = ('DESC' if direction == 'asc' else 'ASC') if backward else direction.upper()
+    if backward:
+        comparison = '<=' if direction == 'asc' else '>='
+    else:
+        comparison = '>' if direction == 'asc' else '<'
+
+    # Для неуникальных столбцов идентификатор заказа служит вторым ключом сортировки
+    if order_by == 'id':
+        key_columns = 'o.id'
+        order_clause = f"o.id {sql_direction}"
+    else:
+        key_columns = f"{column}, o.id"
+        order_clause = f"{column} {sql_direction}, o.id {sql_direction}"
+    cursor_values = until if backward else after
+    where_clause = (f"WHERE ({key_columns}) {comparison} ({', '.join(['?'] * len(cursor_values))})"
+                    if cursor_values else "")
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        results = cursor.execute(f"""
+            SELECT o.id, o.customer_id, c.name, o.date_created, o.status, o.total_amount
+            FROM (SELECT o.id FROM orders AS o {where_clause} ORDER BY {order_clause} LIMIT ? OFFSET ?) AS page
+            JOIN orders AS o ON o.id = page.id
+            LEFT JOIN customers AS c ON c.id = o.customer_id
+            ORDER BY {order_clause}
+        """, tuple(cursor_values or ()) + (limit, skip)).fetchall()
+
+    if backward:
+        results.reverse()
+    sort_index = {'id': 0, 'date': 3, 'amount': 5}[order_by]
+    cursors = [(row[0],) if order_by == 'id' else (row[sort_index], row[0]) for row in results]
+    return [OrderRow.from_tuple(row) for row in results], cursors
+
+
+@query_cache.cached('orders')
+def count_orders() -> int:
+    """
+    Возвращает количество заказов.
+
+    SQLite считает строки по самому узкому индексу таблицы, а результат кэшируется до изменения
+    заказов, поэтому подсчёт не замедляет прокрутку виртуального списка заказов.
+
+    Returns
+    -------
+    int
+        Количество заказов.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        return cursor.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+
+
+@query_cache.cached('orders')
 def find_order_by_id(order_id: int) -> Optional[Order]:
     """
     Находит заказ по его идентификатору.
@@ -314,7 +834,7 @@ def find_order_by_id(order_id: int) -> Optional[Order]:
     Optional[Order]
         Объект Order, если заказ найден, иначе None.
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         query = "SELECT * FROM orders WHERE id=?"
         result = cursor.execute(query, (order_id,)).fetchone()
@@ -323,6 +843,25 @@ def find_order_by_id(order_id: int) -> Optional[Order]:
         return None
 
 
+@query_cache.cached('orders')
+def find_orders_by_ids(order_ids: Iterable[int]) -> Dict[int, Order]:
+    """
+    Находит заказы по набору идентификаторов.
+
+    Parameters
+    ----------
+    order_ids : Iterable[int]
+        Идентификаторы заказов.
+
+    Returns
+    -------
+    Dict[int, Order]
+        Словарь {идентификатор: Order} для найденных заказов.
+    """
+    return _select_by_ids('orders', order_ids, Order.from_tuple)
+
+
+@query_cache.invalidates('orders')
 def update_order(order_id: int, updates: dict) -> bool:
     """
     Обновляет данные заказа в базе данных только для указанных полей.
@@ -345,13 +884,14 @@ def update_order(order_id: int, updates: dict) -> bool:
     sql_query = f"UPDATE orders SET {','.join(fields_and_values)} WHERE id=?"
     params = tuple(updates.values()) + (order_id,)
 
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(sql_query, params)
         conn.commit()
         return cursor.rowcount > 0
 
 
+@query_cache.invalidates('orders')
 def delete_order(order_id: int) -> None:
     """
     Удаляет заказ по его идентификатору.
@@ -361,12 +901,13 @@ def delete_order(order_id: int) -> None:
     order_id : int
         Идентификатор заказа.
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("DELETE FROM orders WHERE id=?", (order_id,))
         conn.commit()
 
 
+@query_cache.invalidates('order_items')
 def delete_order_list(order_id: int) -> None:
     """
     Удаляет все позиции заказа (order_items), связанные с указанным заказом.
@@ -376,12 +917,13 @@ def delete_order_list(order_id: int) -> None:
     order_id : int
         Идентификатор заказа.
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("DELETE FROM order_items WHERE order_id=?", (order_id,))
         conn.commit()
 
 
+@query_cache.cached('order_items')
 def find_order_list_by_id(order_id: int) -> List[OrderItem]:
     """
     Возвращает позиции заказа по его идентификатору.
@@ -396,7 +938,7 @@ def find_order_list_by_id(order_id: int) -> List[OrderItem]:
     List[OrderItem]
         Список объектов OrderItem, принадлежащих заказу.
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         query = """
             SELECT product_id, quantity 
@@ -407,6 +949,7 @@ def find_order_list_by_id(order_id: int) -> List[OrderItem]:
         return [OrderItem(product_id=row[0], quantity=row[1]) for row in results]
 
 
+@query_cache.cached('orders')
 def select_orders_by_customer_id(customer_id: int) -> List[Order]:
     """
     Возвращает все заказы конкретного клиента.
@@ -421,7 +964,7 @@ def select_orders_by_customer_id(customer_id: int) -> List[Order]:
     List[Order]
         Список объектов Order, относящихся к клиенту.
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         query = """
             SELECT *
@@ -432,6 +975,7 @@ def select_orders_by_customer_id(customer_id: int) -> List[Order]:
         return [Order.from_tuple(row) for row in results]
 
 
+@query_cache.cached('orders', 'order_items')
 def select_orders_by_product_id(product_id: int) -> List[Order]:
     """
     Возвращает все заказы, содержащие указанный продукт.
@@ -446,7 +990,7 @@ def select_orders_by_product_id(product_id: int) -> List[Order]:
     List[Order]
         Список объектов Order, содержащих указанный продукт.
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         query = """
             SELECT DISTINCT o.*
@@ -458,6 +1002,153 @@ def select_orders_by_product_id(product_id: int) -> List[Order]:
         return [Order.from_tuple(row) for row in results]
 
 
+# Полнотекстовые индексы: таблица -> теневая таблица FTS5
+FULLTEXT_TABLES = {
+    'customers': 'customers_fts',
+    'products': 'products_fts',
+    'orders': 'orders_fts',
+}
+
+# Триграммный токенизатор находит только подстроки длиной не менее трёх символов
+FULLTEXT_MIN_LENGTH = 3
+
+
+def _fulltext_query(keyword: str) -> str:
+    """
+    Преобразует ключевое слово в запрос FTS5 для поиска подстроки.
+
+    Parameters
+    ----------
+    keyword : str
+        Ключевое слово для поиска.
+
+    Returns
+    -------
+    str
+        Фраза FTS5 в двойных кавычках.
+
+    Raises
+    ------
+    ValueError
+        Если ключевое слово короче FULLTEXT_MIN_LENGTH символов.
+    """
+    if len(keyword) < FULLTEXT_MIN_LENGTH:
+        raise ValueError(f"Для полнотекстового поиска нужно не менее {FULLTEXT_MIN_LENGTH} символов.")
+    return '"' + keyword.replace('"', '""') + '"'
+
+
+def fulltext_search_ids(table_name: str, keyword: str) -> List[int]:
+    """
+    Возвращает идентификаторы записей, содержащих ключевое слово, в порядке релевантности.
+
+    Поиск регистронезависимый и находит подстроку в любом из проиндексированных полей.
+
+    Parameters
+    ----------
+    table_name : str
+        Название таблицы из FULLTEXT_TABLES.
+    keyword : str
+        Ключевое слово для поиска (не короче FULLTEXT_MIN_LENGTH символов).
+
+    Returns
+    -------
+    List[int]
+        Идентификаторы найденных записей, начиная с наиболее релевантных.
+    """
+    fts_table = FULLTEXT_TABLES[table_name]
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        results = cursor.execute(
+            f"SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH ? ORDER BY rank",
+            (_fulltext_query(keyword),)
+        ).fetchall()
+        return [row[0] for row in results]
+
+
+@query_cache.cached('customers')
+def fulltext_search_customers(keyword: str) -> List[Customer]:
+    """
+    Ищет клиентов по подстроке в идентификаторе, имени, email или телефоне.
+
+    Parameters
+    ----------
+    keyword : str
+        Ключевое слово для поиска (не короче FULLTEXT_MIN_LENGTH символов).
+
+    Returns
+    -------
+    List[Customer]
+        Список объектов Customer в порядке релевантности.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        results = cursor.execute("""
+            SELECT c.id, c.name, c.email, c.phone
+            FROM customers_fts AS f
+            JOIN customers AS c ON c.id = f.rowid
+            WHERE customers_fts MATCH ?
+            ORDER BY f.rank
+        """, (_fulltext_query(keyword),)).fetchall()
+        return [Customer.from_tuple(row) for row in results]
+
+
+@query_cache.cached('products')
+def fulltext_search_products(keyword: str) -> List[Product]:
+    """
+    Ищет товары по подстроке в идентификаторе, названии, цене или количестве.
+
+    Parameters
+    ----------
+    keyword : str
+        Ключевое слово для поиска (не короче FULLTEXT_MIN_LENGTH символов).
+
+    Returns
+    -------
+    List[Product]
+        Список объектов Product в порядке релевантности.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        results = cursor.execute("""
+            SELECT p.id, p.name, p.price, p.quantity
+            FROM products_fts AS f
+            JOIN products AS p ON p.id = f.rowid
+            WHERE products_fts MATCH ?
+            ORDER BY f.rank
+        """, (_fulltext_query(keyword),)).fetchall()
+        return [Product.from_tuple(row) for row in results]
+
+
+@query_cache.cached('orders', 'customers')
+def fulltext_search_orders(keyword: str) -> List[OrderRow]:
+    """
+    Ищет заказы по подстроке в номере, имени покупателя, дате создания, статусе или сумме.
+
+    Заказы, покупатель которых не найден, в результат не попадают.
+
+    Parameters
+    ----------
+    keyword : str
+        Ключевое слово для поиска (не короче FULLTEXT_MIN_LENGTH символов).
+
+    Returns
+    -------
+    List[OrderRow]
+        Список объектов OrderRow в порядке релевантности.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        results = cursor.execute("""
+            SELECT o.id, o.customer_id, c.name, o.date_created, o.status, o.total_amount
+            FROM orders_fts AS f
+            JOIN orders AS o ON o.id = f.rowid
+            JOIN customers AS c ON c.id = o.customer_id
+            WHERE orders_fts MATCH ?
+            ORDER BY f.rank
+        """, (_fulltext_query(keyword),)).fetchall()
+        return [OrderRow.from_tuple(row) for row in results]
+
+
 def select_data(table_name):
     """
     Чтение данных из указанной таблицы и возвращение их в виде списка словарей.
@@ -474,7 +1165,7 @@ def select_data(table_name):
     list
         Список словарей, где ключи — это имена столбцов, а значения — данные из таблицы.
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(f'SELECT * FROM {table_name}')
         headers = [desc[0] for desc in cursor.description]
@@ -497,7 +1188,7 @@ def select_analysis_data(table_name):
     tuple
         Кортеж, состоящий из данных (list) и наименований столбцов (list).
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         query = f"SELECT * FROM {table_name}"
         res = cursor.execute(query).fetchall()
@@ -505,6 +1196,84 @@ def select_analysis_data(table_name):
         return res, cols
 
 
+def _iter_cursor(cursor, batch_size: int) -> Iterator[tuple]:
+    """
+    Построчно отдает результаты запроса, считывая их порциями через fetchmany.
+
+    Parameters
+    ----------
+    cursor : sqlite3.Cursor
+        Курсор с выполненным запросом.
+    batch_size : int
+        Количество строк, считываемых за одно обращение к базе данных.
+
+    Yields
+    ------
+    tuple
+        Очередная строка результата.
+    """
+    try:
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            yield from batch
+    finally:
+        cursor.close()
+
+
+def iter_data(table_name, batch_size: int = 1000):
+    """
+    Потоковое чтение данных из указанной таблицы в виде словарей.
+
+    В отличие от select_data, таблица не загружается в память целиком:
+    строки считываются порциями по мере обхода итератора. Используется для экспорта данных.
+
+    Parameters
+    ----------
+    table_name : str
+        Название таблицы для чтения данных.
+    batch_size : int, optional
+        Количество строк, считываемых за одно обращение к базе данных.
+
+    Returns
+    -------
+    tuple
+        Кортеж из списка наименований столбцов и итератора словарей
+        (ключи — имена столбцов, значения — данные из таблицы).
+    """
+    cursor = get_connection().cursor()
+    cursor.execute(f'SELECT * FROM {table_name}')
+    headers = [desc[0] for desc in cursor.description]
+    return headers, (dict(zip(headers, row)) for row in _iter_cursor(cursor, batch_size))
+
+
+def iter_analysis_data(table_name, batch_size: int = 1000):
+    """
+    Потоковое чтение данных из указанной таблицы в сыром виде.
+
+    Аналог select_analysis_data, возвращающий итератор строк вместо списка.
+    Используется для нужд анализа данных.
+
+    Parameters
+    ----------
+    table_name : str
+        Название таблицы для чтения данных.
+    batch_size : int, optional
+        Количество строк, считываемых за одно обращение к базе данных.
+
+    Returns
+    -------
+    tuple
+        Кортеж, состоящий из итератора строк (tuple) и наименований столбцов (list).
+    """
+    cursor = get_connection().cursor()
+    cursor.execute(f"SELECT * FROM {table_name}")
+    cols = [desc[0] for desc in cursor.description]
+    return _iter_cursor(cursor, batch_size), cols
+
+
+@query_cache.invalidates(table_arg='table_name')
 def truncate_table(table_name):
     """
     Очищает таблицу перед импортом данных.
@@ -514,31 +1283,376 @@ def truncate_table(table_name):
     table_name : str
         Название таблицы для очистки.
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(f'DELETE FROM {table_name}')
         conn.commit()
 
 
-def bulk_insert_data(table_name, data):
+# Настройки PRAGMA, временно включаемые на время массовой загрузки
+BULK_LOAD_PRAGMAS = {
+    'synchronous': 'OFF',
+    'cache_size': -200000,
+    'temp_store': 'MEMORY',
+}
+
+
+@contextmanager
+def _bulk_load_pragmas(conn, enabled: bool):
+    """
+    Включает на время загрузки настройки BULK_LOAD_PRAGMAS, затем восстанавливает настройки профиля.
+    """
+    if enabled:
+        for name, value in BULK_LOAD_PRAGMAS.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+    try:
+        yield
+    finally:
+        if enabled:
+            profile = connection_manager.profile
+            for name in BULK_LOAD_PRAGMAS:
+                conn.execute(f"PRAGMA {name} = {getattr(profile, name)}")
+
+
+def _insert_records(cursor, table_name, data, chunk_size: int, progress=None) -> int:
+    """
+    Вставляет записи в таблицу порциями в текущей транзакции.
+
+    Returns
+    -------
+    int
+        Количество вставленных записей.
+    """
+    iterator = iter(data)
+    first_record = next(iterator, None)
+    if first_record is None:
+        return 0
+    columns = list(first_record.keys())
+    placeholders = ", ".join(["?"] * len(columns))
+    query = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})"
+    rows = (tuple(record[column] for column in columns) for record in chain([first_record], iterator))
+    rows_done = 0
+    started = time.perf_counter()
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        cursor.executemany(query, chunk)
+        rows_done += len(chunk)
+        if progress is not None:
+            elapsed = time.perf_counter() - started
+            progress(rows_done, rows_done / elapsed if elapsed > 0 else 0.0)
+    return rows_done
+
+
+@query_cache.invalidates(table_arg='table_name')
+def bulk_insert_data(table_name, data, chunk_size: int = 5000, replace: bool = False,
+                     bulk_pragmas: bool = False, progress=None) -> int:
     """
     Массивный импорт данных в таблицу.
 
+    Записи вставляются порциями фиксированного размера в рамках одной транзакции,
+    поэтому источник данных может быть итератором произвольной длины: в памяти
+    одновременно находится не более одной порции.
+
+    Parameters
+    ----------
+    table_name : str
+        Название таблицы, в которую вносятся данные.
+    data : iterable
+        Список или итератор словарей, где каждое значение соответствует одному элементу данных.
+        Набор столбцов определяется по первой записи.
+    chunk_size : int, optional
+        Количество записей в одной порции executemany.
+    replace : bool, optional
+        Если True, таблица очищается в той же транзакции перед вставкой.
+    bulk_pragmas : bool, optional
+        Если True, на время загрузки включаются настройки BULK_LOAD_PRAGMAS
+        (без синхронизации с диском), затем восстанавливаются настройки текущего профиля.
+    progress : callable, optional
+        Функция progress(rows_done, rows_per_sec), вызываемая после каждой порции.
+
+    Returns
+    -------
+    int
+        Количество вставленных записей.
+    """
+    conn = get_connection()
+    with _bulk_load_pragmas(conn, bulk_pragmas), conn:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        if replace:
+            cursor.execute(f'DELETE FROM {table_name}')
+        rows_done = _insert_records(cursor, table_name, data, chunk_size, progress)
+        conn.commit()
+    return rows_done
+
+
+def bulk_insert_many(tables, chunk_size: int = 5000, bulk_pragmas: bool = False, progress=None) -> Dict[str, int]:
+    """
+    Заменяет содержимое нескольких таблиц в рамках одной транзакции.
+
+    Сначала очищаются все таблицы, затем они заполняются в указанном порядке, как в bulk_insert_data.
+    Если загрузка любой таблицы завершается ошибкой, откатываются изменения всех таблиц, поэтому
+    связанные таблицы (например, заказы и их позиции) не остаются в несогласованном состоянии.
+
+    Parameters
+    ----------
+    tables : list
+        Список пар (название таблицы, список или итератор словарей с данными).
+    chunk_size : int, optional
+        Количество записей в одной порции executemany.
+    bulk_pragmas : bool, optional
+        Если True, на время загрузки включаются настройки BULK_LOAD_PRAGMAS.
+    progress : callable, optional
+        Функция progress(rows_done, rows_per_sec), вызываемая после каждой порции
+        (количество строк отсчитывается заново для каждой таблицы).
+
+    Returns
+    -------
+    dict
+        Количество вставленных записей по таблицам.
+    """
+    tables = list(tables)
+    conn = get_connection()
+    counts = {}
+    try:
+        with _bulk_load_pragmas(conn, bulk_pragmas), conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            for table_name, _ in tables:
+                cursor.execute(f'DELETE FROM {table_name}')
+            for table_name, data in tables:
+                counts[table_name] = _insert_records(cursor, table_name, data, chunk_size, progress)
+            conn.commit()
+    finally:
+        query_cache.invalidate(*(table_name for table_name, _ in tables))
+    return counts
+
+
+# Ссылки на записи таблиц: (ссылающаяся таблица, столбец, удалять ли ссылающиеся записи вместе с записью)
+TABLE_REFERENCES = {
+    'customers': (('orders', 'customer_id', False),),
+    'products': (('order_items', 'product_id', False),),
+    'orders': (('order_items', 'order_id', True),),
+}
+
+
+def _merge_records(cursor, table_name, data, delete_missing: bool, chunk_size: int, progress=None) -> Dict[str, int]:
+    """
+    Объединяет записи с таблицей по идентификатору в текущей транзакции (см. merge_data).
+    """
+    chunk_size = min(chunk_size, MAX_QUERY_VARIABLES)
+    counts = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'deleted': 0}
+    iterator = iter(data)
+    first_record = next(iterator, None)
+    # Идентификаторы из источника копятся во временной таблице, а не в памяти
+    cursor.execute("CREATE TEMP TABLE IF NOT EXISTS merge_ids (id INTEGER PRIMARY KEY)")
+    cursor.execute("DELETE FROM temp.merge_ids")
+    if first_record is not None:
+        columns = list(first_record.keys())
+        if 'id' not in columns:
+            raise ValueError(f"Для объединения с таблицей {table_name} в данных нужен столбец 'id'.")
+        id_index = columns.index('id')
+        value_columns = [column for column in columns if column != 'id']
+        query = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})"
+        if value_columns:
+            assignments = ", ".join(f"{column} = excluded.{column}" for column in value_columns)
+            current = ", ".join(f"{table_name}.{column}" for column in value_columns)
+            incoming = ", ".join(f"excluded.{column}" for column in value_columns)
+            query += f" ON CONFLICT(id) DO UPDATE SET {assignments} WHERE ({current}) IS NOT ({incoming})"
+        else:
+            query += " ON CONFLICT(id) DO NOTHING"
+        rows = (tuple(record[column] for column in columns) for record in chain([first_record], iterator))
+        rows_done = 0
+        started = time.perf_counter()
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            # Из нескольких записей с одним идентификатором действует последняя
+            records = {int(row[id_index]): row for row in chunk}
+            ids = list(records)
+            placeholders = ', '.join(['?'] * len(ids))
+            cursor.execute(f"SELECT id FROM temp.merge_ids WHERE id IN ({placeholders})", ids)
+            seen = {row[0] for row in cursor.fetchall()}
+            # Записи, идентификаторы которых встречались в предыдущих порциях, уже учтены
+            cursor.executemany(query, [records[i] for i in ids if i in seen])
+            fresh_ids = [i for i in ids if i not in seen]
+            if fresh_ids:
+                cursor.execute(
+                    f"SELECT COUNT(*) FROM {table_name} WHERE id IN ({', '.join(['?'] * len(fresh_ids))})", fresh_ids
+                )
+                existing = cursor.fetchone()[0]
+                # rowcount учитывает только вставленные и фактически изменённые строки
+                cursor.executemany(query, [records[i] for i in fresh_ids])
+                inserted = len(fresh_ids) - existing
+                updated = cursor.rowcount - inserted
+                counts['inserted'] += inserted
+                counts['updated'] += updated
+                counts['unchanged'] += existing - updated
+                cursor.executemany("INSERT INTO temp.merge_ids (id) VALUES (?)", [(i,) for i in fresh_ids])
+            rows_done += len(chunk)
+            if progress is not None:
+                elapsed = time.perf_counter() - started
+                progress(rows_done, rows_done / elapsed if elapsed > 0 else 0.0)
+    if delete_missing:
+        missing = f"SELECT id FROM {table_name} WHERE id NOT IN (SELECT id FROM temp.merge_ids)"
+        for referencing_table, column, cascade in TABLE_REFERENCES.get(table_name, ()):
+            if cascade:
+                cursor.execute(f"DELETE FROM {referencing_table} WHERE {column} IN ({missing})")
+                continue
+            cursor.execute(f"SELECT COUNT(*) FROM {referencing_table} WHERE {column} IN ({missing})")
+            referenced = cursor.fetchone()[0]
+            if referenced:
+                raise ValueError(f"Нельзя удалить записи таблицы {table_name}, отсутствующие в данных: "
+                                 f"на них ссылаются записи таблицы {referencing_table} ({referenced}).")
+        cursor.execute(f"DELETE FROM {table_name} WHERE id NOT IN (SELECT id FROM temp.merge_ids)")
+        counts['deleted'] = cursor.rowcount
+    cursor.execute("DROP TABLE temp.merge_ids")
+    return counts
+
+
+def _replace_order_items(cursor, items, delete_orphans: bool, chunk_size: int, progress=None) -> int:
+    """
+    Заменяет позиции заказов, встречающихся в данных, в текущей транзакции (см. replace_order_items).
+    """
+    rows = ((item['order_id'], item['product_id'], item['quantity']) for item in items)
+    cleared = set()
+    rows_done = 0
+    started = time.perf_counter()
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        # Старые позиции заказа удаляются при первой встрече его идентификатора
+        new_order_ids = {int(row[0]) for row in chunk} - cleared
+        cursor.executemany("DELETE FROM order_items WHERE order_id = ?", [(i,) for i in new_order_ids])
+        cleared |= new_order_ids
+        cursor.executemany("INSERT INTO order_items (order_id, product_id, quantity) VALUES (?, ?, ?)", chunk)
+        rows_done += len(chunk)
+        if progress is not None:
+            elapsed = time.perf_counter() - started
+            progress(rows_done, rows_done / elapsed if elapsed > 0 else 0.0)
+    if delete_orphans:
+        cursor.execute("DELETE FROM order_items WHERE order_id NOT IN (SELECT id FROM orders)")
+    return rows_done
+
+
+# Удаление заказов при объединении затрагивает и их позиции (TABLE_REFERENCES)
+@query_cache.invalidates('order_items', table_arg='table_name')
+def merge_data(table_name, data, delete_missing: bool = False, chunk_size: int = MAX_QUERY_VARIABLES,
+               progress=None) -> Dict[str, int]:
+    """
+    Объединяет данные с содержимым таблицы по идентификатору записи.
+
+    Новые записи добавляются, существующие обновляются только при отличии хотя бы одного поля
+    (INSERT ... ON CONFLICT(id) DO UPDATE ... WHERE), поэтому неизменённые строки не перезаписываются.
+    Если идентификатор встречается в данных несколько раз, действует последняя запись, а в сводке
+    запись учитывается один раз. Все изменения выполняются в одной транзакции.
+
     Parameters
     ----------
     table_name : str
         Название таблицы, в которую вносятся данные.
-    data : list
-        Список словарей, где каждое значение соответствует одному элементу данных.
+    data : iterable
+        Список или итератор словарей с обязательным ключом 'id'.
+        Набор столбцов определяется по первой записи.
+    delete_missing : bool, optional
+        Если True, из таблицы удаляются записи, идентификаторов которых нет в данных. Вместе с заказами
+        удаляются их позиции; клиенты и товары, на которые ссылаются заказы, не удаляются (ValueError).
+    chunk_size : int, optional
+        Количество записей в одной порции (не больше MAX_QUERY_VARIABLES).
+    progress : callable, optional
+        Функция progress(rows_done, rows_per_sec), вызываемая после каждой порции.
+
+    Returns
+    -------
+    dict
+        Количество записей по категориям: 'inserted', 'updated', 'unchanged' и 'deleted'.
+
+    Raises
+    ------
+    ValueError
+        Если в записях отсутствует столбец 'id' или удаляемые записи используются в других таблицах.
+        Изменения при этом не сохраняются.
+    """
+    conn = get_connection()
+    with conn:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        counts = _merge_records(cursor, table_name, data, delete_missing, chunk_size, progress)
+        conn.commit()
+    return counts
+
+
+@query_cache.invalidates('order_items')
+def replace_order_items(items, delete_orphans: bool = False, chunk_size: int = 5000, progress=None) -> int:
+    """
+    Заменяет позиции заказов, встречающихся в данных, на переданные позиции.
+
+    У позиций заказа нет идентификаторов в файлах импорта, поэтому при объединении
+    набор позиций каждого упомянутого заказа записывается заново, а позиции
+    остальных заказов не затрагиваются. Все изменения выполняются в одной транзакции.
+
+    Parameters
+    ----------
+    items : iterable
+        Список или итератор словарей с ключами 'order_id', 'product_id' и 'quantity'.
+    delete_orphans : bool, optional
+        Если True, удаляются позиции, заказов которых нет в таблице orders.
+    chunk_size : int, optional
+        Количество записей в одной порции executemany.
+    progress : callable, optional
+        Функция progress(rows_done, rows_per_sec), вызываемая после каждой порции.
+
+    Returns
+    -------
+    int
+        Количество вставленных позиций.
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    conn = get_connection()
+    with conn:
         cursor = conn.cursor()
-        first_record = data[0]
-        columns = ", ".join(first_record.keys())
-        placeholders = ", ".join(["?"] * len(first_record))
-        query = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
-        cursor.executemany(query, [tuple(d.values()) for d in data])
+        cursor.execute("BEGIN IMMEDIATE")
+        rows_done = _replace_order_items(cursor, items, delete_orphans, chunk_size, progress)
         conn.commit()
+    return rows_done
+
+
+@query_cache.invalidates('orders', 'order_items')
+def merge_orders_details(orders, items, delete_missing: bool = False, progress=None) -> Dict[str, int]:
+    """
+    Объединяет заказы с таблицей orders и заменяет позиции упомянутых заказов в одной транзакции.
+
+    Заказы объединяются как в merge_data, позиции заменяются как в replace_order_items. Если загрузка
+    позиций завершается ошибкой, откатывается и объединение заказов.
+
+    Parameters
+    ----------
+    orders : iterable
+        Список или итератор словарей заказов с обязательным ключом 'id'.
+    items : iterable
+        Список или итератор словарей с ключами 'order_id', 'product_id' и 'quantity'.
+    delete_missing : bool, optional
+        Если True, удаляются заказы, отсутствующие в данных, и позиции без заказов.
+    progress : callable, optional
+        Функция progress(rows_done, rows_per_sec), вызываемая после каждой порции.
+
+    Returns
+    -------
+    dict
+        Количество заказов по категориям, как в merge_data.
+    """
+    conn = get_connection()
+    with conn:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        counts = _merge_records(cursor, 'orders', orders, delete_missing, MAX_QUERY_VARIABLES, progress)
+        _replace_order_items(cursor, items, delete_missing, 5000, progress)
+        conn.commit()
+    return counts
+
 
 def select_all_orders_with_items():
     """
@@ -550,7 +1664,7 @@ def select_all_orders_with_items():
         Список заказов, где каждый заказ представлен объектом с полем `items`,
         которое содержит список позиций заказа (продукт и количество).
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute('''
             SELECT o.id, o.customer_id, o.date_created, o.status, o.total_amount, oi.product_id, oi.quantity
@@ -577,4 +1691,49 @@ def select_all_orders_with_items():
             # Добавляем позицию заказа
             if product_id is not None:
                 grouped_results[order_id]['items'].append({'product_id': product_id, 'quantity': quantity})
-        return list(grouped_results.values())
\ No newline at end of file
+        return list(grouped_results.values())
+
+
+def iter_all_orders_with_items(batch_size: int = 1000) -> Iterator[dict]:
+    """
+    Потоково извлекает заказы вместе с их позициями.
+
+    Аналог select_all_orders_with_items: заказы отдаются по одному в порядке
+    идентификаторов, без загрузки всей таблицы в память.
+
+    Parameters
+    ----------
+    batch_size : int, optional
+        Количество строк, считываемых за одно обращение к базе данных.
+
+    Yields
+    ------
+    dict
+        Заказ с полем `items`, которое содержит список позиций заказа (продукт и количество).
+    """
+    cursor = get_connection().cursor()
+    cursor.execute('''
+        SELECT o.id, o.customer_id, o.date_created, o.status, o.total_amount, oi.product_id, oi.quantity
+        FROM orders o
+        LEFT JOIN order_items oi ON o.id = oi.order_id
+        ORDER BY o.id
+    ''')
+    current = None
+    for row in _iter_cursor(cursor, batch_size):
+        order_id, customer_id, date_created, status, total_amount, product_id, quantity = row
+        # Строки отсортированы по заказу, поэтому смена идентификатора означает конец предыдущего заказа
+        if current is None or current['id'] != order_id:
+            if current is not None:
+                yield current
+            current = {
+                'id': order_id,
+                'customer_id': customer_id,
+                'date_created': datetime.strptime(date_created.split('.')[0], "%Y-%m-%d %H:%M:%S"),
+                'status': status,
+                'total_amount': total_amount,
+                'items': []
+            }
+        if product_id is not None:
+            current['items'].append({'product_id': product_id, 'quantity': quantity})
+    if current is not None:
+        yield current
\ No newline at end of file
@@ -4,13 +4,47 @@
 """
 
 import tkinter as tk
+from functools import partial
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
 import matplotlib.pyplot as plt
 import networkx as nx
 from tkinter import messagebox, ttk
 from tkinter.filedialog import askopenfilename, asksaveasfilename
-from controllers import AppController
+from controllers import AppController, init_analysis_worker, compute_analysis, compute_connections
+from connection import DEFAULT_PROFILE
+from instrumentation import instrumentation, track_queries
+from analysis import TOP_METRIC_COLUMNS
+from layout import LayoutCache
+from tasks import TaskRunner
+from widgets import VirtualTable, sequence_source
+
+# Подписи метрик рейтинга покупателей: метрика -> (пункт списка, подпись оси, заголовок графика)
+TOP_METRIC_LABELS = {
+    'orders': ("по числу заказов", "Количество заказов", "ТОП-5 покупателей по числу заказов"),
+    'revenue': ("по выручке", "Выручка", "ТОП-5 покупателей по выручке"),
+}
+
+# Подписи интервалов группировки заказов: интервал -> (пункт списка, заголовок графика)
+DATE_BUCKET_LABELS = {
+    'day': ("по дням", "Динамика количества заказов по дням"),
+    'week': ("по неделям", "Динамика количества заказов по неделям"),
+    'month': ("по месяцам", "Динамика количества заказов по месяцам"),
+}
+
+# Параметры прореживания графа связей покупателей по умолчанию: граф остаётся читаемым
+# и быстро раскладывается независимо от числа покупателей
+GRAPH_DEFAULTS = {'min_weight': 1, 'top_k': 3, 'max_nodes': 50}
+
+# Режимы обновления вкладки аналитики: режим -> пункт списка
+ANALYSIS_REFRESH_MODES = {
+    'auto': "при открытии вкладки",
+    'timed': "по таймеру",
+    'manual': "вручную",
+}
+
+# Период проверки устаревших графиков в режиме обновления по таймеру (в миллисекундах)
+ANALYSIS_REFRESH_INTERVAL_MS = 30000
 
 class MainApp(tk.Tk):
     """
@@ -28,17 +62,37 @@ class MainApp(tk.Tk):
         Параметры сортировки данных.
     search_entries : dict
         Словарь для хранения ссылок на поля поиска.
+    tasks : TaskRunner
+        Исполнитель фоновых задач (загрузка заказов, аналитика, импорт и экспорт).
+    customers_table, products_table, orders_table : VirtualTable
+        Строки деревьев клиентов, товаров и заказов: обновляются по отличиям от новых данных,
+        а большие списки выводятся виртуально.
     """
 
-    def __init__(self):
+    def __init__(self, db_profile=DEFAULT_PROFILE):
         """
         Инициализация главного окна приложения.
+
+        Parameters
+        ----------
+        db_profile : str, optional
+            Профиль настроек SQLite ("durable" или "fast").
         """
         super().__init__()
         plt.ioff()
         self.title("Интернет-магазин | Менеджмент клиентов и заказов")
         self.geometry("1200x800")
-        self.controller = AppController(self)
+        self.controller = AppController(self, db_profile=db_profile)
+        # Раскладка графа связей покупателей, сохранённая в прошлых запусках
+        self.layout_cache = LayoutCache()
+        self.layout_cache.load()
+        # Долгие операции выполняются в фоне: запросы — в потоках, аналитика — в отдельном процессе
+        self.tasks = TaskRunner(self, cpu_initializer=init_analysis_worker,
+                                cpu_initargs=(self.controller.db_path, self.controller.db_profile,
+                                              instrumentation.settings()),
+                                on_busy=self.on_busy_changed)
+        self.action_buttons = []  # Кнопки изменения данных, недоступные во время импорта
+        self.transfer_buttons = []  # Кнопки импорта и экспорта
         style = ttk.Style(self)
         style.theme_use('clam')
         style.configure('Treeview.Heading', background='lightyellow')
@@ -50,15 +104,45 @@ class MainApp(tk.Tk):
             "products": None,
             "orders": None
         }
+        self.create_status_bar()
         self.create_tabs()
 
+    def create_status_bar(self):
+        """
+        Создание строки состояния с индикатором выполнения фоновых задач.
+        """
+        status_frame = ttk.Frame(self)
+        status_frame.pack(side="bottom", fill="x")
+        self.busy_progressbar = ttk.Progressbar(status_frame, mode="indeterminate", length=150)
+        self.label_status = ttk.Label(status_frame, text="")
+        self.busy_progressbar.pack(side="right", padx=5, pady=2)
+        self.label_status.pack(side="right", padx=5)
+
+    def on_busy_changed(self, busy):
+        """
+        Показывает индикатор занятости, пока выполняются фоновые задачи.
+
+        Parameters
+        ----------
+        busy : bool
+            True, если есть выполняющиеся задачи.
+        """
+        if busy:
+            self.label_status.config(text="Выполняется...")
+            self.busy_progressbar.start(10)
+            self.config(cursor="watch")
+        else:
+            self.label_status.config(text="")
+            self.busy_progressbar.stop()
+            self.config(cursor="")
+
     def create_menus(self):
         """
         Создание пунктов меню в приложении.
         """
         menu_bar = tk.Menu(self)
         file_menu = tk.Menu(menu_bar, tearoff=False)
-        file_menu.add_command(label="Выход", command=self.quit)
+        file_menu.add_command(label="Выход", command=self.on_close)
         menu_bar.add_cascade(label="Файл", menu=file_menu)
 
         help_menu = tk.Menu(menu_bar, tearoff=False)
@@ -73,6 +157,12 @@ class MainApp(tk.Tk):
         """
         Обработчик события закрытия окна.
         """
+        self.tasks.shutdown()
+        try:
+            self.layout_cache.save()
+        except OSError:
+            pass  # Раскладка будет пересчитана при следующем запуске
+        self.controller.close()
         self.quit()
 
     def show_about_dialog(self):
@@ -96,6 +186,9 @@ class MainApp(tk.Tk):
         tab_control.add(self.tab_orders, text="Заказы")
         tab_control.add(self.tab_analysis, text="Аналитика и визуализация")
         tab_control.pack(expand=True, fill="both")
+        self.tab_control = tab_control
+        # Аналитика вычисляется только при открытии своей вкладки
+        tab_control.bind("<<NotebookTabChanged>>", self.on_tab_changed)
 
         self.setup_customers_tab()
         self.setup_products_tab()
@@ -157,7 +250,7 @@ class MainApp(tk.Tk):
         self.customers_treeview.pack(fill="both", expand=True)
         scrollbar = ttk.Scrollbar(frame, orient="vertical", command=self.customers_treeview.yview)
         scrollbar.pack(side="right", fill="y")
-        self.customers_treeview.configure(yscrollcommand=scrollbar.set)
+        self.customers_table = VirtualTable(self.customers_treeview, scrollbar)
 
         # Панель действий
         actions_frame = ttk.Frame(frame)
@@ -172,6 +265,8 @@ class MainApp(tk.Tk):
         export_button.pack(side="left", padx=5)
         import_button.pack(side="left", padx=5)
         actions_frame.pack(fill="x", padx=5, pady=5)
+        self.action_buttons += [add_button, edit_button, del_button, export_button, import_button]
+        self.transfer_buttons += [export_button, import_button]
 
         # Загрузка данных при запуске
         self.load_customers()
@@ -181,9 +276,7 @@ class MainApp(tk.Tk):
         Обновляет дерево клиентов на основании данных, полученных от контроллера.
         """
         customers = self.controller.load_customers()
-        self.customers_treeview.delete(*self.customers_treeview.get_children())
-        for cust in customers:
-            self.customers_treeview.insert("", "end", values=(cust.id, cust.name, cust.email, cust.phone))
+        self.customers_table.load(len(customers), sequence_source(customers, self.customer_values))
 
     def search_customers(self):
         """
@@ -191,9 +284,24 @@ class MainApp(tk.Tk):
         """
         keyword = self.search_var.get().strip()
         filtered_customers = self.controller.search_customers(keyword)
-        self.customers_treeview.delete(*self.customers_treeview.get_children())
-        for cust in filtered_customers:
-            self.customers_treeview.insert("", "end", values=(cust.id, cust.name, cust.email, cust.phone))
+        self.customers_table.load(len(filtered_customers), sequence_source(filtered_customers, self.customer_values),
+                                  keep_position=False)
+
+    def customer_values(self, cust):
+        """
+        Возвращает значения строки дерева клиентов.
+
+        Parameters
+        ----------
+        cust : Customer
+            Клиент.
+
+        Returns
+        -------
+        tuple
+            Значения столбцов дерева клиентов.
+        """
+        return cust.id, cust.name, cust.email, cust.phone
 
     def open_add_customer_dialog(self):
         """
@@ -230,7 +338,7 @@ class MainApp(tk.Tk):
             if res[0]:
                 messagebox.showwarning("Подтверждение", f"Клиент {item[1]} удален!")
                 self.load_customers()
-                self.load_analysis()
+                self.invalidate_analysis()
             else:
                 messagebox.showwarning("Ошибка", res[1])
 
@@ -244,11 +352,7 @@ class MainApp(tk.Tk):
         ])
         if filename:
             extension = filename.rsplit('.', 1)[-1].lower()
-            success, error_msg = self.controller.export_data(filename, "customers", extension)
-            if success:
-                messagebox.showinfo("Экспорировано", f"Данные успешно экспортированы в файл {filename}.")
-            else:
-                messagebox.showerror("Ошибка экспорта", f"Возникла ошибка при экспорте: {error_msg}")
+            self.run_export(filename, "customers", extension)
 
     def import_customers(self):
         """
@@ -259,15 +363,106 @@ class MainApp(tk.Tk):
             ("JSON files", "*.json")
         ])
         if filename:
+            import_mode = self.ask_import_mode()
+            if import_mode is None:
+                return
             extension = filename.rsplit('.', 1)[-1].lower()
-            success, error_msg = self.controller.import_data(filename, "customers", extension)
+            self.run_import(filename, "customers", extension, import_mode, self.load_customers)
+
+    def run_export(self, filename, entity_name, extension):
+        """
+        Запускает экспорт в фоне; кнопки импорта и экспорта недоступны до его завершения.
+
+        Parameters
+        ----------
+        filename : str
+            Путь к файлу экспорта.
+        entity_name : str
+            Экспортируемая сущность.
+        extension : str
+            Формат файла ('csv' или 'json').
+        """
+        def on_done(result):
+            success, error_msg = result
             if success:
-                messagebox.showinfo("Импорт завершен", f"Данные успешно импортированы из файла {filename}.")
-                self.load_customers()
-                self.load_analysis()
+                messagebox.showinfo("Экспорировано", f"Данные успешно экспортированы в файл {filename}.")
+            else:
+                messagebox.showerror("Ошибка экспорта", f"Возникла ошибка при экспорте: {error_msg}")
+
+        self.tasks.submit('transfer', self.controller.export_data, filename, entity_name, extension,
+                          on_success=on_done, on_error=self.show_task_error, widgets=self.transfer_buttons)
+
+    def run_import(self, filename, entity_name, extension, import_mode, reload):
+        """
+        Запускает импорт в фоне; кнопки изменения данных недоступны до его завершения.
+
+        Parameters
+        ----------
+        filename : str
+            Путь к импортируемому файлу.
+        entity_name : str
+            Импортируемая сущность.
+        extension : str
+            Формат файла ('csv' или 'json').
+        import_mode : tuple
+            Режим импорта и признак удаления отсутствующих записей (см. ask_import_mode).
+        reload : callable
+            Обновляет список на вкладке импортированной сущности.
+        """
+        def on_done(result):
+            success, error_msg = result
+            if success:
+                self.show_import_result(filename, error_msg)
+                reload()
+                self.invalidate_analysis()
             else:
                 messagebox.showerror("Ошибка импорта", f"Возникла ошибка при импорте: {error_msg}")
 
+        self.tasks.submit('transfer', self.controller.import_data, filename, entity_name, extension, *import_mode,
+                          on_success=on_done, on_error=self.show_task_error, widgets=self.action_buttons)
+
+    def ask_import_mode(self):
+        """
+        Запрашивает у пользователя режим импорта.
+
+        Returns
+        -------
+        tuple or None
+            Режим импорта ('replace' или 'merge') и признак удаления отсутствующих в файле записей,
+            либо None, если импорт отменён.
+        """
+        merge = messagebox.askyesnocancel(
+            "Режим импорта",
+            "Объединить данные из файла с текущими?\n\n"
+            "Да — добавить новые и обновить изменённые записи.\n"
+            "Нет — полностью заменить данные содержимым файла."
+        )
+        if merge is None:
+            return None
+        if not merge:
+            return 'replace', False
+        delete_missing = messagebox.askyesno(
+            "Режим импорта",
+            "Удалить записи, которых нет в файле?"
+        )
+        return 'merge', delete_missing
+
+    def show_import_result(self, filename, summary=None):
+        """
+        Сообщает об успешном импорте.
+
+        Parameters
+        ----------
+        filename : str
+            Имя импортированного файла.
+        summary : str, optional
+            Сводка изменений при объединении данных.
+        """
+        message = f"Данные успешно импортированы из файла {filename}."
+        if summary:
+            message += f"\n{summary}"
+        messagebox.showinfo("Импорт завершен", message)
+
     def setup_products_tab(self):
         """
         Настройка вкладки "Товары".
@@ -296,7 +491,7 @@ class MainApp(tk.Tk):
         self.products_treeview.pack(fill="both", expand=True)
         scrollbar = ttk.Scrollbar(frame, orient="vertical", command=self.products_treeview.yview)
         scrollbar.pack(side="right", fill="y")
-        self.products_treeview.configure(yscrollcommand=scrollbar.set)
+        self.products_table = VirtualTable(self.products_treeview, scrollbar)
 
         # Панель действий
         actions_frame = ttk.Frame(frame)
@@ -311,6 +506,8 @@ class MainApp(tk.Tk):
         export_button.pack(side="left", padx=5)
         import_button.pack(side="left", padx=5)
         actions_frame.pack(fill="x", padx=5, pady=5)
+        self.action_buttons += [add_button, edit_button, del_button, export_button, import_button]
+        self.transfer_buttons += [export_button, import_button]
 
         # Загрузка данных при запуске
         self.load_products()
@@ -320,9 +517,7 @@ class MainApp(tk.Tk):
         Обновляет дерево товаров на основании данных, полученных от контроллера.
         """
         products = self.controller.load_products()
-        self.products_treeview.delete(*self.products_treeview.get_children())
-        for prod in products:
-            self.products_treeview.insert("", "end", values=(prod.id, prod.name, prod.price, prod.quantity))
+        self.products_table.load(len(products), sequence_source(products, self.product_values))
 
     def search_products(self):
         """
@@ -330,9 +525,24 @@ class MainApp(tk.Tk):
         """
         keyword = self.search_prod_var.get().strip()
         filtered_products = self.controller.search_products(keyword)
-        self.products_treeview.delete(*self.products_treeview.get_children())
-        for prod in filtered_products:
-            self.products_treeview.insert("", "end", values=(prod.id, prod.name, prod.price, prod.quantity))
+        self.products_table.load(len(filtered_products), sequence_source(filtered_products, self.product_values),
+                                 keep_position=False)
+
+    def product_values(self, prod):
+        """
+        Возвращает значения строки дерева товаров.
+
+        Parameters
+        ----------
+        prod : Product
+            Товар.
+
+        Returns
+        -------
+        tuple
+            Значения столбцов дерева товаров.
+        """
+        return prod.id, prod.name, prod.price, prod.quantity
 
     def open_add_product_dialog(self):
         """
@@ -369,7 +579,7 @@ class MainApp(tk.Tk):
             if res[0]:
                 messagebox.showwarning("Подтверждение", f"Товар '{item[1]}' удален!")
                 self.load_products()
-                self.load_analysis()
+                self.invalidate_analysis()
             else:
                 messagebox.showwarning("Ошибка", res[1])
 
@@ -383,11 +593,7 @@ class MainApp(tk.Tk):
         ])
         if filename:
             extension = filename.rsplit('.', 1)[-1].lower()
-            success, error_msg = self.controller.export_data(filename, "products", extension)
-            if success:
-                messagebox.showinfo("Экспорировано", f"Данные успешно экспортированы в файл {filename}.")
-            else:
-                messagebox.showerror("Ошибка экспорта", f"Возникла ошибка при экспорте: {error_msg}")
+            self.run_export(filename, "products", extension)
 
     def import_products(self):
         """
@@ -398,14 +604,11 @@ class MainApp(tk.Tk):
             ("JSON files", "*.json")
         ])
         if filename:
+            import_mode = self.ask_import_mode()
+            if import_mode is None:
+                return
             extension = filename.rsplit('.', 1)[-1].lower()
-            success, error_msg = self.controller.import_data(filename, "products", extension)
-            if success:
-                messagebox.showinfo("Импорт завершен", f"Данные успешно импортированы из файла {filename}.")
-                self.load_products()
-                self.load_analysis()
-            else:
-                messagebox.showerror("Ошибка импорта", f"Возникла ошибка при импорте: {error_msg}")
+            self.run_import(filename, "products", extension, import_mode, self.load_products)
 
     def setup_orders_tab(self):
         """
@@ -445,7 +648,7 @@ class MainApp(tk.Tk):
         self.orders_treeview.pack(fill="both", expand=True)
         scrollbar = ttk.Scrollbar(frame, orient="vertical", command=self.orders_treeview.yview)
         scrollbar.pack(side="right", fill="y")
-        self.orders_treeview.configure(yscrollcommand=scrollbar.set)
+        self.orders_table = VirtualTable(self.orders_treeview, scrollbar)
 
         # Панель действий
         actions_frame = ttk.Frame(frame)
@@ -460,6 +663,8 @@ class MainApp(tk.Tk):
         export_button.pack(side="left", padx=5)
         import_button.pack(side="left", padx=5)
         actions_frame.pack(fill="x", padx=5, pady=5)
+        self.action_buttons += [add_button, edit_button, del_button, export_button, import_button]
+        self.transfer_buttons += [export_button, import_button]
 
         # Загрузка данных при запуске
         self.load_orders()
@@ -486,23 +691,85 @@ class MainApp(tk.Tk):
             "heading": new_column,
             new_column: new_dir
         }
-        # Обновляем список заказов с учётом новых параметров сортировки
-        self.load_orders()
+        # Обновляем список заказов с учётом новых параметров сортировки и выводим его с начала
+        self.load_orders(keep_position=False)
+
+    def load_orders(self, keep_position=True):
+        """
+        Обновляет дерево заказов с учётом текущей сортировки.
+
+        Строки загружаются в фоне участками по мере прокрутки (см. request_orders); размер полосы
+        прокрутки определяется количеством заказов. Загрузка, запущенная ранее, отменяется.
+
+        Parameters
+        ----------
+        keep_position : bool, optional
+            Сохранить положение прокрутки. False — вывести список с начала.
+        """
+        self.tasks.cancel('orders')
+        self.orders_table.load(self.controller.count_orders(), self.request_orders, keep_position)
 
-    def load_orders(self):
+    def request_orders(self, offset, limit, callback, failure, seek):
         """
-        Обновляет дерево заказов на основании данных, полученных от контроллера.
+        Загружает в фоне участок отсортированного списка заказов для дерева заказов.
+
+        Участок читается от ближайшей известной строки по ключу сортировки (keyset), а не через
+        OFFSET, поэтому загрузка не замедляется по мере удаления от начала списка.
+
+        Parameters
+        ----------
+        offset : int
+            Номер первой строки участка.
+        limit : int
+            Максимальное число строк участка.
+        callback : callable
+            Вызывается в главном потоке со значениями строк участка и их курсорами.
+        failure : callable
+            Вызывается в главном потоке с исключением, если загрузка не удалась.
+        seek : PageSeek
+            Положение участка относительно известной строки списка.
+        """
+        def on_success(result):
+            orders, cursors = result
+            callback([self.order_values(ord) for ord in orders], cursors)
+
+        def on_error(error):
+            failure(error)
+            self.show_task_error(error)
+
+        self.tasks.submit('orders', self.controller.seek_orders, dict(self.sort_params),
+                          seek.after, seek.until, seek.skip, limit, on_success=on_success, on_error=on_error)
+
+    def show_task_error(self, error):
+        """
+        Сообщает об ошибке фоновой задачи.
+
+        Parameters
+        ----------
+        error : Exception
+            Исключение, возникшее при выполнении задачи.
+        """
+        messagebox.showerror("Ошибка", f"Возникла ошибка: {error}")
+
+    def order_values(self, ord, missing_customer="Покупатель не найден"):
         """
-        orders = self.controller.load_sort_orders(self.sort_params)
-        self.orders_treeview.delete(*self.orders_treeview.get_children())
-        for ord in orders:
-            # Получаем имя покупателя по идентификатору
-            customer = self.controller.find_customer_by_id(ord.customer_id)
-            customer_name = customer.name if customer else "Покупатель не найден"
+        Возвращает значения строки дерева заказов.
 
-            # Вставляем данные в дерево заказов
-            self.orders_treeview.insert("", "end",
-                                        values=(ord.id, customer_name, ord.date_created, ord.status, ord.total_amount))
+        Parameters
+        ----------
+        ord : OrderRow
+            Строка списка заказов.
+        missing_customer : str, optional
+            Подпись для заказа, покупатель которого не найден.
+
+        Returns
+        -------
+        tuple
+            Значения столбцов дерева заказов.
+        """
+        # Имя покупателя уже получено запросом с объединением таблиц
+        customer_name = ord.customer_name if ord.customer_name is not None else missing_customer
+        return ord.id, customer_name, ord.date_created, ord.status, ord.total_amount
 
     def search_orders(self):
         """
@@ -510,15 +777,10 @@ class MainApp(tk.Tk):
         """
         keyword = self.search_ord_var.get().strip()
         filtered_orders = self.controller.search_orders(keyword)
-        self.orders_treeview.delete(*self.orders_treeview.get_children())
-        for ord in filtered_orders:
-            # Получаем имя покупателя по идентификатору
-            customer = self.controller.find_customer_by_id(ord.customer_id)
-            customer_name = customer.name if customer else "Не найден"
-
-            # Вставляем данные в дерево заказов
-            self.orders_treeview.insert("", "end",
-                                        values=(ord.id, customer_name, ord.date_created, ord.status, ord.total_amount))
+        self.tasks.cancel('orders')
+        self.orders_table.load(len(filtered_orders),
+                               sequence_source(filtered_orders, lambda ord: self.order_values(ord, "Не найден")),
+                               keep_position=False)
 
     def open_add_order_dialog(self):
         """
@@ -553,7 +815,7 @@ class MainApp(tk.Tk):
         if confirmation:
             self.controller.delete_order(int(item[0]))
             self.load_orders()
-            self.load_analysis()
+            self.invalidate_analysis()
 
     def export_orders(self):
         """
@@ -565,11 +827,7 @@ class MainApp(tk.Tk):
         ])
         if filename:
             extension = filename.rsplit('.', 1)[-1].lower()
-            success, error_msg = self.controller.export_data(filename, 'orders-details', extension)
-            if success:
-                messagebox.showinfo("Экспорировано", f"Данные успешно экспортированы в файл {filename}.")
-            else:
-                messagebox.showerror("Ошибка экспорта", f"Возникла ошибка при экспорте: {error_msg}")
+            self.run_export(filename, 'orders-details', extension)
 
     def import_orders(self):
         """
@@ -580,14 +838,11 @@ class MainApp(tk.Tk):
             ("JSON files", "*.json")
         ])
         if filename:
+            import_mode = self.ask_import_mode()
+            if import_mode is None:
+                return
             extension = filename.rsplit('.', 1)[-1].lower()
-            success, error_msg = self.controller.import_data(filename, 'orders-details', extension)
-            if success:
-                messagebox.showinfo("Импорт завершен", f"Данные успешно импортированы из файла {filename}.")
-                self.load_orders()
-                self.load_analysis()
-            else:
-                messagebox.showerror("Ошибка импорта", f"Возникла ошибка при импорте: {error_msg}")
+            self.run_import(filename, 'orders-details', extension, import_mode, self.load_orders)
 
     def setup_analysis_tab(self):
         """
@@ -596,6 +851,63 @@ class MainApp(tk.Tk):
         frame = ttk.LabelFrame(self.tab_analysis, text="Аналитика и визуализация")
         frame.pack(padx=10, pady=10, fill="x", side="top", expand=True, anchor="n")
 
+        # Выбор метрики рейтинга покупателей
+        controls_frame = ttk.Frame(frame)
+        controls_frame.pack(fill="x", padx=5, pady=5)
+        ttk.Label(controls_frame, text="ТОП-5 покупателей:").pack(side=tk.LEFT)
+        self.top_metric = 'orders'
+        self.combo_top_metric = ttk.Combobox(controls_frame, state="readonly",
+                                             values=[TOP_METRIC_LABELS[m][0] for m in TOP_METRIC_COLUMNS])
+        self.combo_top_metric.set(TOP_METRIC_LABELS[self.top_metric][0])
+        self.combo_top_metric.pack(side=tk.LEFT, padx=5)
+        self.combo_top_metric.bind("<<ComboboxSelected>>", self.on_top_metric_changed)
+
+        # Интервал группировки и период графика динамики заказов
+        ttk.Label(controls_frame, text="Заказы:").pack(side=tk.LEFT, padx=(20, 0))
+        self.orders_bucket = 'day'
+        self.orders_range = ('', '')
+        self.combo_orders_bucket = ttk.Combobox(controls_frame, state="readonly", width=12,
+                                                values=[labels[0] for labels in DATE_BUCKET_LABELS.values()])
+        self.combo_orders_bucket.set(DATE_BUCKET_LABELS[self.orders_bucket][0])
+        self.combo_orders_bucket.pack(side=tk.LEFT, padx=5)
+        ttk.Label(controls_frame, text="с").pack(side=tk.LEFT)
+        self.entry_orders_from = ttk.Entry(controls_frame, width=12)
+        self.entry_orders_from.pack(side=tk.LEFT, padx=5)
+        ttk.Label(controls_frame, text="по").pack(side=tk.LEFT)
+        self.entry_orders_to = ttk.Entry(controls_frame, width=12)
+        self.entry_orders_to.pack(side=tk.LEFT, padx=5)
+        ttk.Button(controls_frame, text="Показать", command=self.on_orders_range_changed).pack(side=tk.LEFT, padx=5)
+
+        # Параметры прореживания графа связей покупателей
+        graph_controls_frame = ttk.Frame(frame)
+        graph_controls_frame.pack(fill="x", padx=5, pady=(0, 5))
+        self.graph_options = dict(GRAPH_DEFAULTS)
+        self.graph_option_vars = {}
+        for option, text in (('min_weight', "Граф: мин. вес связи"), ('top_k', "соседей на покупателя"),
+                             ('max_nodes', "макс. покупателей")):
+            ttk.Label(graph_controls_frame, text=text).pack(side=tk.LEFT, padx=(5, 0))
+            var = tk.StringVar(value=str(self.graph_options[option]))
+            ttk.Spinbox(graph_controls_frame, from_=1, to=10000, width=6, textvariable=var).pack(side=tk.LEFT, padx=5)
+            self.graph_option_vars[option] = var
+        ttk.Button(graph_controls_frame, text="Перестроить граф", command=self.on_graph_options_changed).pack(side=tk.LEFT, padx=5)
+
+        # Режим обновления графиков и признак устаревших данных
+        refresh_frame = ttk.Frame(frame)
+        refresh_frame.pack(fill="x", padx=5, pady=(0, 5))
+        ttk.Label(refresh_frame, text="Обновление графиков:").pack(side=tk.LEFT)
+        self.analysis_refresh_mode = 'auto'
+        self.analysis_dirty = True  # Графики ещё не построены или данные изменились
+        self.analysis_refresh_pending = False  # Пересчёт уже запланирован
+        self.analysis_timer = None
+        self.combo_refresh_mode = ttk.Combobox(refresh_frame, state="readonly", width=20,
+                                               values=list(ANALYSIS_REFRESH_MODES.values()))
+        self.combo_refresh_mode.set(ANALYSIS_REFRESH_MODES[self.analysis_refresh_mode])
+        self.combo_refresh_mode.pack(side=tk.LEFT, padx=5)
+        self.combo_refresh_mode.bind("<<ComboboxSelected>>", self.on_refresh_mode_changed)
+        ttk.Button(refresh_frame, text="Обновить", command=self.refresh_analysis).pack(side=tk.LEFT, padx=5)
+        self.label_analysis_state = ttk.Label(refresh_frame, text="")
+        self.label_analysis_state.pack(side=tk.LEFT, padx=5)
+
         # Внешний фрейм для графиков
         graphs_frame = ttk.Frame(frame)
         graphs_frame.pack(fill="both", expand=True)
@@ -620,32 +932,105 @@ class MainApp(tk.Tk):
         self.graph_canvas_frame = ttk.Frame(lower_row_frame, width=1200, height=400)
         self.graph_canvas_frame.pack_propagate(False)
         self.graph_canvas_frame.pack(fill="both", expand=True)
-        self.load_analysis()
+        self.update_analysis_state()
+
+    def on_top_metric_changed(self, event=None):
+        """
+        Перестраивает первую диаграмму при выборе другой метрики рейтинга.
+        """
+        label = self.combo_top_metric.get()
+        self.top_metric = next(m for m, labels in TOP_METRIC_LABELS.items() if labels[0] == label)
+        self.tasks.submit('analysis-top', self.controller.c_top, 5, self.top_metric,
+                          on_success=partial(self.show_top, self.top_metric), on_error=self.show_task_error)
 
-    def build_fig1(self, data):
+    def show_top(self, metric, data):
+        """
+        Перестраивает первую диаграмму по вычисленному рейтингу покупателей.
         """
-        Создает первую диаграмму (топ-5 клиентов по количеству заказов).
+        for widget in self.canvas1_frame.winfo_children():
+            widget.destroy()
+        self.build_fig1(data, metric)
+
+    def on_orders_range_changed(self, event=None):
+        """
+        Перестраивает вторую диаграмму для выбранного интервала группировки и периода (ДД-ММ-ГГГГ).
+        """
+        label = self.combo_orders_bucket.get()
+        bucket = next(b for b, labels in DATE_BUCKET_LABELS.items() if labels[0] == label)
+        date_range = (self.entry_orders_from.get(), self.entry_orders_to.get())
+        try:
+            self.controller.parse_date_range(*date_range)
+        except ValueError as e:
+            messagebox.showerror("Ошибка", str(e))
+            return
+        self.orders_bucket, self.orders_range = bucket, date_range
+        self.tasks.submit('analysis-orders', self.controller.c_order_counts, bucket, *date_range,
+                          on_success=partial(self.show_order_counts, bucket), on_error=self.show_task_error)
+
+    def show_order_counts(self, bucket, data):
+        """
+        Перестраивает вторую диаграмму по вычисленному количеству заказов.
+        """
+        for widget in self.canvas2_frame.winfo_children():
+            widget.destroy()
+        self.build_fig2(data, bucket)
+
+    def on_graph_options_changed(self, event=None):
+        """
+        Перестраивает граф связей покупателей с новыми параметрами прореживания.
+        """
+        try:
+            options = {option: int(var.get()) for option, var in self.graph_option_vars.items()}
+        except ValueError:
+            messagebox.showerror("Ошибка", "Параметры графа должны быть целыми числами.")
+            return
+        if min(options.values()) < 1:
+            messagebox.showerror("Ошибка", "Параметры графа должны быть положительными.")
+            return
+        self.graph_options = options
+        self.tasks.submit('analysis-graph', compute_connections, dict(options), kind='cpu',
+                          on_success=self.show_graph, on_error=self.show_task_error)
+
+    def show_graph(self, data):
+        """
+        Перестраивает граф связей покупателей по вычисленным рёбрам.
+
+        Parameters
+        ----------
+        data : list of tuples
+            Список рёбер графа.
+        """
+        for widget in self.graph_canvas_frame.winfo_children():
+            widget.destroy()
+        self.build_fig3(data)
+
+    def build_fig1(self, data, metric='orders'):
+        """
+        Создает первую диаграмму (топ-5 клиентов по количеству заказов или по выручке).
 
         Parameters
         ----------
         data : pandas.DataFrame
             Данные для построения диаграммы.
+        metric : str, optional
+            Метрика рейтинга, по которой построены данные.
         """
         fig1 = Figure(figsize=(4, 4), dpi=80)
         ax1 = fig1.add_subplot(111)
 
         # Строим гистограмму используя plt.bar
-        ax1.bar(data['name'], data['number_of_orders'])
+        _, ylabel, title = TOP_METRIC_LABELS[metric]
+        ax1.bar(data['name'], data[TOP_METRIC_COLUMNS[metric]])
         ax1.set_xlabel('Покупатели')
-        ax1.set_ylabel('Количество заказов')
-        ax1.set_title('ТОП-5 покупателей по числу заказов')
+        ax1.set_ylabel(ylabel)
+        ax1.set_title(title)
         ax1.tick_params(axis='x', rotation=15)
         plt.tight_layout()  # Оптимизация расположения графики
         canvas1 = FigureCanvasTkAgg(fig1, master=self.canvas1_frame)
         canvas1.draw()
         canvas1.get_tk_widget().pack(fill=tk.BOTH, expand=True)
 
-    def build_fig2(self, data):
+    def build_fig2(self, data, bucket='day'):
         """
         Создает вторую диаграмму (количество заказов по датам).
 
@@ -653,6 +1038,8 @@ class MainApp(tk.Tk):
         ----------
         data : pandas.DataFrame
             Данные для построения диаграммы.
+        bucket : str, optional
+            Интервал группировки, по которому построены данные.
         """
         fig2 = Figure(figsize=(4, 4), dpi=80)
         ax2 = fig2.add_subplot(111)
@@ -661,7 +1048,7 @@ class MainApp(tk.Tk):
         ax2.plot(data['date_created'], data['counts'], marker='o')  # Добавляем маркер точек 'o'
         ax2.set_xlabel('Даты')
         ax2.set_ylabel('Количество заказов')
-        ax2.set_title('Динамика количества заказов по датам')
+        ax2.set_title(DATE_BUCKET_LABELS[bucket][1])
         ax2.grid(True)  # Включаем сетку для удобства восприятия
         plt.tight_layout()  # Подгонка размеров элементов
         canvas2 = FigureCanvasTkAgg(fig2, master=self.canvas2_frame)
@@ -680,8 +1067,8 @@ class MainApp(tk.Tk):
         G = nx.Graph()
         G.add_weighted_edges_from(data)
 
-        # Визуализация графа
-        pos = nx.spring_layout(G)
+        # Визуализация графа: раскладка пересчитывается только при изменении рёбер
+        pos = self.layout_cache.layout(G)
         figure = Figure(figsize=(8, 3), dpi=80)
         ax = figure.add_subplot(111)
         nx.draw_networkx_nodes(G, pos, node_size=500, alpha=0.8, ax=ax)
@@ -694,31 +1081,124 @@ class MainApp(tk.Tk):
         canvas3.draw()
         canvas3.get_tk_widget().pack(fill=tk.BOTH, expand=True)
 
-    def load_analysis(self):
+    def is_analysis_visible(self):
         """
-        Отображает аналитические графики на вкладке "Анализ".
+        Проверяет, открыта ли вкладка аналитики.
+
+        Returns
+        -------
+        bool
+            True, если выбрана вкладка "Аналитика и визуализация".
         """
-        # Получаем данные из БД
-        top5_data = self.controller.fetch_top5_customers()
-        opd_data = self.controller.fetch_orders_per_day()
-        graph_data = self.controller.fetch_client_connections()
+        return self.tab_control.select() == str(self.tab_analysis)
 
-        # Отправляем данные для анализа
-        data1 = self.controller.c_top5(top5_data)
-        data2 = self.controller.c_orders_per_day(opd_data)
-        data3 = self.controller.c_client_connections((graph_data))
+    def on_tab_changed(self, event=None):
+        """
+        Пересчитывает устаревшие графики при открытии вкладки аналитики.
 
-        # Сначала удаляем существующие графики, если они есть
-        for widget in self.canvas1_frame.winfo_children():
-            widget.destroy()
-        for widget in self.canvas2_frame.winfo_children():
-            widget.destroy()
+        В ручном режиме графики строятся автоматически только при первом открытии вкладки.
+        """
+        if not self.is_analysis_visible() or not self.analysis_dirty:
+            return
+        if self.analysis_refresh_mode != 'manual' or not self.canvas1_frame.winfo_children():
+            self.schedule_analysis_refresh()
+
+    def invalidate_analysis(self):
+        """
+        Отмечает графики устаревшими после изменения данных.
+
+        Пересчёт выполняется сразу только в автоматическом режиме при открытой вкладке аналитики,
+        иначе — при её открытии, по таймеру или по кнопке "Обновить".
+        """
+        self.analysis_dirty = True
+        self.update_analysis_state()
+        if self.analysis_refresh_mode == 'auto' and self.is_analysis_visible():
+            self.schedule_analysis_refresh()
+
+    def schedule_analysis_refresh(self):
+        """
+        Планирует пересчёт графиков после обработки текущих событий.
+
+        Несколько изменений подряд (например, при оформлении заказа) приводят к одному пересчёту.
+        """
+        if not self.analysis_refresh_pending:
+            self.analysis_refresh_pending = True
+            self.after_idle(self.refresh_analysis)
+
+    def on_refresh_mode_changed(self, event=None):
+        """
+        Применяет выбранный режим обновления графиков.
+        """
+        label = self.combo_refresh_mode.get()
+        self.analysis_refresh_mode = next(m for m, text in ANALYSIS_REFRESH_MODES.items() if text == label)
+        if self.analysis_timer is not None:
+            self.after_cancel(self.analysis_timer)
+            self.analysis_timer = None
+        if self.analysis_refresh_mode == 'timed':
+            self.analysis_timer = self.after(ANALYSIS_REFRESH_INTERVAL_MS, self.on_analysis_timer)
+        elif self.analysis_refresh_mode == 'auto':
+            self.on_tab_changed()
+
+    def on_analysis_timer(self):
+        """
+        Пересчитывает устаревшие графики по таймеру, если вкладка аналитики открыта.
+        """
+        self.analysis_timer = self.after(ANALYSIS_REFRESH_INTERVAL_MS, self.on_analysis_timer)
+        if self.analysis_dirty and self.is_analysis_visible():
+            self.schedule_analysis_refresh()
+
+    def update_analysis_state(self):
+        """
+        Отображает признак устаревших графиков рядом с кнопкой "Обновить".
+        """
+        self.label_analysis_state.config(text="Данные изменились, графики устарели" if self.analysis_dirty else "")
+
+    def refresh_analysis(self):
+        """
+        Запускает в фоне пересчёт аналитических графиков на вкладке "Анализ".
+
+        Графики перестраиваются в show_analysis, когда данные будут готовы.
+        """
+        self.analysis_refresh_pending = False
+        self.analysis_dirty = False
+        self.update_analysis_state()
+
+        # Данные графиков вычисляются в процессе пула аналитики; период уже проверен при выборе
+        date_from, date_to = self.controller.parse_date_range(*self.orders_range)
+        for key in ('analysis-top', 'analysis-orders', 'analysis-graph'):
+            self.tasks.cancel(key)
+        self.tasks.submit('analysis', compute_analysis, self.top_metric, self.orders_bucket, date_from, date_to,
+                          dict(self.graph_options), kind='cpu', on_error=self.show_task_error,
+                          on_success=partial(self.show_analysis, self.top_metric, self.orders_bucket,
+                                             self.orders_range))
+
+    def show_analysis(self, top_metric, bucket, date_range, result):
+        """
+        Перестраивает графики вкладки аналитики по вычисленным данным.
+
+        Диаграмма, параметры которой изменились во время вычисления, не перестраивается:
+        её данные для новых параметров вычисляются отдельной задачей.
+
+        Parameters
+        ----------
+        top_metric : str
+            Метрика рейтинга покупателей, для которой вычислены данные.
+        bucket : str
+            Интервал группировки заказов, для которого вычислены данные.
+        date_range : tuple
+            Период графика заказов (строки ДД-ММ-ГГГГ), для которого вычислены данные.
+        result : tuple
+            Данные трёх графиков (см. controllers.compute_analysis).
+        """
+        data1, data2, data3 = result
+
+        # Сначала удаляем существующие графики, если они есть, и строим графики
+        if top_metric == self.top_metric:
+            self.show_top(top_metric, data1)
+        if (bucket, date_range) == (self.orders_bucket, self.orders_range):
+            self.show_order_counts(bucket, data2)
         for widget in self.graph_canvas_frame.winfo_children():
             widget.destroy()
-
-        # Строим графики
-        self.build_fig1(data1)
-        self.build_fig2(data2)
         self.build_fig3(data3)
 
 class AddCustomerDialog(tk.Toplevel):
@@ -793,7 +1273,7 @@ class AddCustomerDialog(tk.Toplevel):
                 self.parent.clear_search_field(section="customers")
 
                 #Перестраиваем графики с учетом добавления нового клиента
-                self.parent.load_analysis()
+                self.parent.invalidate_analysis()
 
                 # Закрываем окно только при успехе
                 self.destroy()
@@ -883,7 +1363,7 @@ class EditCustomerDialog(tk.Toplevel):
                 self.parent.clear_search_field(section="customers")
 
                 # Перестраиваем графики с учетом добавления нового клиента
-                self.parent.load_analysis()
+                self.parent.invalidate_analysis()
 
                 # Закрываем окно только при успехе
                 self.destroy()
@@ -964,7 +1444,7 @@ class AddProductDialog(tk.Toplevel):
                 self.parent.clear_search_field(section="products")
 
                 # Перестраиваем графики с учетом добавления нового товара
-                self.parent.load_analysis()
+                self.parent.invalidate_analysis()
 
                 # Закрываем окно только при успехе
                 self.destroy()
@@ -1055,7 +1535,7 @@ class EditProductDialog(tk.Toplevel):
                 self.parent.clear_search_field(section="products")
 
                 # Перестраиваем графики с учетом редактирования товара
-                self.parent.load_analysis()
+                self.parent.invalidate_analysis()
 
                 # Закрываем окно только при успехе
                 self.destroy()
@@ -1174,6 +1654,7 @@ class AddOrderDialog(tk.Toplevel):
 
         self.load_order_data()
 
+    @track_queries()
     def load_order_data(self):
         """
         Загружает начальные данные заказа (список покупателей и доступные товары).
@@ -1200,6 +1681,7 @@ class AddOrderDialog(tk.Toplevel):
         """
         self.destroy()
 
+    @track_queries()
     def change_quantity(self):
         """
         Изменяет количество товара в заказе.
@@ -1217,7 +1699,7 @@ class AddOrderDialog(tk.Toplevel):
 
         item = self.order_items_treeview.item(selected[0])
         product_name = item["values"][0]
-        product = next((p for p in self.controller.load_products() if p.name == product_name), None)
+        product = self.controller.find_product_by_name(product_name)
         if not product:
             messagebox.showwarning("Ошибка", "Товар не найден.", parent=self)
             return
@@ -1248,6 +1730,7 @@ class AddOrderDialog(tk.Toplevel):
         # Сообщаем пользователю об успешном изменении
         messagebox.showinfo("Информация", f"Количество товара '{product_name}' изменено на {new_quantity}.", parent=self)
 
+    @track_queries()
     def add_to_order(self):
         """
         Добавляет товар из склада в заказ.
@@ -1296,20 +1779,20 @@ class AddOrderDialog(tk.Toplevel):
         # Сообщаем пользователю об успешном добавлении
         messagebox.showinfo("Информация", f"Товар '{product_name}' с количеством 1 добавлен в заказ.", parent=self)
 
+    @track_queries()
     def update_total_amount(self):
         """
         Пересчитывает общую сумму заказа исходя из текущих товаров и их цен.
         """
         total_amount = 0.0
 
-        # Проходим по всем товарам в дереве товаров заказа
-        for child in self.order_items_treeview.get_children():
-            values = self.order_items_treeview.item(child)["values"]
+        # Товары заказа находятся одним запросом по их названиям
+        rows = [self.order_items_treeview.item(child)["values"] for child in self.order_items_treeview.get_children()]
+        products = self.controller.find_products_by_names(values[0] for values in rows)
+        for values in rows:
             product_name = values[0]
             quantity = int(values[2])
-
-            # Найти продукт по его названию
-            product = next((p for p in self.controller.load_products() if p.name == product_name), None)
+            product = products.get(product_name)
             if product:
                 # Умножаем цену продукта на количество и добавляем к общей сумме
                 total_amount += product.price * quantity
@@ -1318,6 +1801,7 @@ class AddOrderDialog(tk.Toplevel):
         self.label_total_value.config(text=f"{total_amount:.2f}")
         return total_amount
 
+    @track_queries()
     def apply_changes(self):
         """
         Оформляет заказ, отправляя данные контроллеру и закрывает окно.
@@ -1325,11 +1809,12 @@ class AddOrderDialog(tk.Toplevel):
         # Подготовка состава заказа
         removed_items = []
         updated_items = []
-        for child in self.order_items_treeview.get_children():
-            values = self.order_items_treeview.item(child)["values"]
+        rows = [self.order_items_treeview.item(child)["values"] for child in self.order_items_treeview.get_children()]
+        products = self.controller.find_products_by_names(values[0] for values in rows)
+        for values in rows:
             product_name = values[0]
             quantity = int(values[2])
-            product = next((p for p in self.controller.load_products() if p.name == product_name), None)
+            product = products.get(product_name)
             if product:
                 if quantity > 0:
                     updated_items.append({"product_id": product.id, "quantity": quantity})
@@ -1366,7 +1851,7 @@ class AddOrderDialog(tk.Toplevel):
         """
         self.parent.load_orders()
         self.parent.load_products()
-        self.parent.load_analysis()
+        self.parent.invalidate_analysis()
 
 class EditOrderDialog(tk.Toplevel):
     """
@@ -1496,6 +1981,7 @@ class EditOrderDialog(tk.Toplevel):
         apply_button.pack(side="left", padx=5)
         cancel_button.pack(side="right", padx=5)
 
+    @track_queries()
     def load_order_data(self):
         """
         Загружает данные текущего заказа и выводит их в форме.
@@ -1514,8 +2000,9 @@ class EditOrderDialog(tk.Toplevel):
 
             # Загружаем товары в заказе
             items = self.controller.find_order_list_by_id(self.order_id)
+            products_by_id = self.controller.find_products_by_ids(item.product_id for item in items)
             for item in items:
-                product = self.controller.find_product_by_id(item.product_id)
+                product = products_by_id[item.product_id]
                 self.order_items_treeview.insert("", "end", values=(product.name, item.quantity))
                 self.original_order_items[item.product_id] = item.quantity  # Запоминаем изначальное количество
 
@@ -1530,6 +2017,7 @@ class EditOrderDialog(tk.Toplevel):
         """
         self.destroy()
 
+    @track_queries()
     def change_quantity(self):
         """
         Изменяет количество товара в заказе.
@@ -1553,7 +2041,7 @@ class EditOrderDialog(tk.Toplevel):
 
         item = self.order_items_treeview.item(selected[0])
         product_name = item["values"][0]
-        product = next((p for p in self.controller.load_products() if p.name == product_name), None)
+        product = self.controller.find_product_by_name(product_name)
         if not product:
             messagebox.showwarning("Ошибка", "Товар не найден.", parent=self)
             return
@@ -1591,6 +2079,7 @@ class EditOrderDialog(tk.Toplevel):
         # Сообщаем пользователю об успешном изменении
         messagebox.showinfo("Информация", f"Количество товара '{product_name}' изменено на {new_quantity}.", parent=self)
 
+    @track_queries()
     def add_to_order(self):
         """
         Добавляет товар из склада в заказ.
@@ -1627,20 +2116,20 @@ class EditOrderDialog(tk.Toplevel):
         # Сообщаем пользователю об успешном добавлении
         messagebox.showinfo("Информация", f"Товар '{product_name}' добавлен в заказ.", parent=self)
 
+    @track_queries()
     def update_total_amount(self):
         """
         Обновляет итоговую сумму заказа исходя из текущих товаров и их количеств.
         """
         total_amount = 0.0
 
-        # Проходим по всем товарам в дереве товаров заказа
-        for child in self.order_items_treeview.get_children():
-            values = self.order_items_treeview.item(child)["values"]
+        # Товары заказа находятся одним запросом по их названиям
+        rows = [self.order_items_treeview.item(child)["values"] for child in self.order_items_treeview.get_children()]
+        products = self.controller.find_products_by_names(values[0] for values in rows)
+        for values in rows:
             product_name = values[0]
             quantity = int(values[1])
-
-            # Найти продукт по его названию
-            product = next((p for p in self.controller.load_products() if p.name == product_name), None)
+            product = products.get(product_name)
             if product:
                 # Умножаем цену продукта на количество и добавляем к общей сумме
                 total_amount += product.price * quantity
@@ -1649,6 +2138,7 @@ class EditOrderDialog(tk.Toplevel):
         self.label_total_value.config(text=f"{total_amount:.2f}")
         return total_amount
 
+    @track_queries()
     def apply_changes(self):
         """
         Применяет изменения в заказе, сохраняя их в базе данных.
@@ -1658,11 +2148,13 @@ class EditOrderDialog(tk.Toplevel):
         current_status = order.status
 
         # Проверка на изменения в составе заказа
-        changed = any([
-            int(self.order_items_treeview.item(child)["values"][1]) != self.original_order_items.get(
-                self.controller.find_product_id_by_name(self.order_items_treeview.item(child)["values"][0]), 0)
-            for child in self.order_items_treeview.get_children()
-        ])
+        rows = [self.order_items_treeview.item(child)["values"] for child in self.order_items_treeview.get_children()]
+        products = self.controller.find_products_by_names(values[0] for values in rows)
+        changed = any(
+            int(values[1]) != self.original_order_items.get(
+                products[values[0]].id if values[0] in products else None, 0)
+            for values in rows
+        )
 
         if changed and current_status != "Новый":
             # Произошли изменения в составе заказа, но статус отличен от "Новый"
@@ -1674,11 +2166,10 @@ class EditOrderDialog(tk.Toplevel):
         # Обновляем состав заказа
         removed_items = []
         updated_items = []
-        for child in self.order_items_treeview.get_children():
-            values = self.order_items_treeview.item(child)["values"]
+        for values in rows:
             product_name = values[0]
             quantity = int(values[1])
-            product = next((p for p in self.controller.load_products() if p.name == product_name), None)
+            product = products.get(product_name)
             if product:
                 if quantity > 0:
                     updated_items.append({"product_id": product.id, "quantity": quantity})
@@ -1693,8 +2184,7 @@ class EditOrderDialog(tk.Toplevel):
 
         # Обновляем список товаров в заказе
         self.controller.delete_order_list(self.order_id)
-        for item in updated_items:
-            self.controller.add_order_item(self.order_id, item)
+        self.controller.add_order_items(self.order_id, updated_items)
 
         # Обновляем статус заказа
         new_status = self.combo_status.get()
@@ -1718,4 +2208,4 @@ class EditOrderDialog(tk.Toplevel):
         """
         self.parent.load_orders()
         self.parent.load_products()
-        self.parent.load_analysis()
\ No newline at end of file
+        self.parent.invalidate_analysis()
\ No newline at end of file
@@ -0,0 +1,726 @@
+"""
+Инструментирование запросов к базе данных SQLite.
+
+Соединения, создаваемые с фабрикой InstrumentedConnection, сообщают о каждом выполненном
+выражении: текст SQL, форма параметров, длительность, количество строк и вызвавший его
+метод контроллера (для медленных выражений или при включённом track_callers). Статистика
+доступна программно через объект instrumentation, а медленные выражения записываются
+в ротируемый журнал.
+"""
+
+import logging
+import logging.handlers
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ContextDecorator
+from dataclasses import dataclass
+from typing import Optional
+
+# Путь к журналу медленных запросов по умолчанию
+SLOW_QUERY_LOG_PATH = 'data/slow_queries.log'
+
+# Сколько раз одно и то же выражение может выполниться за одно действие,
+# прежде чем действие будет считаться проблемой N+1
+N_PLUS_ONE_THRESHOLD = 5
+
+# Количество строк, читаемых за один раз при итерации по инструментированному курсору
+ITER_BATCH_SIZE = 256
+
+
+@dataclass
+class QueryRecord:
+    """
+    Сведения об одном выполненном выражении SQL.
+
+    Attributes
+    ----------
+    sql : str
+        Текст выражения с нормализованными пробелами.
+    params : str
+        Форма параметров (количество значений или имена ключей, без самих значений).
+    duration : float
+        Длительность выполнения и чтения результата (в секундах).
+    rows : int
+        Количество прочитанных или изменённых строк.
+    caller : str
+        Метод контроллера, из которого выполнено выражение (пустая строка, если не найден
+        или не определялся).
+    """
+    sql: str
+    params: str
+    duration: float = 0.0
+    rows: int = 0
+    caller: str = ''
+
+
+@dataclass
+class StatementStats:
+    """
+    Накопленная статистика по одному тексту выражения SQL.
+
+    Attributes
+    ----------
+    count : int
+        Количество выполнений.
+    total_time : float
+        Суммарная длительность (в секундах).
+    max_time : float
+        Наибольшая длительность одного выполнения (в секундах).
+    rows : int
+        Суммарное количество строк.
+    """
+    count: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+    rows: int = 0
+
+
+class QueryInstrumentation:
+    """
+    Сборщик статистики выполненных выражений SQL.
+
+    Attributes
+    ----------
+    enabled : bool
+        Признак того, что статистика собирается.
+    slow_query_ms : float
+        Порог длительности (в миллисекундах), начиная с которого выражение считается медленным.
+    explain_slow : bool
+        Если True, для медленных выражений SELECT в журнал записывается EXPLAIN QUERY PLAN.
+    caller_modules : tuple
+        Модули, функции которых считаются вызывающими методами при поиске по стеку.
+    track_callers : bool
+        Если True, вызывающий метод определяется для каждого выражения. Иначе стек просматривается
+        только для медленных выражений, когда их длительность уже известна.
+    ignore_prefixes : tuple
+        Начала выражений, не учитываемых в статистике (служебные PRAGMA соединения).
+    slow_log_path : str or None
+        Путь к файлу журнала медленных выражений или None, если журнал не ведётся.
+    total_queries : int
+        Общее количество учтённых выражений.
+    slow_queries : int
+        Количество медленных выражений.
+    statements : dict
+        Статистика StatementStats по тексту выражения.
+    callers : dict
+        Количество выражений по вызывающим методам (выражения с известным вызывающим методом).
+    recent : collections.deque
+        Последние выполненные выражения (QueryRecord).
+    strict_n_plus_one : bool
+        Если True, QueryTracker по умолчанию вызывает NPlusOneError вместо записи в журнал.
+    """
+
+    def __init__(self, slow_query_ms=100.0, explain_slow=False, caller_modules=('controllers',),
+                 ignore_prefixes=('PRAGMA',), history=1000, track_callers=False):
+        """
+        Parameters
+        ----------
+        slow_query_ms : float, optional
+            Порог медленного выражения в миллисекундах.
+        explain_slow : bool, optional
+            Записывать ли план выполнения медленных выражений SELECT.
+        caller_modules : tuple, optional
+            Имена модулей, в которых ищется вызывающий метод.
+        ignore_prefixes : tuple, optional
+            Начала выражений, которые не учитываются.
+        history : int, optional
+            Количество последних выражений, хранимых в recent.
+        track_callers : bool, optional
+            Определять ли вызывающий метод для каждого выражения.
+        """
+        self.enabled = True
+        self.slow_query_ms = slow_query_ms
+        self.explain_slow = explain_slow
+        self.caller_modules = caller_modules
+        self.track_callers = track_callers
+        self.ignore_prefixes = tuple(prefix.upper() for prefix in ignore_prefixes)
+        self.logger = logging.getLogger('slow_queries')
+        self.slow_log_path = None
+        self._history = history
+        self.strict_n_plus_one = False
+        self._lock = threading.Lock()
+        self._trackers = threading.local()
+        self.reset()
+
+    def reset(self):
+        """
+        Обнуляет все счётчики и историю выражений.
+        """
+        with self._lock:
+            self.total_queries = 0
+            self.slow_queries = 0
+            self.statements = {}
+            self.callers = {}
+            self.recent = deque(maxlen=self._history)
+
+    def configure_slow_log(self, path=SLOW_QUERY_LOG_PATH, slow_query_ms=None, explain_slow=None,
+                           max_bytes=1024 * 1024, backup_count=3):
+        """
+        Включает запись медленных выражений в ротируемый файл журнала.
+
+        Parameters
+        ----------
+        path : str, optional
+            Путь к файлу журнала.
+        slow_query_ms : float, optional
+            Новый порог медленного выражения в миллисекундах.
+        explain_slow : bool, optional
+            Записывать ли план выполнения медленных выражений SELECT.
+        max_bytes : int, optional
+            Размер файла, при достижении которого журнал ротируется.
+        backup_count : int, optional
+            Количество хранимых старых файлов журнала.
+        """
+        if slow_query_ms is not None:
+            self.slow_query_ms = slow_query_ms
+        if explain_slow is not None:
+            self.explain_slow = explain_slow
+        self.close_slow_log()
+        handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True
+        )
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        self.logger.addHandler(handler)
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self.slow_log_path = path
+
+    def close_slow_log(self):
+        """
+        Отключает и закрывает файлы журнала медленных выражений.
+        """
+        for handler in list(self.logger.handlers):
+            self.logger.removeHandler(handler)
+            handler.close()
+        self.slow_log_path = None
+
+    def settings(self):
+        """
+        Возвращает настройки сбора статистики для передачи в другой процесс (см. apply_settings).
+
+        Returns
+        -------
+        dict
+            Признак сбора статистики, порог медленного выражения, запись планов, учёт вызывающих
+            методов и путь к журналу.
+        """
+        return {'enabled': self.enabled, 'slow_query_ms': self.slow_query_ms, 'explain_slow': self.explain_slow,
+                'track_callers': self.track_callers, 'slow_log_path': self.slow_log_path}
+
+    def apply_settings(self, settings):
+        """
+        Применяет настройки, полученные из settings() другого процесса.
+
+        Parameters
+        ----------
+        settings : dict
+            Настройки сбора статистики.
+        """
+        self.enabled = settings['enabled']
+        self.slow_query_ms = settings['slow_query_ms']
+        self.explain_slow = settings['explain_slow']
+        self.track_callers = settings['track_callers']
+        if settings['slow_log_path'] is not None:
+            self.configure_slow_log(settings['slow_log_path'])
+
+    def is_tracked(self, sql):
+        """
+        Проверяет, учитывается ли выражение в статистике.
+
+        Parameters
+        ----------
+        sql : str
+            Текст выражения.
+
+        Returns
+        -------
+        bool
+            True, если инструментирование включено и выражение не служебное.
+        """
+        return self.enabled and not sql.lstrip().upper().startswith(self.ignore_prefixes)
+
+    def find_caller(self):
+        """
+        Находит по стеку вызовов ближайшую функцию из модулей caller_modules.
+
+        Returns
+        -------
+        str
+            Имя вида "AppController.load_products" или пустая строка.
+        """
+        frame = sys._getframe(2)
+        while frame is not None:
+            if frame.f_globals.get('__name__') in self.caller_modules:
+                code = frame.f_code
+                return getattr(code, 'co_qualname', code.co_name)
+            frame = frame.f_back
+        return ''
+
+    def record(self, record: QueryRecord, conn=None, params=None):
+        """
+        Учитывает завершённое выражение и записывает его в журнал, если оно медленное.
+
+        Вызывающий метод медленного выражения, не определённый при выполнении, ищется здесь:
+        выражение учитывается при чтении результата, то есть из того же метода контроллера.
+
+        Parameters
+        ----------
+        record : QueryRecord
+            Сведения о выражении.
+        conn : sqlite3.Connection, optional
+            Соединение, на котором можно получить план выполнения.
+        params : tuple or dict, optional
+            Параметры выражения (используются только для EXPLAIN QUERY PLAN).
+        """
+        is_slow = record.duration * 1000 >= self.slow_query_ms
+        if is_slow and not record.caller:
+            record.caller = self.find_caller()
+        with self._lock:
+            self.total_queries += 1
+            stats = self.statements.get(record.sql)
+            if stats is None:
+                stats = self.statements[record.sql] = StatementStats()
+            stats.count += 1
+            stats.total_time += record.duration
+            stats.max_time = max(stats.max_time, record.duration)
+            stats.rows += record.rows
+            if record.caller:
+                self.callers[record.caller] = self.callers.get(record.caller, 0) + 1
+            self.recent.append(record)
+            if is_slow:
+                self.slow_queries += 1
+        for tracker in getattr(self._trackers, 'active', ()):
+            tracker.queries.append(record)
+        if is_slow:
+            self._log_slow(record, conn, params)
+
+    def push_tracker(self, tracker):
+        """
+        Подключает счётчик действия к выражениям текущего потока.
+
+        Parameters
+        ----------
+        tracker : QueryTracker
+            Счётчик выражений действия.
+        """
+        if not hasattr(self._trackers, 'active'):
+            self._trackers.active = []
+        self._trackers.active.append(tracker)
+
+    def pop_tracker(self, tracker):
+        """
+        Отключает счётчик действия от выражений текущего потока.
+
+        Parameters
+        ----------
+        tracker : QueryTracker
+            Счётчик выражений действия.
+        """
+        self._trackers.active.remove(tracker)
+
+    def _log_slow(self, record, conn, params):
+        """
+        Записывает медленное выражение (и при необходимости его план) в журнал.
+        """
+        message = (f"{record.duration * 1000:.1f} ms rows={record.rows} params={record.params} "
+                   f"caller={record.caller or '-'} sql={record.sql}")
+        if self.explain_slow and conn is not None and record.sql.upper().startswith(('SELECT', 'WITH')):
+            try:
+                plan = sqlite3.Connection.execute(conn, f"EXPLAIN QUERY PLAN {record.sql}", params or ()).fetchall()
+                message += " plan=" + "; ".join(row[-1] for row in plan)
+            except sqlite3.Error as e:
+                message += f" plan=<{e}>"
+        self.logger.info(message)
+
+    def summary(self):
+        """
+        Возвращает копию накопленной статистики.
+
+        Returns
+        -------
+        dict
+            Ключи 'total_queries', 'slow_queries', 'statements' и 'callers'.
+        """
+        with self._lock:
+            return {
+                'total_queries': self.total_queries,
+                'slow_queries': self.slow_queries,
+                'statements': {sql: StatementStats(**vars(stats)) for sql, stats in self.statements.items()},
+                'callers': dict(self.callers),
+            }
+
+
+# Общий сборщик статистики для всех инструментированных соединений
+instrumentation = QueryInstrumentation()
+
+
+class NPlusOneError(Exception):
+    """
+    Исключение, возникающее в строгом режиме, если действие выполняет
+    одно и то же выражение слишком много раз (проблема N+1).
+
+    Attributes
+    ----------
+    action : str
+        Название действия.
+    repeated : dict
+        Повторяющиеся выражения и количество их выполнений.
+    """
+
+    def __init__(self, action, repeated):
+        self.action = action
+        self.repeated = repeated
+        details = "; ".join(f"{count} x {sql}" for sql, count in repeated.items())
+        super().__init__(f"Действие {action} повторяет запросы в цикле: {details}")
+
+
+class QueryTracker(ContextDecorator):
+    """
+    Счётчик выражений SQL одного логического действия (контекстный менеджер или декоратор).
+
+    По завершении действия выражения группируются по тексту; если какое-либо выполнено
+    больше threshold раз, действие записывается в журнал медленных запросов,
+    а в строгом режиме вызывается NPlusOneError.
+
+    Attributes
+    ----------
+    action : str
+        Название действия (для декоратора по умолчанию — имя функции).
+    threshold : int
+        Допустимое количество выполнений одного выражения за действие.
+    strict : bool or None
+        Строгий режим; None — значение instrumentation.strict_n_plus_one.
+    queries : list
+        Выражения (QueryRecord), выполненные во время действия.
+    """
+
+    def __init__(self, action='', threshold=N_PLUS_ONE_THRESHOLD, strict=None):
+        """
+        Parameters
+        ----------
+        action : str, optional
+            Название действия.
+        threshold : int, optional
+            Допустимое количество выполнений одного выражения за действие.
+        strict : bool, optional
+            Вызывать ли NPlusOneError при превышении порога.
+        """
+        self.action = action
+        self.threshold = threshold
+        self.strict = strict
+        self.queries = []
+
+    def __call__(self, func):
+        """
+        Оборачивает функцию, называя действие её именем, если название не задано.
+        """
+        if not self.action:
+            self.action = func.__qualname__
+        return super().__call__(func)
+
+    def _recreate_cm(self):
+        """
+        Создаёт новый счётчик для каждого вызова декорированной функции.
+        """
+        return QueryTracker(self.action, self.threshold, self.strict)
+
+    def __enter__(self):
+        self.queries = []
+        instrumentation.push_tracker(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        instrumentation.pop_tracker(self)
+        if exc_type is not None:
+            return False
+        repeated = self.repeated()
+        if repeated:
+            strict = instrumentation.strict_n_plus_one if self.strict is None else self.strict
+            if strict:
+                raise NPlusOneError(self.action, repeated)
+            for sql, count in repeated.items():
+                instrumentation.logger.warning(f"N+1 action={self.action} count={count} sql={sql}")
+        return False
+
+    @property
+    def count(self):
+        """
+        Количество выражений, выполненных во время действия.
+        """
+        return len(self.queries)
+
+    def repeated(self):
+        """
+        Возвращает выражения, выполненные больше допустимого количества раз.
+
+        Returns
+        -------
+        dict
+            Текст выражения -> количество выполнений.
+        """
+        counts = Counter(record.sql for record in self.queries)
+        return {sql: count for sql, count in counts.items() if count > self.threshold}
+
+
+def track_queries(action='', threshold=N_PLUS_ONE_THRESHOLD, strict=None):
+    """
+    Создаёт счётчик выражений действия для использования в with или как декоратор.
+
+    Parameters
+    ----------
+    action : str, optional
+        Название действия (для декоратора по умолчанию — имя функции).
+    threshold : int, optional
+        Допустимое количество выполнений одного выражения за действие.
+    strict : bool, optional
+        Вызывать ли NPlusOneError при превышении порога (None — instrumentation.strict_n_plus_one).
+
+    Returns
+    -------
+    QueryTracker
+        Счётчик выражений.
+    """
+    return QueryTracker(action, threshold, strict)
+
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    """
+    Нормализует пробелы в тексте выражения, чтобы одинаковые запросы учитывались вместе.
+
+    Parameters
+    ----------
+    sql : str
+        Текст выражения.
+
+    Returns
+    -------
+    str
+        Текст выражения в одну строку.
+    """
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def describe_params(params):
+    """
+    Описывает форму параметров выражения, не раскрывая их значений.
+
+    Parameters
+    ----------
+    params : tuple, list, dict or None
+        Параметры выражения.
+
+    Returns
+    -------
+    str
+        Например, "(3)" для трёх позиционных параметров или "{id, name}" для именованных.
+    """
+    if params is None:
+        return '()'
+    if isinstance(params, dict):
+        return '{' + ', '.join(params) + '}'
+    return f'({len(params)})'
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    Курсор, сообщающий о выполненных выражениях в instrumentation.
+
+    Длительность выражения включает чтение результата; выражение учитывается, когда
+    результат прочитан полностью, курсор выполняет следующее выражение или закрывается.
+    """
+
+    _record: Optional[QueryRecord] = None
+
+    def execute(self, sql, parameters=()):
+        """
+        Выполняет выражение и начинает учёт его длительности и строк.
+        """
+        self._finish()
+        if not instrumentation.is_tracked(sql):
+            return super().execute(sql, parameters)
+        record = QueryRecord(normalize_sql(sql), describe_params(parameters), caller=self._caller())
+        self._params = parameters
+        started = time.perf_counter()
+        try:
+            super().execute(sql, parameters)
+        finally:
+            record.duration = time.perf_counter() - started
+            self._record = record
+        if self.description is None:
+            # Выражение без результата: учитываем изменённые строки и завершаем сразу
+            record.rows = max(self.rowcount, 0)
+            self._finish()
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        """
+        Выполняет выражение для каждого набора параметров и учитывает его целиком.
+        """
+        self._finish()
+        if not instrumentation.is_tracked(sql):
+            return super().executemany(sql, seq_of_parameters)
+        record = QueryRecord(normalize_sql(sql), '', caller=self._caller())
+        count = 0
+        shape = ''
+
+        def counted(rows):
+            nonlocal count, shape
+            for params in rows:
+                if not count:
+                    shape = describe_params(params)
+                count += 1
+                yield params
+
+        started = time.perf_counter()
+        try:
+            super().executemany(sql, counted(seq_of_parameters))
+        finally:
+            record.duration = time.perf_counter() - started
+            record.params = f'{count} x {shape or "()"}'
+            record.rows = max(self.rowcount, 0)
+            self._record, self._params = record, None
+            self._finish()
+        return self
+
+    def executescript(self, sql_script):
+        """
+        Выполняет сценарий SQL без учёта в статистике.
+        """
+        self._finish()
+        return super().executescript(sql_script)
+
+    def fetchone(self):
+        """
+        Читает одну строку результата.
+        """
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._account(started, 0 if row is None else 1, exhausted=row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        """
+        Читает очередную порцию строк результата.
+        """
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._account(started, len(rows), exhausted=not rows)
+        return rows
+
+    def fetchall(self):
+        """
+        Читает все оставшиеся строки результата.
+        """
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._account(started, len(rows), exhausted=True)
+        return rows
+
+    def __iter__(self):
+        """
+        Перебирает строки результата, читая их порциями по ITER_BATCH_SIZE.
+
+        Время чтения учитывается для порции целиком, а не для каждой строки.
+        """
+        while True:
+            rows = self.fetchmany(ITER_BATCH_SIZE)
+            if not rows:
+                return
+            yield from rows
+
+    def __next__(self):
+        """
+        Возвращает следующую строку результата при явном вызове next().
+        """
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._account(started, 0, exhausted=True)
+            raise
+        self._account(started, 1, exhausted=False)
+        return row
+
+    def close(self):
+        """
+        Учитывает текущее выражение и закрывает курсор.
+        """
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        """
+        Учитывает незавершённое выражение при удалении курсора.
+        """
+        try:
+            self._finish()
+        except Exception:
+            # При завершении интерпретатора модуль может быть уже выгружен
+            pass
+
+    def _caller(self):
+        """
+        Возвращает вызывающий метод выражения, если он определяется при выполнении (track_callers).
+        """
+        return instrumentation.find_caller() if instrumentation.track_callers else ''
+
+    def _account(self, started, rows, exhausted):
+        """
+        Добавляет время чтения и прочитанные строки к текущему выражению.
+        """
+        record = self._record
+        if record is None:
+            return
+        record.duration += time.perf_counter() - started
+        record.rows += rows
+        if exhausted:
+            self._finish()
+
+    def _finish(self):
+        """
+        Передаёт сведения о текущем выражении в instrumentation.
+        """
+        record = self._record
+        if record is None:
+            return
+        self._record = None
+        instrumentation.record(record, self.connection, getattr(self, '_params', None))
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+    Соединение SQLite, все курсоры которого инструментированы.
+
+    Используется как фабрика соединений: sqlite3.connect(path, factory=InstrumentedConnection).
+    """
+
+    def cursor(self, factory=None):
+        """
+        Создаёт инструментированный курсор.
+        """
+        return super().cursor(factory or InstrumentedCursor)
+
+    def execute(self, sql, parameters=()):
+        """
+        Выполняет выражение через новый инструментированный курсор.
+        """
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        """
+        Выполняет выражение для набора параметров через новый инструментированный курсор.
+        """
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        """
+        Выполняет сценарий SQL через новый курсор.
+        """
+        return self.cursor().executescript(sql_script)
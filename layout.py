@@ -0,0 +1,144 @@
+"""
+Кэш раскладки графа связей покупателей.
+
+Раскладка spring_layout пересчитывается только при изменении графа: для того же набора вершин
+и тех же рёбер возвращаются сохранённые координаты, а при небольших изменениях расчёт
+начинается с прежних координат и выполняется за несколько итераций, поэтому вершины
+не перескакивают между обновлениями. Координаты сохраняются в файл между запусками программы.
+"""
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+import networkx as nx
+
+# Путь к файлу с сохранёнными раскладками по умолчанию
+LAYOUT_CACHE_PATH = 'data/graph_layout.json'
+
+
+def edges_digest(graph):
+    """
+    Вычисляет отпечаток рёбер графа, не зависящий от порядка рёбер и запуска программы.
+
+    Parameters
+    ----------
+    graph : nx.Graph
+        Граф с весами рёбер в атрибуте 'weight'.
+
+    Returns
+    -------
+    str
+        Шестнадцатеричный SHA-1 отсортированного списка рёбер.
+    """
+    edges = sorted((*sorted((str(u), str(v))), float(weight))
+                   for u, v, weight in graph.edges(data='weight', default=1.0))
+    return hashlib.sha1(json.dumps(edges, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class LayoutCache:
+    """
+    Раскладки графов, хранящиеся по набору вершин, с инкрементальным пересчётом.
+
+    Attributes
+    ----------
+    path : str
+        Путь к файлу, в котором раскладки сохраняются между запусками.
+    maxsize : int
+        Максимальное количество хранимых раскладок.
+    iterations : int
+        Количество итераций spring_layout для графа, большинство вершин которого ещё не размещалось.
+    incremental_iterations : int
+        Количество итераций spring_layout, если большинство вершин уже имеет координаты.
+    seed : int
+        Начальное значение генератора случайных чисел для размещения новых вершин.
+    """
+
+    def __init__(self, path=LAYOUT_CACHE_PATH, maxsize=16, iterations=50, incremental_iterations=10, seed=42):
+        self.path = path
+        self.maxsize = maxsize
+        self.iterations = iterations
+        self.incremental_iterations = incremental_iterations
+        self.seed = seed
+        # Набор вершин -> (отпечаток рёбер, {вершина: (x, y)}); последняя запись — самая свежая
+        self._layouts = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def layout(self, graph):
+        """
+        Возвращает координаты вершин графа, пересчитывая раскладку только при изменении графа.
+
+        Parameters
+        ----------
+        graph : nx.Graph
+            Граф для раскладки.
+
+        Returns
+        -------
+        dict
+            Словарь {вершина: (x, y)}.
+        """
+        nodes = frozenset(graph.nodes)
+        digest = edges_digest(graph)
+        entry = self._layouts.get(nodes)
+        if entry is not None and entry[0] == digest:
+            self._layouts.move_to_end(nodes)
+            self.hits += 1
+            return dict(entry[1])
+        self.misses += 1
+
+        # Начальные координаты — последние известные положения вершин
+        initial = {}
+        for _, positions in reversed(self._layouts.values()):
+            for node, position in positions.items():
+                if node in nodes and node not in initial:
+                    initial[node] = position
+            if len(initial) == len(nodes):
+                break
+        incremental = len(nodes) > 0 and len(initial) * 2 >= len(nodes)
+        positions = nx.spring_layout(graph, pos=initial or None, seed=self.seed,
+                                     iterations=self.incremental_iterations if incremental else self.iterations)
+        positions = {node: (float(x), float(y)) for node, (x, y) in positions.items()}
+
+        self._layouts[nodes] = (digest, positions)
+        self._layouts.move_to_end(nodes)
+        while len(self._layouts) > self.maxsize:
+            self._layouts.popitem(last=False)
+        return dict(positions)
+
+    def clear(self):
+        """
+        Удаляет все сохранённые раскладки.
+        """
+        self._layouts.clear()
+
+    def load(self):
+        """
+        Загружает раскладки из файла. Отсутствующий или повреждённый файл игнорируется.
+        """
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                data = json.load(file)
+            layouts = [(entry['edges'], {node: tuple(position) for node, position in entry['positions'].items()})
+                       for entry in data['layouts']]
+        except (OSError, ValueError, KeyError, TypeError):
+            return
+        self._layouts.clear()
+        for digest, positions in layouts[-self.maxsize:]:
+            self._layouts[frozenset(positions)] = (digest, positions)
+
+    def save(self):
+        """
+        Сохраняет раскладки в файл, от самой старой к самой свежей.
+        """
+        data = {'layouts': [{'edges': digest, 'positions': positions}
+                            for digest, positions in self._layouts.values()]}
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(data, file, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
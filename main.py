@@ -1,5 +1,17 @@
+import argparse
+from connection import PRAGMA_PROFILES, DEFAULT_PROFILE
+from instrumentation import instrumentation, SLOW_QUERY_LOG_PATH
 from gui import MainApp
 
 if __name__ == "__main__":
-    app = MainApp()
+    parser = argparse.ArgumentParser(description="Программа учета заказов интернет-магазина")
+    parser.add_argument("--db-profile", choices=list(PRAGMA_PROFILES), default=DEFAULT_PROFILE,
+                        help="профиль настроек SQLite: durable — надёжность, fast — скорость")
+    parser.add_argument("--slow-query-ms", type=float, default=instrumentation.slow_query_ms,
+                        help=f"порог медленного запроса в миллисекундах (журнал {SLOW_QUERY_LOG_PATH})")
+    parser.add_argument("--explain-slow", action="store_true",
+                        help="записывать в журнал план выполнения медленных запросов")
+    args = parser.parse_args()
+    instrumentation.configure_slow_log(slow_query_ms=args.slow_query_ms, explain_slow=args.explain_slow)
+    app = MainApp(db_profile=args.db_profile)
     app.mainloop()
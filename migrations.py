@@ -0,0 +1,243 @@
+"""
+Версионные миграции схемы базы данных.
+
+Номер текущей версии схемы хранится в PRAGMA user_version. Каждая миграция
+применяется в собственной транзакции, поэтому база данных никогда не остаётся
+в промежуточном состоянии.
+"""
+
+from dataclasses import dataclass
+from typing import List
+
+
+@dataclass(frozen=True)
+class Migration:
+    """
+    Описание одной миграции схемы.
+
+    Attributes
+    ----------
+    version : int
+        Версия схемы, которая устанавливается после применения миграции.
+    description : str
+        Краткое описание изменений.
+    statements : tuple
+        SQL-выражения миграции, выполняемые по порядку.
+    """
+    version: int
+    description: str
+    statements: tuple
+
+
+# Вторичные индексы: имя индекса -> (таблица, столбцы)
+INDEXES = {
+    'idx_orders_customer_id': ('orders', ('customer_id',)),
+    'idx_orders_date_created': ('orders', ('date_created',)),
+    'idx_orders_status': ('orders', ('status',)),
+    'idx_order_items_order_id': ('order_items', ('order_id',)),
+    'idx_order_items_product_id': ('order_items', ('product_id',)),
+    'idx_products_name': ('products', ('name',)),
+    'idx_customers_name': ('customers', ('name',)),
+}
+
+
+# Миграции перечисляются строго по возрастанию версии. Первая миграция использует
+# IF NOT EXISTS, так как базы данных, созданные до появления версий, уже содержат таблицы.
+MIGRATIONS = [
+    Migration(1, "Базовая схема: клиенты, товары, заказы и позиции заказов", (
+        """
+        CREATE TABLE IF NOT EXISTS customers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT UNIQUE CHECK(email IS NOT NULL),
+            phone TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            price REAL NOT NULL CHECK(price >= 0),
+            quantity INTEGER NOT NULL CHECK(quantity >= 0)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            customer_id INTEGER REFERENCES customers(id),
+            date_created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            status TEXT DEFAULT 'Новый',
+            total_amount REAL NOT NULL CHECK(total_amount >= 0)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS order_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER REFERENCES orders(id),
+            product_id INTEGER REFERENCES products(id),
+            quantity INTEGER NOT NULL CHECK(quantity > 0)
+        )
+        """,
+    )),
+    Migration(2, "Вторичные индексы по внешним ключам, датам и полям поиска", tuple(
+        f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} ({', '.join(columns)})"
+        for index_name, (table_name, columns) in INDEXES.items()
+    )),
+    Migration(3, "Индекс для сортировки и постраничного вывода заказов по сумме", (
+        "CREATE INDEX IF NOT EXISTS idx_orders_total_amount ON orders (total_amount)",
+    )),
+    Migration(4, "Полнотекстовые индексы FTS5 (trigram) для поиска клиентов, товаров и заказов", (
+        # Теневые таблицы: rowid совпадает с идентификатором исходной записи,
+        # столбцы содержат значения в том виде, в котором их видит пользователь
+        "CREATE VIRTUAL TABLE customers_fts USING fts5(id, name, email, phone, tokenize='trigram')",
+        "CREATE VIRTUAL TABLE products_fts USING fts5(id, name, price, quantity, tokenize='trigram')",
+        "CREATE VIRTUAL TABLE orders_fts USING fts5("
+        "id, customer_name, date_created, status, total_amount, tokenize='trigram')",
+
+        # Первичное заполнение индексов существующими данными
+        "INSERT INTO customers_fts (rowid, id, name, email, phone) "
+        "SELECT id, id, name, email, phone FROM customers",
+        "INSERT INTO products_fts (rowid, id, name, price, quantity) "
+        "SELECT id, id, name, price, quantity FROM products",
+        """
+        INSERT INTO orders_fts (rowid, id, customer_name, date_created, status, total_amount)
+        SELECT o.id, o.id, c.name, substr(o.date_created, 1, 19), o.status, o.total_amount
+        FROM orders AS o
+        LEFT JOIN customers AS c ON c.id = o.customer_id
+        """,
+
+        # Клиенты
+        """
+        CREATE TRIGGER customers_fts_ai AFTER INSERT ON customers BEGIN
+            INSERT INTO customers_fts (rowid, id, name, email, phone)
+            VALUES (new.id, new.id, new.name, new.email, new.phone);
+            UPDATE orders_fts SET customer_name = new.name
+            WHERE rowid IN (SELECT id FROM orders WHERE customer_id = new.id);
+        END
+        """,
+        """
+        CREATE TRIGGER customers_fts_au AFTER UPDATE ON customers BEGIN
+            DELETE FROM customers_fts WHERE rowid = old.id;
+            INSERT INTO customers_fts (rowid, id, name, email, phone)
+            VALUES (new.id, new.id, new.name, new.email, new.phone);
+            UPDATE orders_fts SET customer_name = new.name
+            WHERE rowid IN (SELECT id FROM orders WHERE customer_id = new.id);
+        END
+        """,
+        """
+        CREATE TRIGGER customers_fts_ad AFTER DELETE ON customers BEGIN
+            DELETE FROM customers_fts WHERE rowid = old.id;
+            UPDATE orders_fts SET customer_name = NULL
+            WHERE rowid IN (SELECT id FROM orders WHERE customer_id = old.id);
+        END
+        """,
+
+        # Товары
+        """
+        CREATE TRIGGER products_fts_ai AFTER INSERT ON products BEGIN
+            INSERT INTO products_fts (rowid, id, name, price, quantity)
+            VALUES (new.id, new.id, new.name, new.price, new.quantity);
+        END
+        """,
+        """
+        CREATE TRIGGER products_fts_au AFTER UPDATE ON products BEGIN
+            DELETE FROM products_fts WHERE rowid = old.id;
+            INSERT INTO products_fts (rowid, id, name, price, quantity)
+            VALUES (new.id, new.id, new.name, new.price, new.quantity);
+        END
+        """,
+        """
+        CREATE TRIGGER products_fts_ad AFTER DELETE ON products BEGIN
+            DELETE FROM products_fts WHERE rowid = old.id;
+        END
+        """,
+
+        # Заказы
+        """
+        CREATE TRIGGER orders_fts_ai AFTER INSERT ON orders BEGIN
+            INSERT INTO orders_fts (rowid, id, customer_name, date_created, status, total_amount)
+            VALUES (new.id, new.id, (SELECT name FROM customers WHERE id = new.customer_id),
+                    substr(new.date_created, 1, 19), new.status, new.total_amount);
+        END
+        """,
+        """
+        CREATE TRIGGER orders_fts_au AFTER UPDATE ON orders BEGIN
+            DELETE FROM orders_fts WHERE rowid = old.id;
+            INSERT INTO orders_fts (rowid, id, customer_name, date_created, status, total_amount)
+            VALUES (new.id, new.id, (SELECT name FROM customers WHERE id = new.customer_id),
+                    substr(new.date_created, 1, 19), new.status, new.total_amount);
+        END
+        """,
+        """
+        CREATE TRIGGER orders_fts_ad AFTER DELETE ON orders BEGIN
+            DELETE FROM orders_fts WHERE rowid = old.id;
+        END
+        """,
+    )),
+    Migration(5, "Покрывающий индекс для агрегатов заказов по покупателям", (
+        # Подсчёт заказов и выручки по покупателям читается из индекса без обращения к таблице
+        "CREATE INDEX IF NOT EXISTS idx_orders_customer_total ON orders (customer_id, total_amount)",
+    )),
+    Migration(6, "Индекс по дню заказа для группировки заказов по датам", (
+        # Группировка по дню читает индекс в порядке дат без сортировки всех заказов
+        "CREATE INDEX IF NOT EXISTS idx_orders_day ON orders (date(date_created))",
+    )),
+]
+
+
+def get_schema_version(conn) -> int:
+    """
+    Возвращает текущую версию схемы базы данных.
+
+    Parameters
+    ----------
+    conn : sqlite3.Connection
+        Соединение с базой данных.
+
+    Returns
+    -------
+    int
+        Значение PRAGMA user_version.
+    """
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn, migrations: List[Migration] = MIGRATIONS) -> List[int]:
+    """
+    Применяет к базе данных все миграции с версией выше текущей.
+
+    Если схема уже актуальна, выполняется только чтение PRAGMA user_version.
+
+    Parameters
+    ----------
+    conn : sqlite3.Connection
+        Соединение с базой данных.
+    migrations : list, optional
+        Список миграций, упорядоченный по возрастанию версии.
+
+    Returns
+    -------
+    list
+        Версии примененных миграций.
+    """
+    if not migrations or get_schema_version(conn) >= migrations[-1].version:
+        return []
+
+    applied = []
+    for migration in migrations:
+        # BEGIN IMMEDIATE блокирует запись, чтобы параллельно запущенный экземпляр
+        # приложения не применил ту же миграцию повторно
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if get_schema_version(conn) >= migration.version:
+                conn.rollback()
+                continue
+            for statement in migration.statements:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {int(migration.version)}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(migration.version)
+    return applied
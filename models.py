@@ -1,5 +1,5 @@
 from dataclasses import dataclass, field
-from typing import Optional, List
+from typing import Optional, List, NamedTuple
 from datetime import datetime
 
 @dataclass
@@ -138,4 +138,49 @@ class Order:
         # Обрезаем строку времени, чтобы убрать микросекунды
         cleaned_time = row[2].split('.')[0]
         dt = datetime.strptime(cleaned_time, '%Y-%m-%d %H:%M:%S')
-        return cls(id=row[0], customer_id=row[1], date_created=dt, status=row[3], total_amount=row[4])
\ No newline at end of file
+        return cls(id=row[0], customer_id=row[1], date_created=dt, status=row[3], total_amount=row[4])
+
+class OrderRow(NamedTuple):
+    """
+    Облегчённая строка списка заказов, объединённая с именем покупателя.
+
+    Attributes
+    ----------
+    id : int
+        Уникальный идентификатор заказа.
+    customer_id : Optional[int]
+        Идентификатор клиента, сделавшего заказ.
+    customer_name : Optional[str]
+        Имя клиента (None, если клиент не найден).
+    date_created : datetime
+        Дата создания заказа.
+    status : str
+        Текущий статус заказа.
+    total_amount : float
+        Общая сумма заказа.
+    """
+    id: int
+    customer_id: Optional[int]
+    customer_name: Optional[str]
+    date_created: datetime
+    status: str
+    total_amount: float
+
+    @classmethod
+    def from_tuple(cls, row):
+        """
+        Создает экземпляр класса `OrderRow` из кортежа данных.
+
+        Parameters
+        ----------
+        row : tuple
+            Кортеж (id, customer_id, customer_name, date_created, status, total_amount).
+
+        Returns
+        -------
+        OrderRow
+            Экземпляр класса `OrderRow`, созданный на основе предоставленных данных.
+        """
+        # Обрезаем строку времени, чтобы убрать микросекунды
+        dt = datetime.strptime(row[3].split('.')[0], '%Y-%m-%d %H:%M:%S')
+        return cls(row[0], row[1], row[2], dt, row[4], row[5])
\ No newline at end of file
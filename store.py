@@ -0,0 +1,286 @@
+"""
+Хранилище сущностей в памяти процесса (identity map) для клиентов и товаров.
+
+Таблицы клиентов и товаров небольшие и читаются постоянно, поэтому они загружаются
+один раз и далее поддерживаются в актуальном состоянии методами контроллера,
+которые изменяют эти таблицы.
+"""
+
+from typing import Dict, Iterable, List, Optional, Set
+
+from cache import copy_result
+from models import Customer, Product
+from db import select_customers, select_products, find_customers_by_ids, find_products_by_ids
+
+
+class EntityStore:
+    """
+    Словари клиентов и товаров по идентификатору с дополнительными индексами
+    по email клиента и наименованию товара.
+
+    Все методы возвращают копии объектов, поэтому изменения у вызывающего кода
+    не затрагивают хранилище.
+    """
+
+    def __init__(self):
+        self._customers: Dict[int, Customer] = {}
+        self._products: Dict[int, Product] = {}
+        self._customers_by_email: Dict[str, int] = {}
+        self._products_by_name: Dict[str, Set[int]] = {}
+        self._loaded = False
+
+    @property
+    def is_loaded(self):
+        """
+        Признак того, что данные загружены из базы данных.
+        """
+        return self._loaded
+
+    def load(self):
+        """
+        Загружает всех клиентов и все товары из базы данных.
+        """
+        self._customers.clear()
+        self._products.clear()
+        self._customers_by_email.clear()
+        self._products_by_name.clear()
+        for customer in select_customers():
+            self._put_customer(customer)
+        for product in select_products():
+            self._put_product(product)
+        self._loaded = True
+
+    def invalidate(self):
+        """
+        Отмечает данные устаревшими: они будут загружены заново при следующем обращении.
+        """
+        self._loaded = False
+
+    def _ensure_loaded(self):
+        """
+        Загружает данные при первом обращении или после invalidate().
+        """
+        if not self._loaded:
+            self.load()
+
+    def customers(self) -> List[Customer]:
+        """
+        Возвращает всех клиентов в порядке идентификаторов.
+
+        Returns
+        -------
+        list
+            Список объектов Customer.
+        """
+        self._ensure_loaded()
+        return [copy_result(self._customers[i]) for i in sorted(self._customers)]
+
+    def products(self) -> List[Product]:
+        """
+        Возвращает все товары в порядке идентификаторов.
+
+        Returns
+        -------
+        list
+            Список объектов Product.
+        """
+        self._ensure_loaded()
+        return [copy_result(self._products[i]) for i in sorted(self._products)]
+
+    def get_customer(self, customer_id) -> Optional[Customer]:
+        """
+        Возвращает клиента по идентификатору.
+
+        Parameters
+        ----------
+        customer_id : int
+            Идентификатор клиента.
+
+        Returns
+        -------
+        Customer or None
+            Клиент или None, если клиент не найден.
+        """
+        self._ensure_loaded()
+        return copy_result(self._customers.get(customer_id))
+
+    def get_product(self, product_id) -> Optional[Product]:
+        """
+        Возвращает товар по идентификатору.
+
+        Parameters
+        ----------
+        product_id : int
+            Идентификатор товара.
+
+        Returns
+        -------
+        Product or None
+            Товар или None, если товар не найден.
+        """
+        self._ensure_loaded()
+        return copy_result(self._products.get(product_id))
+
+    def get_customers(self, customer_ids: Iterable[int]) -> Dict[int, Customer]:
+        """
+        Возвращает клиентов по набору идентификаторов.
+
+        Parameters
+        ----------
+        customer_ids : iterable
+            Идентификаторы клиентов.
+
+        Returns
+        -------
+        dict
+            Словарь {идентификатор: Customer} для найденных клиентов.
+        """
+        self._ensure_loaded()
+        return {i: copy_result(self._customers[i]) for i in customer_ids if i in self._customers}
+
+    def get_products(self, product_ids: Iterable[int]) -> Dict[int, Product]:
+        """
+        Возвращает товары по набору идентификаторов.
+
+        Parameters
+        ----------
+        product_ids : iterable
+            Идентификаторы товаров.
+
+        Returns
+        -------
+        dict
+            Словарь {идентификатор: Product} для найденных товаров.
+        """
+        self._ensure_loaded()
+        return {i: copy_result(self._products[i]) for i in product_ids if i in self._products}
+
+    def get_customer_by_email(self, email) -> Optional[Customer]:
+        """
+        Возвращает клиента по адресу электронной почты.
+
+        Parameters
+        ----------
+        email : str
+            Адрес электронной почты.
+
+        Returns
+        -------
+        Customer or None
+            Клиент или None, если клиент не найден.
+        """
+        self._ensure_loaded()
+        customer_id = self._customers_by_email.get(email)
+        return self.get_customer(customer_id) if customer_id is not None else None
+
+    def get_product_by_name(self, name) -> Optional[Product]:
+        """
+        Возвращает товар по наименованию.
+
+        Наименования товаров не уникальны; при совпадении возвращается товар
+        с наименьшим идентификатором.
+
+        Parameters
+        ----------
+        name : str
+            Наименование товара.
+
+        Returns
+        -------
+        Product or None
+            Товар или None, если товар не найден.
+        """
+        self._ensure_loaded()
+        product_ids = self._products_by_name.get(name)
+        return self.get_product(min(product_ids)) if product_ids else None
+
+    def get_products_by_names(self, names: Iterable[str]) -> Dict[str, Product]:
+        """
+        Возвращает товары по набору наименований.
+
+        Parameters
+        ----------
+        names : iterable
+            Наименования товаров.
+
+        Returns
+        -------
+        dict
+            Словарь {наименование: Product} для найденных товаров.
+        """
+        self._ensure_loaded()
+        return {name: self.get_product(min(self._products_by_name[name]))
+                for name in names if name in self._products_by_name}
+
+    def refresh_customers(self, customer_ids: Iterable[int]):
+        """
+        Перечитывает из базы данных клиентов с указанными идентификаторами.
+
+        Клиенты, которых больше нет в базе данных, удаляются из хранилища.
+
+        Parameters
+        ----------
+        customer_ids : iterable
+            Идентификаторы изменённых клиентов.
+        """
+        if not self._loaded:
+            return
+        customer_ids = set(customer_ids)
+        found = find_customers_by_ids(customer_ids)
+        for customer_id in customer_ids:
+            self._remove_customer(customer_id)
+            if customer_id in found:
+                self._put_customer(found[customer_id])
+
+    def refresh_products(self, product_ids: Iterable[int]):
+        """
+        Перечитывает из базы данных товары с указанными идентификаторами.
+
+        Товары, которых больше нет в базе данных, удаляются из хранилища.
+
+        Parameters
+        ----------
+        product_ids : iterable
+            Идентификаторы изменённых товаров.
+        """
+        if not self._loaded:
+            return
+        product_ids = set(product_ids)
+        found = find_products_by_ids(product_ids)
+        for product_id in product_ids:
+            self._remove_product(product_id)
+            if product_id in found:
+                self._put_product(found[product_id])
+
+    def _put_customer(self, customer):
+        """
+        Добавляет клиента в словари хранилища.
+        """
+        self._customers[customer.id] = customer
+        self._customers_by_email[customer.email] = customer.id
+
+    def _put_product(self, product):
+        """
+        Добавляет товар в словари хранилища.
+        """
+        self._products[product.id] = product
+        self._products_by_name.setdefault(product.name, set()).add(product.id)
+
+    def _remove_customer(self, customer_id):
+        """
+        Удаляет клиента из словарей хранилища, если он там есть.
+        """
+        customer = self._customers.pop(customer_id, None)
+        if customer is not None and self._customers_by_email.get(customer.email) == customer_id:
+            del self._customers_by_email[customer.email]
+
+    def _remove_product(self, product_id):
+        """
+        Удаляет товар из словарей хранилища, если он там есть.
+        """
+        product = self._products.pop(product_id, None)
+        if product is not None:
+            product_ids = self._products_by_name[product.name]
+            product_ids.discard(product_id)
+            if not product_ids:
+                del self._products_by_name[product.name]
@@ -0,0 +1,295 @@
+"""
+Выполнение долгих операций в фоне без блокировки графического интерфейса.
+
+Tkinter допускает обращение к виджетам только из главного потока, поэтому задачи выполняются
+в пулах, а их результаты забираются главным потоком периодическим опросом через after().
+Операции с базой данных и файлами выполняются в пуле потоков, вычисления pandas и numpy —
+в пуле процессов. У каждой задачи есть ключ: новая задача с тем же ключом заменяет
+предыдущую, и результат заменённой задачи не доставляется.
+"""
+
+import multiprocessing
+from collections import Counter
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+# Период опроса завершившихся задач (в миллисекундах)
+POLL_INTERVAL_MS = 50
+
+# Виды задач: 'io' — пул потоков (база данных, файлы), 'cpu' — пул процессов (аналитика)
+TASK_KINDS = ('io', 'cpu')
+
+
+@dataclass
+class Task:
+    """
+    Задача, выполняющаяся в одном из пулов.
+
+    Attributes
+    ----------
+    key : str
+        Ключ задачи; новая задача с тем же ключом заменяет эту.
+    generation : int
+        Номер задачи среди задач с тем же ключом.
+    future : Future
+        Результат выполнения в пуле.
+    kind : str
+        Вид задачи ('io' или 'cpu').
+    on_success : callable, optional
+        Вызывается в главном потоке с результатом задачи.
+    on_error : callable, optional
+        Вызывается в главном потоке с исключением задачи.
+    widgets : tuple
+        Виджеты, недоступные, пока задача выполняется.
+    """
+    key: str
+    generation: int
+    future: Future
+    kind: str
+    on_success: Optional[Callable] = None
+    on_error: Optional[Callable] = None
+    widgets: tuple = ()
+
+
+class TaskRunner:
+    """
+    Исполнитель фоновых задач с доставкой результатов в главный поток Tkinter.
+
+    Attributes
+    ----------
+    root : tk.Misc
+        Виджет, через after() которого опрашиваются завершившиеся задачи.
+    on_busy : callable, optional
+        Вызывается с True, когда появляется первая выполняющаяся задача, и с False,
+        когда выполняющихся задач не остаётся (для индикатора занятости).
+    poll_interval : int
+        Период опроса завершившихся задач (в миллисекундах).
+    """
+
+    def __init__(self, root, io_workers=4, cpu_workers=1, cpu_initializer=None, cpu_initargs=(),
+                 on_busy=None, poll_interval=POLL_INTERVAL_MS):
+        """
+        Parameters
+        ----------
+        root : tk.Misc
+            Виджет для планирования опроса через after().
+        io_workers : int, optional
+            Количество потоков для задач 'io'.
+        cpu_workers : int, optional
+            Количество процессов для задач 'cpu'.
+        cpu_initializer : callable, optional
+            Функция, выполняемая при запуске каждого процесса (например, открытие базы данных).
+        cpu_initargs : tuple, optional
+            Аргументы cpu_initializer.
+        on_busy : callable, optional
+            Обработчик изменения занятости.
+        poll_interval : int, optional
+            Период опроса завершившихся задач (в миллисекундах).
+        """
+        self.root = root
+        self.on_busy = on_busy
+        self.poll_interval = poll_interval
+        self._io_pool = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix='task-io')
+        self._cpu_pool = None  # Процессы запускаются при первой задаче 'cpu'
+        self._cpu_workers = cpu_workers
+        self._cpu_initializer = cpu_initializer
+        self._cpu_initargs = cpu_initargs
+        self._tasks = []
+        self._generations = {}
+        self._disabled = Counter()  # Виджет -> число задач, заблокировавших его
+        self._widget_states = {}  # Виджет -> состояние до блокировки
+        self._poll_id = None
+        self._busy = False
+
+    @property
+    def busy(self):
+        """
+        Признак того, что есть выполняющиеся задачи.
+        """
+        return bool(self._tasks)
+
+    def is_running(self, key):
+        """
+        Проверяет, выполняется ли задача с указанным ключом.
+
+        Parameters
+        ----------
+        key : str
+            Ключ задачи.
+
+        Returns
+        -------
+        bool
+            True, если задача с этим ключом ещё не доставила результат.
+        """
+        return any(task.key == key for task in self._tasks)
+
+    def submit(self, key, func, *args, kind='io', on_success=None, on_error=None, widgets=()):
+        """
+        Запускает функцию в фоне, заменяя выполняющуюся задачу с тем же ключом.
+
+        Для задач 'cpu' функция и аргументы передаются в другой процесс, поэтому функция должна
+        быть определена на уровне модуля, а аргументы и результат — сериализуемы pickle.
+
+        Parameters
+        ----------
+        key : str
+            Ключ задачи.
+        func : callable
+            Выполняемая функция.
+        *args
+            Аргументы функции.
+        kind : str, optional
+            Вид задачи: 'io' — пул потоков, 'cpu' — пул процессов.
+        on_success : callable, optional
+            Вызывается в главном потоке с результатом функции.
+        on_error : callable, optional
+            Вызывается в главном потоке с исключением функции. Если не задан,
+            исключение передаётся обработчику ошибок Tkinter.
+        widgets : iterable, optional
+            Виджеты, недоступные, пока задача выполняется.
+
+        Returns
+        -------
+        Task
+            Запущенная задача.
+
+        Raises
+        ------
+        ValueError
+            Если вид задачи не поддерживается.
+        """
+        if kind not in TASK_KINDS:
+            raise ValueError(f"Неизвестный вид задачи: {kind}")
+        self.cancel(key)
+        if kind == 'io':
+            future = self._io_pool.submit(func, *args)
+        else:
+            try:
+                future = self._get_cpu_pool().submit(func, *args)
+            except BrokenProcessPool:
+                # Процесс пула завершился аварийно (возможно, во время уже отменённой задачи):
+                # сломанный пул останавливается, задача запускается в новом
+                self._cpu_pool.shutdown(wait=False, cancel_futures=True)
+                self._cpu_pool = None
+                future = self._get_cpu_pool().submit(func, *args)
+        task = Task(key, self._generations[key], future, kind, on_success, on_error, tuple(widgets))
+        self._tasks.append(task)
+        for widget in task.widgets:
+            self._disable(widget)
+        self._update_busy()
+        self._schedule_poll()
+        return task
+
+    def cancel(self, key):
+        """
+        Отменяет задачу с указанным ключом: её результат не будет доставлен.
+
+        Ещё не начавшаяся задача не выполняется; уже выполняющаяся доработает в фоне.
+
+        Parameters
+        ----------
+        key : str
+            Ключ задачи.
+        """
+        self._generations[key] = self._generations.get(key, 0) + 1
+        for task in [task for task in self._tasks if task.key == key]:
+            task.future.cancel()
+            self._release(task)
+        self._update_busy()
+
+    def shutdown(self):
+        """
+        Отменяет все задачи и останавливает пулы (при закрытии приложения).
+        """
+        for key in {task.key for task in self._tasks}:
+            self.cancel(key)
+        if self._poll_id is not None:
+            self.root.after_cancel(self._poll_id)
+            self._poll_id = None
+        self._io_pool.shutdown(wait=False, cancel_futures=True)
+        if self._cpu_pool is not None:
+            self._cpu_pool.shutdown(wait=False, cancel_futures=True)
+            self._cpu_pool = None
+
+    def _get_cpu_pool(self):
+        """
+        Возвращает пул процессов, создавая его при первом обращении.
+
+        Процессы запускаются методом spawn: копирование процесса с открытыми соединениями
+        SQLite и потоками Tkinter через fork небезопасно.
+        """
+        if self._cpu_pool is None:
+            self._cpu_pool = ProcessPoolExecutor(max_workers=self._cpu_workers,
+                                                 mp_context=multiprocessing.get_context('spawn'),
+                                                 initializer=self._cpu_initializer,
+                                                 initargs=self._cpu_initargs)
+        return self._cpu_pool
+
+    def _schedule_poll(self):
+        """
+        Планирует опрос задач, если он ещё не запланирован.
+        """
+        if self._poll_id is None and self._tasks:
+            self._poll_id = self.root.after(self.poll_interval, self._poll)
+
+    def _poll(self):
+        """
+        Доставляет в главном потоке результаты завершившихся задач.
+        """
+        self._poll_id = None
+        done = [task for task in self._tasks if task.future.done()]
+        for task in done:
+            self._release(task)
+        self._update_busy()
+        for task in done:
+            # Задача могла быть заменена обработчиком результата другой задачи
+            if task.future.cancelled() or self._generations.get(task.key) != task.generation:
+                continue
+            error = task.future.exception()
+            if error is None:
+                if task.on_success is not None:
+                    task.on_success(task.future.result())
+                continue
+            if task.on_error is not None:
+                task.on_error(error)
+            else:
+                self.root.report_callback_exception(type(error), error, error.__traceback__)
+        self._schedule_poll()
+
+    def _release(self, task):
+        """
+        Удаляет задачу из выполняющихся и возвращает доступность её виджетам.
+        """
+        self._tasks.remove(task)
+        for widget in task.widgets:
+            self._enable(widget)
+
+    def _update_busy(self):
+        """
+        Сообщает обработчику on_busy об изменении занятости.
+        """
+        if self.busy != self._busy:
+            self._busy = self.busy
+            if self.on_busy is not None:
+                self.on_busy(self._busy)
+
+    def _disable(self, widget):
+        """
+        Делает виджет недоступным, запоминая его исходное состояние.
+        """
+        if self._disabled[widget] == 0:
+            self._widget_states[widget] = str(widget.cget('state'))
+            widget.configure(state='disabled')
+        self._disabled[widget] += 1
+
+    def _enable(self, widget):
+        """
+        Возвращает виджету исходное состояние, если его не блокируют другие задачи.
+        """
+        self._disabled[widget] -= 1
+        if self._disabled[widget] == 0:
+            del self._disabled[widget]
+            widget.configure(state=self._widget_states.pop(widget))
@@ -1,6 +1,6 @@
 import unittest
 import pandas as pd
-from analysis import top5, orders_per_day, client_connections
+from analysis import top5, orders_per_day, client_connections, co_purchase_edges, to_frame
 
 class TestAnalysisFunctions(unittest.TestCase):
     """
@@ -129,5 +129,48 @@ class TestAnalysisFunctions(unittest.TestCase):
         self.assertEqual(first_edge[:2], ('123', 'Alex'))
         self.assertIsInstance(first_edge[-1], float)
 
+    def test_to_frame_functionality(self):
+        """
+        Тестирует построение DataFrame из итератора строк порциями.
+
+        Проверяется, что результат совпадает с DataFrame, построенным из списка, а пустой итератор
+        даёт пустой DataFrame с заданными столбцами.
+        """
+        rows = [(i, f'name{i}') for i in range(25)]
+        result = to_frame(iter(rows), ['id', 'name'], chunk_size=10)
+        pd.testing.assert_frame_equal(result, pd.DataFrame(rows, columns=['id', 'name']))
+        empty = to_frame(iter([]), ['id', 'name'])
+        self.assertEqual(len(empty), 0)
+        self.assertListEqual(list(empty.columns), ['id', 'name'])
+
+    def test_co_purchase_edges_functionality(self):
+        """
+        Тестирует построение рёбер графа по разреженной матрице покупок.
+
+        Проверяются следующие аспекты:
+        - Вес ребра равен сумме произведений числа позиций общих товаров.
+        - Каждая пара возвращается один раз (node1 < node2) по порядку имён, без само-связей.
+        - Порог веса, top_k сильнейших соседей и ограничение числа вершин прореживают граф.
+        - Пустой вход даёт пустой список.
+        - Результат не зависит от размера частей соединения по товару.
+        """
+        purchases = [('Петя', 'Хлеб', 2), ('Вася', 'Хлеб', 3), ('Вася', 'Сыр', 1), ('Аня', 'Сыр', 4),
+                     ('Оля', 'Икра', 1), ('Аня', 'Хлеб', 1), ('Оля', 'Хлеб', 1)]
+        result = co_purchase_edges(purchases)
+        self.assertListEqual(result, [('Аня', 'Вася', 7.0), ('Аня', 'Оля', 1.0), ('Аня', 'Петя', 2.0),
+                                      ('Вася', 'Оля', 3.0), ('Вася', 'Петя', 6.0), ('Оля', 'Петя', 2.0)])
+
+        self.assertListEqual(co_purchase_edges(purchases, min_weight=3),
+                             [('Аня', 'Вася', 7.0), ('Вася', 'Оля', 3.0), ('Вася', 'Петя', 6.0)])
+        # У каждого покупателя остаётся сильнейший сосед: Аня и Петя — Вася, Оля — Вася
+        self.assertListEqual(co_purchase_edges(purchases, top_k=1),
+                             [('Аня', 'Вася', 7.0), ('Вася', 'Оля', 3.0), ('Вася', 'Петя', 6.0)])
+        # После порога веса степень Васи 3, остальных — 1; при равенстве выбирается первое имя
+        self.assertListEqual(co_purchase_edges(purchases, min_weight=3, max_nodes=2), [('Аня', 'Вася', 7.0)])
+        self.assertListEqual(co_purchase_edges([], top_k=1, max_nodes=1), [])
+        # Соединение по товару частями, в том числе блоками покупателей одного товара, даёт тот же результат
+        for chunk_size in (1, 4, 9):
+            self.assertListEqual(co_purchase_edges(purchases, chunk_size=chunk_size), result)
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
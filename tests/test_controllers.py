@@ -0,0 +1,191 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+import db
+from controllers import AppController, dump_json_stream, DatetimeEncoder
+from instrumentation import instrumentation, track_queries
+from models import Customer, Product, OrderItem
+
+
+class TestControllerHelpers(unittest.TestCase):
+    """
+    Юнит-тесты для проверки вспомогательных функций controllers.py.
+    """
+
+    def test_dump_json_stream(self):
+        """
+        Тестирует потоковую запись JSON-массива.
+
+        Проверяется, что результат побайтно совпадает с json.dump для списка,
+        в том числе для пустого массива и вложенных структур.
+        """
+        items = [
+            {'id': 1, 'name': 'Иван', 'items': [{'product_id': 5, 'quantity': 2}]},
+            {'id': 2, 'name': 'Пётр', 'date_created': datetime(2025, 8, 21, 4, 57, 55), 'items': []},
+        ]
+        for data in (items, []):
+            expected = io.StringIO()
+            json.dump(data, expected, cls=DatetimeEncoder, ensure_ascii=False, indent=4)
+            actual = io.StringIO()
+            dump_json_stream(iter(data), actual, cls=DatetimeEncoder, ensure_ascii=False, indent=4)
+            self.assertEqual(actual.getvalue(), expected.getvalue())
+
+
+class TestAppController(unittest.TestCase):
+    """
+    Юнит-тесты для проверки AppController на временной базе данных.
+    """
+
+    def setUp(self):
+        """
+        Создаёт контроллер, работающий с временной базой данных.
+        """
+        self.tmp_dir = tempfile.mkdtemp()
+        self.controller = AppController(None, db_path=os.path.join(self.tmp_dir, 'test.sqlite'))
+
+    def tearDown(self):
+        """
+        Закрывает соединения и удаляет временную базу данных.
+        """
+        self.controller.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_import_merge(self):
+        """
+        Тестирует импорт в режиме объединения.
+
+        Проверяются следующие аспекты:
+        - Изменённая в файле запись обновляется, новая добавляется, заказы клиентов сохраняются.
+        - Сводка содержит количество добавленных, обновлённых и неизменённых записей.
+        - Заказы объединяются вместе с позициями.
+        """
+        db.insert_customer(Customer(name="Иван", email="ivan@example.com", phone="89001234567"))
+        db.insert_customer(Customer(name="Пётр", email="petr@example.com", phone="89001234568"))
+        db.insert_product(Product(name="Хлеб", price=20.0, quantity=10))
+        db.checkout_order(1, [OrderItem(product_id=1, quantity=1)])
+
+        filename = os.path.join(self.tmp_dir, 'customers.json')
+        self.assertEqual(self.controller.export_data(filename, 'customers', 'json'), (True, None))
+        with open(filename, encoding='utf-8') as file:
+            customers = json.load(file)
+        customers[1]['phone'] = "89000000000"
+        customers.append({'id': 3, 'name': "Сидор", 'email': "sidor@example.com", 'phone': "89001234569"})
+        with open(filename, 'w', encoding='utf-8') as file:
+            json.dump(customers, file, ensure_ascii=False)
+
+        success, summary = self.controller.import_data(filename, 'customers', 'json', mode='merge')
+        self.assertTrue(success)
+        self.assertEqual(summary, "Добавлено: 1, обновлено: 1, без изменений: 1, удалено: 0.")
+        self.assertEqual(db.find_customer_by_id(2).phone, "89000000000")
+        self.assertEqual(len(db.select_orders()), 1)
+
+        filename = os.path.join(self.tmp_dir, 'orders.json')
+        self.controller.export_data(filename, 'orders-details', 'json')
+        db.update_order(1, {'status': "Выполнен"})
+        success, summary = self.controller.import_data(filename, 'orders-details', 'json', mode='merge')
+        self.assertTrue(success, summary)
+        self.assertEqual(db.find_order_by_id(1).status, "Новый")
+        self.assertEqual(db.find_order_list_by_id(1), [OrderItem(product_id=1, quantity=1)])
+
+    def test_entity_store(self):
+        """
+        Тестирует хранилище клиентов и товаров в памяти.
+
+        Проверяются следующие аспекты:
+        - После загрузки поиск по идентификатору и наименованию не обращается к базе данных.
+        - Добавление, изменение, удаление и оформление заказа поддерживают хранилище в актуальном состоянии.
+        - Изменение полученного объекта не затрагивает хранилище.
+        """
+        self.assertEqual(self.controller.add_customer(
+            {'name': "Иван", 'email': "ivan@example.com", 'phone': "89001234567"}), (True, ""))
+        self.assertEqual(self.controller.add_product({'name': "Хлеб", 'price': "20", 'quantity': "10"}), (True, ""))
+        self.controller.add_product({'name': "Сыр", 'price': "500", 'quantity': "3"})
+        self.assertEqual(self.controller.find_product_id_by_name("Сыр"), 2)
+
+        misses = db.query_cache.cache_info().misses
+        product = self.controller.find_product_by_name("Хлеб")
+        self.assertEqual((product.price, product.quantity), (20.0, 10))
+        self.assertEqual(self.controller.find_customer_by_id(1).email, "ivan@example.com")
+        self.assertEqual(db.query_cache.cache_info().misses, misses)
+        product.quantity = 0
+        self.assertEqual(self.controller.find_product_by_id(1).quantity, 10)
+
+        self.controller.edit_product(1, {'name': "Батон", 'price': "25", 'quantity': "10"})
+        self.assertIsNone(self.controller.find_product_by_name("Хлеб"))
+        self.assertEqual(self.controller.find_product_by_name("Батон").price, 25.0)
+
+        self.controller.process_checkout([{'product_id': 1, 'quantity': 4}], 1)
+        self.assertEqual(self.controller.find_product_by_id(1).quantity, 6)
+
+        self.assertEqual(self.controller.delete_product(2), (True, None))
+        self.assertIsNone(self.controller.find_product_id_by_name("Сыр"))
+        self.assertEqual([p.id for p in self.controller.load_products()], [1])
+
+    def test_query_stats(self):
+        """
+        Тестирует учёт запросов по вызывающим методам контроллера.
+
+        Без track_callers вызывающий метод быстрых запросов не определяется.
+        """
+        instrumentation.reset()
+        self.controller.count_orders()
+        stats = self.controller.get_query_stats()
+        self.assertEqual((stats['total_queries'], stats['callers']), (1, {}))
+
+        instrumentation.track_callers = True
+        try:
+            self.controller.seek_orders({})
+            self.controller.find_order_by_id(1)
+        finally:
+            instrumentation.track_callers = False
+        callers = self.controller.get_query_stats()['callers']
+        self.assertEqual(callers['AppController.seek_orders'], 1)
+        self.assertEqual(callers['AppController.find_order_by_id'], 1)
+
+    def test_no_repeated_queries(self):
+        """
+        Тестирует отсутствие запросов в цикле при работе с заказом без хранилища в памяти.
+
+        Расчёт суммы и оформление заказа из нескольких позиций выполняют каждый запрос не более одного раза.
+        """
+        self.controller.store = None
+        db.insert_customer(Customer(name="Иван", email="ivan@example.com", phone="89001234567"))
+        for i in range(6):
+            db.insert_product(Product(name=f"Товар {i}", price=10.0, quantity=10))
+        cart = [{'product_id': i, 'quantity': 1} for i in range(1, 7)]
+        with track_queries("Оформление заказа", threshold=1, strict=True):
+            self.assertEqual(self.controller.calculate_total(cart), 60.0)
+            self.assertTrue(self.controller.find_products_by_names(f"Товар {i}" for i in range(6)))
+            self.assertEqual(self.controller.process_checkout(cart, 1), (True, "Заказ успешно оформлен!"))
+
+    def test_order_counts(self):
+        """
+        Тестирует данные графика динамики заказов за период.
+
+        Проверяются следующие аспекты:
+        - Период задаётся датами в формате ДД-ММ-ГГГГ, пустые границы не ограничивают период.
+        - Неверный формат даты и перевёрнутый период вызывают ValueError.
+        """
+        db.insert_customer(Customer(name="Иван", email="ivan@example.com", phone="89001234567"))
+        db.bulk_insert_data('orders', [
+            {'customer_id': 1, 'date_created': datetime(2025, 8, day, 12), 'status': "Новый", 'total_amount': 1.0}
+            for day in (20, 21, 21, 23)
+        ])
+        result = self.controller.c_order_counts('day', '21-08-2025', '')
+        self.assertEqual(result['date_created'].tolist(), ['21-08-2025', '23-08-2025'])
+        self.assertEqual(result['counts'].tolist(), [2, 1])
+        self.assertEqual(self.controller.c_order_counts('month')['counts'].tolist(), [4])
+
+        with self.assertRaises(ValueError):
+            self.controller.c_order_counts('day', '2025-08-21', '')
+        with self.assertRaises(ValueError):
+            self.controller.c_order_counts('day', '23-08-2025', '21-08-2025')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,606 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import unittest
+from datetime import date, datetime, timedelta
+
+import db
+import migrations
+from analysis import top5, orders_per_day, order_counts, client_connections, co_purchase_edges
+from instrumentation import instrumentation, track_queries, NPlusOneError
+from models import Customer, Product, OrderItem
+
+
+class TestDatabase(unittest.TestCase):
+    """
+    Юнит-тесты для проверки db.py на временной базе данных.
+    """
+
+    def setUp(self):
+        """
+        Создаёт временную базу данных и открывает для неё менеджер соединений.
+        """
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp_dir, 'test.sqlite')
+        db.open_connections(self.db_path)
+        db.create_tables()
+
+    def tearDown(self):
+        """
+        Закрывает соединения и удаляет временную базу данных.
+        """
+        db.close_connections()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_connection_reuse(self):
+        """
+        Тестирует работу менеджера соединений.
+
+        Проверяются следующие аспекты:
+        - Повторные вызовы в одном потоке получают одно и то же соединение.
+        - Другой поток получает собственное соединение.
+        - Данные, записанные через менеджер, читаются обратно.
+        """
+        self.assertIs(db.get_connection(), db.get_connection())
+
+        other = []
+        thread = threading.Thread(target=lambda: other.append(db.get_connection()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other[0], db.get_connection())
+
+        db.insert_customer(Customer(name="Иван", email="ivan@example.com", phone="89001234567"))
+        db.insert_product(Product(name="Хлеб", price=23.0, quantity=10))
+        customers = db.select_customers()
+        self.assertEqual(len(customers), 1)
+        self.assertEqual(customers[0].name, "Иван")
+        self.assertEqual(db.find_product_by_id(1).quantity, 10)
+
+    def test_pragma_profile(self):
+        """
+        Тестирует применение профиля PRAGMA к соединениям.
+
+        Проверяется, что профиль "fast" включает WAL и synchronous=NORMAL,
+        а неизвестный профиль вызывает ValueError.
+        """
+        db.open_connections(self.db_path, profile="fast")
+        conn = db.get_connection()
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 1)  # NORMAL
+        self.assertEqual(conn.execute("PRAGMA temp_store").fetchone()[0], 2)  # MEMORY
+        with self.assertRaises(ValueError):
+            db.open_connections(self.db_path, profile="unknown")
+
+    def test_indexes(self):
+        """
+        Тестирует создание вторичных индексов.
+
+        Проверяется, что все индексы созданы, повторный вызов create_tables безопасен,
+        а выборка позиций заказа использует индекс вместо полного сканирования.
+        """
+        db.create_tables()
+        conn = db.get_connection()
+        names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+        self.assertTrue(set(migrations.INDEXES).issubset(names))
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT product_id, quantity FROM order_items WHERE order_id=?", (1,)
+        ).fetchall()
+        self.assertIn('idx_order_items_order_id', plan[0][-1])
+
+    def test_migrations(self):
+        """
+        Тестирует применение версионных миграций.
+
+        Проверяются следующие аспекты:
+        - После create_tables версия схемы равна версии последней миграции.
+        - Повторный запуск не применяет ни одной миграции.
+        - Ошибочная миграция откатывается целиком и не меняет версию схемы.
+        """
+        conn = db.get_connection()
+        latest = migrations.MIGRATIONS[-1].version
+        self.assertEqual(migrations.get_schema_version(conn), latest)
+        self.assertEqual(migrations.migrate(conn), [])
+
+        broken = migrations.MIGRATIONS + [migrations.Migration(latest + 1, "Ошибочная миграция", (
+            "CREATE TABLE broken (id INTEGER)",
+            "INSERT INTO missing_table VALUES (1)",
+        ))]
+        with self.assertRaises(Exception):
+            migrations.migrate(conn, broken)
+        self.assertEqual(migrations.get_schema_version(conn), latest)
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        self.assertNotIn('broken', tables)
+
+    def test_checkout_order(self):
+        """
+        Тестирует оформление заказа одной транзакцией.
+
+        Проверяются следующие аспекты:
+        - Заказ, его позиции и списание со склада сохраняются вместе, сумма считается по ценам из базы.
+        - При нехватке товара транзакция откатывается целиком, ошибка называет товар, которого не хватило.
+        """
+        db.insert_customer(Customer(name="Иван", email="ivan@example.com", phone="89001234567"))
+        db.insert_product(Product(name="Хлеб", price=20.0, quantity=10))
+        db.insert_product(Product(name="Сыр", price=500.0, quantity=1))
+
+        order_id = db.checkout_order(1, [OrderItem(product_id=1, quantity=3), OrderItem(product_id=2, quantity=1)])
+        self.assertEqual(db.find_order_by_id(order_id).total_amount, 560.0)
+        self.assertEqual(len(db.find_order_list_by_id(order_id)), 2)
+        self.assertEqual(db.find_product_by_id(1).quantity, 7)
+        self.assertEqual(db.find_product_by_id(2).quantity, 0)
+
+        with self.assertRaises(db.InsufficientStockError) as ctx:
+            db.checkout_order(1, [OrderItem(product_id=1, quantity=1), OrderItem(product_id=2, quantity=1)])
+        self.assertEqual(ctx.exception.product_id, 2)
+        self.assertEqual(len(db.select_orders()), 1)
+        self.assertEqual(db.find_product_by_id(1).quantity, 7)
+
+        # Остаток изменился между проверкой и списанием: называется товар, условный UPDATE которого не сработал
+        db.insert_product(Product(name="Молоко", price=50.0, quantity=5))
+        db.get_connection().execute("""
+            CREATE TEMP TRIGGER drain_milk AFTER INSERT ON order_items
+            BEGIN UPDATE products SET quantity = 0 WHERE id = 3; END
+        """)
+        with self.assertRaises(db.InsufficientStockError) as ctx:
+            db.checkout_order(1, [OrderItem(product_id=1, quantity=1), OrderItem(product_id=3, quantity=2)])
+        self.assertEqual(ctx.exception.product_id, 3)
+        self.assertEqual(db.find_product_by_id(1).quantity, 7)
+
+    def test_select_order_rows(self):
+        """
+        Тестирует выборку списка заказов с именами покупателей.
+
+        Проверяется, что имя покупателя подставляется объединением таблиц,
+        а заказ удалённого покупателя возвращается с пустым именем.
+        """
+        db.insert_customer(Customer(name="Иван", email="ivan@example.com", phone="89001234567"))
+        db.insert_customer(Customer(name="Пётр", email="petr@example.com", phone="89001234568"))
+        db.insert_product(Product(name="Хлеб", price=20.0, quantity=10))
+        db.checkout_order(1, [OrderItem(product_id=1, quantity=1)])
+        db.checkout_order(2, [OrderItem(product_id=1, quantity=2)])
+        db.delete_customer(2)
+
+        rows = db.select_order_rows()
+        self.assertEqual([row.id for row in rows], [1, 2])
+        self.assertEqual(rows[0].customer_name, "Иван")
+        self.assertIsNone(rows[1].customer_name)
+        self.assertEqual(rows[1].total_amount, 40.0)
+
+    def test_seek_order_rows(self):
+        """
+        Тестирует выборку участков отсортированного списка заказов по ключу (keyset) и подсчёт заказов.
+
+        Проверяется, что обход списка по курсорам вперёд и назад возвращает каждый заказ ровно один раз
+        в порядке сортировки всего списка, а пропуск строк от курсора совпадает со срезом списка.
+        """
+        db.insert_customer(Customer(name="Иван", email="ivan@example.com", phone="89001234567"))
+        db.insert_product(Product(name="Хлеб", price=10.0, quantity=100))
+        self.assertEqual(db.count_orders(), 0)
+        for quantity in (3, 1, 2, 1, 5, 2, 4):
+            db.checkout_order(1, [OrderItem(product_id=1, quantity=quantity)])
+        db.delete_order(2)
+        self.assertEqual(db.count_orders(), 6)
+
+        for order_by, direction in (('id', 'desc'), ('date', 'asc'), ('amount', 'asc'), ('amount', 'desc')):
+            rows, cursors = db.seek_order_rows(order_by, direction, limit=100)
+            self.assertEqual(len(rows), 6)
+
+            result, after = [], None
+            while True:
+                page, page_cursors = db.seek_order_rows(order_by, direction, after=after, limit=4)
+                result.extend(page)
+                if len(page) < 4:
+                    break
+                after = page_cursors[-1]
+            self.assertEqual(result, rows)
+
+            self.assertEqual(db.seek_order_rows(order_by, direction, skip=2, limit=3)[0], rows[2:5])
+            self.assertEqual(db.seek_order_rows(order_by, direction, after=cursors[0], skip=2, limit=2)[0], rows[3:5])
+            self.assertEqual(db.seek_order_rows(order_by, direction, until=cursors[4], limit=3), (rows[2:5], cursors[2:5]))
+            self.assertEqual(db.seek_order_rows(order_by, direction, until=cursors[5], skip=2, limit=10)[0], rows[:4])
+
+        with self.assertRaises(ValueError):
+            db.seek_order_rows('customer_id')
+        with self.assertRaises(ValueError):
+            db.seek_order_rows('id', 'up')
+        with self.assertRaises(ValueError):
+            db.seek_order_rows(after=(1,), until=(3,))
+
+    def test_fulltext_search(self):
+        """
+        Тестирует полнотекстовый поиск по индексам FTS5.
+
+        Проверяются следующие аспекты:
+        - Поиск регистронезависимый и находит подстроку в любом поле, включая цену и статус.
+        - Индексы поддерживаются триггерами при изменении и удалении записей.
+        - Слишком короткое ключевое слово вызывает ValueError.
+        """
+        db.insert_customer(Customer(name="Иван Петров", email="ivan@example.com", phone="89001234567"))
+        db.insert_customer(Customer(name="Пётр", email="petr@example.com", phone="89007654321"))
+        db.insert_product(Product(name="Хлеб", price=345.0, quantity=10))
+        db.checkout_order(1, [OrderItem(product_id=1, quantity=1)])
+
+        self.assertEqual([c.id for c in db.fulltext_search_customers("ИВАН")], [1])
+        self.assertEqual(sorted(db.fulltext_search_ids('customers', "example")), [1, 2])
+        self.assertEqual([p.id for p in db.fulltext_search_products("45.0")], [1])
+        self.assertEqual([o.id for o in db.fulltext_search_orders("иван")], [1])
+        self.assertEqual([o.id for o in db.fulltext_search_orders("новый")], [1])
+
+        db.update_customer(Customer(id=1, name="Сидор", email="sidor@example.com", phone="89001234567"))
+        self.assertEqual(db.fulltext_search_customers("Иван"), [])
+        self.assertEqual([o.customer_name for o in db.fulltext_search_orders("сидор")], ["Сидор"])
+        db.delete_customer(2)
+        self.assertEqual(db.fulltext_search_ids('customers', "petr"), [])
+
+        with self.assertRaises(ValueError):
+            db.fulltext_search_ids('customers', "ив")
+
+    def test_find_by_ids(self):
+        """
+        Тестирует пакетный поиск записей по набору идентификаторов.
+
+        Проверяется, что наборы крупнее одной порции запроса обрабатываются целиком,
+        повторы игнорируются, а ненайденные идентификаторы не попадают в результат.
+        """
+        product_count = db.MAX_QUERY_VARIABLES + 50
+        for i in range(product_count):
+            db.insert_product(Product(name=f"Товар {i}", price=1.0, quantity=i))
+        ids = list(range(1, product_count + 1)) + [1, 2, product_count + 10]
+        products = db.find_products_by_ids(ids)
+        self.assertEqual(len(products), product_count)
+        self.assertEqual(products[product_count].quantity, product_count - 1)
+        self.assertNotIn(product_count + 10, products)
+        self.assertEqual(db.find_customers_by_ids([]), {})
+
+    def test_streaming_reads(self):
+        """
+        Тестирует потоковое чтение таблиц и заказов с позициями.
+
+        Проверяется, что итераторы возвращают те же данные, что и функции,
+        загружающие таблицу целиком, в том числе при порциях меньше размера таблицы.
+        """
+        db.insert_customer(Customer(name="Иван", email="ivan@example.com", phone="89001234567"))
+        db.insert_product(Product(name="Хлеб", price=20.0, quantity=10))
+        db.insert_product(Product(name="Сыр", price=500.0, quantity=10))
+        for items in ([OrderItem(1, 1)], [OrderItem(1, 2), OrderItem(2, 1)], [OrderItem(2, 3)]):
+            db.checkout_order(1, items)
+
+        headers, rows = db.iter_data('products', batch_size=1)
+        self.assertEqual(headers, ['id', 'name', 'price', 'quantity'])
+        self.assertEqual(list(rows), db.select_data('products'))
+
+        rows, cols = db.iter_analysis_data('order_items', batch_size=2)
+        self.assertEqual((list(rows), cols), db.select_analysis_data('order_items'))
+
+        self.assertEqual(list(db.iter_all_orders_with_items(batch_size=2)), db.select_all_orders_with_items())
+
+    def test_bulk_insert_data(self):
+        """
+        Тестирует порционную массовую вставку данных.
+
+        Проверяются следующие аспекты:
+        - Итератор записей длиннее одной порции вставляется целиком, прогресс сообщается после каждой порции.
+        - Режим replace очищает таблицу, пустой источник возвращает 0.
+        - Ошибка в середине загрузки откатывает всю вставку, настройки профиля восстанавливаются.
+        """
+        calls = []
+        records = ({'name': f"Товар {i}", 'price': 1.0, 'quantity': i} for i in range(25))
+        count = db.bulk_insert_data('products', records, chunk_size=10, bulk_pragmas=True,
+                                    progress=lambda done, rate: calls.append(done))
+        self.assertEqual(count, 25)
+        self.assertEqual(calls, [10, 20, 25])
+        self.assertEqual(len(db.select_products()), 25)
+        self.assertEqual(db.get_connection().execute("PRAGMA synchronous").fetchone()[0], 2)  # FULL
+
+        self.assertEqual(db.bulk_insert_data('products', iter([]), replace=True), 0)
+        self.assertEqual(db.select_products(), [])
+
+        broken = [{'name': "Хлеб", 'price': 20.0, 'quantity': 1}] * 15 + [{'name': "Сыр", 'price': -1.0, 'quantity': 1}]
+        with self.assertRaises(Exception):
+            db.bulk_insert_data('products', broken, chunk_size=10)
+        self.assertEqual(db.select_products(), [])
+
+    def test_bulk_insert_many(self):
+        """
+        Тестирует замену содержимого нескольких таблиц в одной транзакции.
+
+        Проверяется, что заказы и позиции заменяются вместе, а ошибка при вставке позиций
+        откатывает и замену заказов.
+        """
+        db.insert_customer(Customer(name="Иван", email="ivan@example.com", phone="89001234567"))
+        db.insert_product(Product(name="Хлеб", price=10.0, quantity=100))
+        db.checkout_order(1, [OrderItem(product_id=1, quantity=2)])
+
+        orders = [{'id': 5, 'customer_id': 1, 'date_created': '2025-01-01 10:00:00', 'status': 'Новый', 'total_amount': 30.0}]
+        broken = [{'order_id': 5, 'product_id': 1, 'quantity': 3}, {'order_id': 5, 'product_id': 1, 'quantity': 0}]
+        with self.assertRaises(Exception):
+            db.bulk_insert_many([('orders', iter(orders)), ('order_items', iter(broken))], chunk_size=1)
+        self.assertEqual([order.id for order in db.select_orders()], [1])
+        self.assertEqual(db.find_order_list_by_id(1), [OrderItem(product_id=1, quantity=2)])
+
+        counts = db.bulk_insert_many([('orders', orders), ('order_items', broken[:1])], bulk_pragmas=True)
+        self.assertEqual(counts, {'orders': 1, 'order_items': 1})
+        self.assertEqual([order.id for order in db.select_orders()], [5])
+        self.assertEqual(db.find_order_list_by_id(5), [OrderItem(product_id=1, quantity=3)])
+        self.assertEqual(db.get_connection().execute("PRAGMA synchronous").fetchone()[0], 2)  # FULL
+
+    def test_merge_data(self):
+        """
+        Тестирует объединение данных с таблицей по идентификатору.
+
+        Проверяются следующие аспекты:
+        - Новые записи добавляются, изменённые обновляются, совпадающие не перезаписываются.
+        - Значения из CSV (строки) сравниваются с учётом типов столбцов.
+        - Режим delete_missing удаляет записи, отсутствующие в данных.
+        - Позиции заказов заменяются только для заказов, встречающихся в данных.
+        """
+        for i in range(1, 4):
+            db.insert_product(Product(name=f"Товар {i}", price=10.0 * i, quantity=i))
+        records = [
+            {'id': '1', 'name': "Товар 1", 'price': '10.0', 'quantity': '1'},
+            {'id': '2', 'name': "Товар 2", 'price': '25.0', 'quantity': '2'},
+            {'id': '4', 'name': "Товар 4", 'price': '40.0', 'quantity': '4'},
+        ]
+        counts = db.merge_data('products', iter(records), chunk_size=2)
+        self.assertEqual(counts, {'inserted': 1, 'updated': 1, 'unchanged': 1, 'deleted': 0})
+        self.assertEqual(db.find_product_by_id(2).price, 25.0)
+        self.assertEqual(db.find_product_by_id(3).name, "Товар 3")
+
+        counts = db.merge_data('products', records, delete_missing=True)
+        self.assertEqual(counts, {'inserted': 0, 'updated': 0, 'unchanged': 3, 'deleted': 1})
+        self.assertEqual([p.id for p in db.select_products()], [1, 2, 4])
+        with self.assertRaises(ValueError):
+            db.merge_data('products', [{'name': "Хлеб", 'price': 1.0, 'quantity': 1}])
+
+        db.insert_customer(Customer(name="Иван", email="ivan@example.com", phone="89001234567"))
+        db.checkout_order(1, [OrderItem(product_id=1, quantity=1), OrderItem(product_id=2, quantity=1)])
+        db.checkout_order(1, [OrderItem(product_id=4, quantity=1)])
+        inserted = db.replace_order_items([{'order_id': '1', 'product_id': 4, 'quantity': 2}], chunk_size=1)
+        self.assertEqual(inserted, 1)
+        self.assertEqual(db.find_order_list_by_id(1), [OrderItem(product_id=4, quantity=2)])
+        self.assertEqual(len(db.find_order_list_by_id(2)), 1)
+
+    def test_merge_duplicates_and_references(self):
+        """
+        Тестирует объединение повторяющихся записей и удаление записей, используемых в других таблицах.
+
+        Проверяются следующие аспекты:
+        - Повторяющийся идентификатор учитывается в сводке один раз, действует последняя запись.
+        - Клиенты и товары, на которые ссылаются заказы, не удаляются, изменения откатываются.
+        - Вместе с отсутствующими в данных заказами удаляются их позиции.
+        - Ошибка при замене позиций откатывает и объединение заказов.
+        """
+        db.insert_product(Product(name="Хлеб", price=10.0, quantity=10))
+        records = [
+            {'id': 1, 'name': "Хлеб", 'price': 12.0, 'quantity': 10},
+            {'id': 2, 'name': "Сыр", 'price': 100.0, 'quantity': 1},
+            {'id': 2, 'name': "Сыр", 'price': 110.0, 'quantity': 1},
+            {'id': 3, 'name': "Молоко", 'price': 50.0, 'quantity': 5},
+            {'id': 2, 'name': "Сыр", 'price': 120.0, 'quantity': 1},
+        ]
+        counts = db.merge_data('products', records, chunk_size=4)
+        self.assertEqual(counts, {'inserted': 2, 'updated': 1, 'unchanged': 0, 'deleted': 0})
+        self.assertEqual(db.find_product_by_id(2).price, 120.0)
+
+        db.insert_customer(Customer(name="Иван", email="ivan@example.com", phone="89001234567"))
+        db.checkout_order(1, [OrderItem(product_id=2, quantity=1)])
+        db.checkout_order(1, [OrderItem(product_id=3, quantity=1)])
+        with self.assertRaises(ValueError):
+            db.merge_data('products', [{'id': 1, 'name': "Хлеб", 'price': 15.0, 'quantity': 10}], delete_missing=True)
+        self.assertEqual([(p.id, p.price) for p in db.select_products()], [(1, 12.0), (2, 120.0), (3, 50.0)])
+        with self.assertRaises(ValueError):
+            db.merge_data('customers', [], delete_missing=True)
+        self.assertEqual(len(db.select_customers()), 1)
+
+        order = {'id': 1, 'customer_id': 1, 'date_created': '2025-01-01 10:00:00', 'status': 'Выполнен',
+                 'total_amount': 120.0}
+        with self.assertRaises(Exception):
+            db.merge_orders_details([order], [{'order_id': 1, 'product_id': 2, 'quantity': 0}])
+        self.assertEqual(db.find_order_by_id(1).status, "Новый")
+
+        counts = db.merge_orders_details([order], [{'order_id': 1, 'product_id': 1, 'quantity': 2}],
+                                         delete_missing=True)
+        self.assertEqual(counts, {'inserted': 0, 'updated': 1, 'unchanged': 0, 'deleted': 1})
+        self.assertEqual(db.find_order_list_by_id(1), [OrderItem(product_id=1, quantity=2)])
+        self.assertEqual(db.find_order_list_by_id(2), [])
+
+    def test_query_cache(self):
+        """
+        Тестирует кэш результатов функций чтения.
+
+        Проверяются следующие аспекты:
+        - Повторный вызов обслуживается из кэша и возвращает независимую копию.
+        - Функции записи делают устаревшими результаты, зависящие от изменённых таблиц.
+        - Изменения, зафиксированные через другое соединение, обнаруживаются по PRAGMA data_version,
+          которая проверяется не чаще одного раза за check_interval.
+        - Количество записей ограничено, старые записи вытесняются.
+        """
+        db.insert_product(Product(name="Хлеб", price=20.0, quantity=10))
+        db.select_products()
+        hits = db.query_cache.cache_info().hits
+        products = db.select_products()
+        self.assertEqual(db.query_cache.cache_info().hits, hits + 1)
+        products[0].quantity -= 1
+        self.assertEqual(db.select_products()[0].quantity, 10)
+
+        db.update_product(Product(id=1, name="Хлеб", price=20.0, quantity=5))
+        self.assertEqual(db.find_product_by_id(1).quantity, 5)
+        db.bulk_insert_data('products', [{'name': "Сыр", 'price': 500.0, 'quantity': 1}])
+        self.assertEqual(len(db.select_products()), 2)
+
+        check_interval = db.query_cache.check_interval
+        db.query_cache.check_interval = 3600.0
+        try:
+            self.assertEqual(db.find_product_by_id(1).quantity, 5)
+            other = sqlite3.connect(self.db_path)
+            other.execute("UPDATE products SET quantity = 7 WHERE id = 1")
+            other.commit()
+            other.close()
+            self.assertEqual(db.find_product_by_id(1).quantity, 5)
+            db.query_cache.recheck()
+            self.assertEqual(db.find_product_by_id(1).quantity, 7)
+        finally:
+            db.query_cache.check_interval = check_interval
+
+        maxsize = db.query_cache.maxsize
+        for i in range(maxsize + 10):
+            db.find_product_by_id(i)
+        self.assertEqual(db.query_cache.cache_info().currsize, maxsize)
+
+    def test_instrumentation(self):
+        """
+        Тестирует учёт выполненных выражений и журнал медленных запросов.
+
+        Проверяются следующие аспекты:
+        - Для каждого выражения учитываются количество выполнений и прочитанные или изменённые строки,
+          в том числе при итерации по курсору.
+        - Форма параметров записывается без самих значений.
+        - Медленные выражения попадают в журнал вместе с планом выполнения.
+        """
+        instrumentation.reset()
+        db.insert_product(Product(name="Хлеб", price=20.0, quantity=10))
+        db.bulk_insert_data('products', [{'name': "Сыр", 'price': 500.0, 'quantity': 1}] * 3)
+        db.find_products_by_ids([1, 2, 3])
+        summary = instrumentation.summary()
+        select = summary['statements']["SELECT * FROM products WHERE id IN (?, ?, ?) ORDER BY id"]
+        self.assertEqual((select.count, select.rows), (1, 3))
+        insert = summary['statements']["INSERT INTO products (name, price, quantity) VALUES (?, ?, ?)"]
+        self.assertEqual((insert.count, insert.rows), (2, 4))
+        self.assertEqual(instrumentation.recent[-1].params, '(3)')
+        self.assertNotIn("Хлеб", repr(list(instrumentation.recent)))
+        rows = list(db.get_connection().execute("SELECT id FROM products"))
+        self.assertEqual((len(rows), instrumentation.recent[-1].rows), (4, 4))
+
+        log_path = os.path.join(self.tmp_dir, 'slow.log')
+        instrumentation.configure_slow_log(log_path, slow_query_ms=0, explain_slow=True)
+        try:
+            db.select_orders_by_customer_id(1)
+        finally:
+            instrumentation.close_slow_log()
+            instrumentation.slow_query_ms, instrumentation.explain_slow = 100.0, False
+        with open(log_path, encoding='utf-8') as file:
+            log = file.read()
+        self.assertIn("sql=SELECT * FROM orders WHERE customer_id=?", log)
+        self.assertIn("idx_orders_customer_id", log)
+
+    def test_track_queries(self):
+        """
+        Тестирует обнаружение повторяющихся запросов (N+1) в рамках одного действия.
+
+        Проверяются следующие аспекты:
+        - Запросы в цикле по идентификаторам превышают порог и в строгом режиме вызывают NPlusOneError.
+        - Пакетный запрос того же набора данных порог не превышает.
+        - Декоратор считает запросы каждого вызова отдельно.
+        """
+        for i in range(10):
+            db.insert_product(Product(name=f"Товар {i}", price=1.0, quantity=i))
+
+        with self.assertRaises(NPlusOneError) as ctx:
+            with track_queries("Цикл по товарам", threshold=3, strict=True):
+                for i in range(1, 11):
+                    db.find_product_by_id(i)
+        self.assertEqual(list(ctx.exception.repeated.values()), [10])
+
+        with track_queries("Пакетный запрос", threshold=3, strict=True) as tracker:
+            db.find_products_by_names(f"Товар {i}" for i in range(10))
+        self.assertEqual(tracker.count, 1)
+
+        @track_queries(threshold=1, strict=True)
+        def load_one(product_id):
+            return db.find_product_by_id(product_id)
+
+        self.assertEqual(load_one(1).name, "Товар 0")
+        self.assertEqual(load_one(2).name, "Товар 1")
+
+    def test_select_top_customers(self):
+        """
+        Тестирует рейтинг покупателей, вычисляемый агрегатом в SQLite.
+
+        Проверяются следующие аспекты:
+        - Результат совпадает с расчётом top5 в pandas по полным таблицам для обеих метрик.
+        - Параметр k ограничивает число строк.
+        - Агрегат читается из покрывающего индекса без обращения к таблице заказов.
+        - Неизвестная метрика вызывает ValueError.
+        """
+        for i, name in enumerate(("Иван", "Пётр", "Анна", "Олег", "Мария", "Ольга")):
+            db.insert_customer(Customer(name=name, email=f"c{i}@example.com", phone=f"8900123456{i}"))
+        db.insert_product(Product(name="Хлеб", price=10.0, quantity=1000))
+        # Число заказов и сумма по покупателям различаются и не содержат равных значений
+        for customer_id, quantities in ((1, (1, 1, 1, 1)), (2, (20, 30)), (3, (2, 2, 2)),
+                                        (4, (40,)), (5, (3, 4, 5, 6, 7)), (6, (9, 9, 9, 9, 9, 9))):
+            for quantity in quantities:
+                db.checkout_order(customer_id, [OrderItem(product_id=1, quantity=quantity)])
+
+        for metric, column in (('orders', 'number_of_orders'), ('revenue', 'revenue')):
+            expected = top5([db.iter_analysis_data('customers'), db.iter_analysis_data('orders')], metric=metric)
+            self.assertEqual(db.select_top_customers(5, metric),
+                             list(zip(expected['name'], expected[column])))
+        self.assertEqual([row[0] for row in db.select_top_customers(2, 'revenue')], ["Ольга", "Пётр"])
+
+        plan = db.get_connection().execute(
+            "EXPLAIN QUERY PLAN SELECT customer_id, SUM(total_amount) FROM orders GROUP BY customer_id"
+        ).fetchall()
+        self.assertIn('COVERING INDEX idx_orders_customer_total', plan[0][-1])
+
+        with self.assertRaises(ValueError):
+            db.select_top_customers(5, 'profit')
+
+    def test_select_order_counts(self):
+        """
+        Тестирует количество заказов по интервалам, вычисляемое группировкой в SQLite.
+
+        Проверяются следующие аспекты:
+        - Для дней, недель и месяцев результат совпадает с расчётом orders_per_day в pandas.
+        - Границы периода включаются целиком, с учётом времени заказа и дробных секунд.
+        - Группировка по дню и фильтр по периоду используют индекс idx_orders_day без сортировки.
+        - Неизвестный интервал вызывает ValueError.
+        """
+        db.insert_customer(Customer(name="Иван", email="ivan@example.com", phone="89001234567"))
+        start = datetime(2024, 12, 28, 23, 59, 59, 500000)
+        db.bulk_insert_data('orders', ({'customer_id': 1, 'date_created': start + timedelta(hours=7 * i),
+                                        'status': "Новый", 'total_amount': 1.0} for i in range(300)))
+
+        for bucket in ('day', 'week', 'month'):
+            for date_from, date_to in ((None, None), (date(2025, 1, 6), date(2025, 2, 2))):
+                expected = orders_per_day(db.iter_analysis_data('orders'), bucket, date_from, date_to)
+                result = order_counts(db.select_order_counts(bucket, date_from, date_to))
+                self.assertEqual(result.to_dict('list'), expected.to_dict('list'))
+
+        self.assertEqual(db.select_order_counts('day', date(2024, 12, 28), date(2024, 12, 28)), [('2024-12-28', 1)])
+        self.assertEqual(db.select_order_counts('month', date_to=date(2024, 12, 31)), [('2024-12-01', 11)])
+
+        plan = db.get_connection().execute(
+            "EXPLAIN QUERY PLAN SELECT date(date_created) AS day, COUNT(*) FROM orders "
+            "WHERE date(date_created) >= ? AND date(date_created) <= ? GROUP BY day", ('2025-01-01', '2025-01-31')
+        ).fetchall()
+        self.assertIn('idx_orders_day', plan[-1][-1])
+        self.assertNotIn('TEMP B-TREE', str(plan))
+
+        with self.assertRaises(ValueError):
+            db.select_order_counts('year')
+
+    def test_select_customer_purchases(self):
+        """
+        Тестирует связи покупателей, построенные по покупкам, сгруппированным в SQLite.
+
+        Проверяется, что рёбра совпадают с расчётом client_connections в pandas по полным таблицам,
+        в том числе для покупателей с одинаковыми именами и заказов удалённого покупателя.
+        """
+        for i, name in enumerate(("Иван", "Пётр", "Анна", "Иван", "Олег")):
+            db.insert_customer(Customer(name=name, email=f"c{i}@example.com", phone=f"8900123456{i}"))
+        for name in ("Хлеб", "Сыр", "Хлеб", "Икра"):
+            db.insert_product(Product(name=name, price=10.0, quantity=100))
+        for customer_id, product_ids in ((1, (1, 2)), (2, (1, 1, 3)), (3, (2, 4)), (4, (3,)), (5, (4,)), (2, (2,))):
+            db.checkout_order(customer_id, [OrderItem(product_id=i, quantity=1) for i in product_ids])
+        db.delete_customer(5)
+
+        expected = client_connections([db.iter_analysis_data(table)
+                                       for table in ('customers', 'products', 'orders', 'order_items')])
+        self.assertTrue(expected)
+        self.assertEqual(co_purchase_edges(db.select_customer_purchases()), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import networkx as nx
+
+from layout import LayoutCache
+
+
+class TestLayoutCache(unittest.TestCase):
+    """
+    Юнит-тесты для проверки кэша раскладки графа layout.py.
+    """
+
+    def setUp(self):
+        """
+        Создаёт кэш с файлом во временном каталоге и небольшой граф связей.
+        """
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache = LayoutCache(path=os.path.join(self.tmp_dir, 'layout.json'))
+        self.graph = nx.Graph()
+        self.graph.add_weighted_edges_from([('Иван', 'Пётр', 2.0), ('Пётр', 'Анна', 1.0), ('Анна', 'Олег', 3.0),
+                                            ('Олег', 'Иван', 1.0), ('Анна', 'Мария', 1.0)])
+
+    def tearDown(self):
+        """
+        Удаляет временный каталог.
+        """
+        shutil.rmtree(self.tmp_dir)
+
+    def test_layout_reuse(self):
+        """
+        Тестирует повторное использование раскладки.
+
+        Проверяются следующие аспекты:
+        - Для того же набора вершин и тех же рёбер раскладка не пересчитывается, порядок рёбер не важен.
+        - Изменение веса ребра приводит к пересчёту, начатому с прежних координат.
+        - Пустой граф даёт пустую раскладку.
+        """
+        positions = self.cache.layout(self.graph)
+        self.assertEqual(set(positions), set(self.graph.nodes))
+
+        reordered = nx.Graph()
+        reordered.add_weighted_edges_from(reversed([(v, u, w) for u, v, w in self.graph.edges(data='weight')]))
+        self.assertEqual(self.cache.layout(reordered), positions)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+        changed = self.graph.copy()
+        changed['Иван']['Пётр']['weight'] = 5.0
+        # Без итераций инкрементальный пересчёт возвращает прежние координаты
+        self.cache.incremental_iterations = 0
+        new_positions = self.cache.layout(changed)
+        self.assertEqual(self.cache.misses, 2)
+        for node in positions:
+            self.assertAlmostEqual(new_positions[node][0], positions[node][0], places=6)
+            self.assertAlmostEqual(new_positions[node][1], positions[node][1], places=6)
+
+        self.assertEqual(self.cache.layout(nx.Graph()), {})
+
+    def test_save_load(self):
+        """
+        Тестирует сохранение раскладок между запусками.
+
+        Проверяется, что загруженный кэш возвращает сохранённые координаты без пересчёта,
+        а отсутствующий или повреждённый файл не мешает работе.
+        """
+        positions = self.cache.layout(self.graph)
+        self.cache.save()
+
+        loaded = LayoutCache(path=self.cache.path)
+        loaded.load()
+        self.assertEqual(loaded.layout(self.graph), positions)
+        self.assertEqual(loaded.misses, 0)
+
+        with open(self.cache.path, 'w', encoding='utf-8') as file:
+            file.write("{")
+        broken = LayoutCache(path=self.cache.path)
+        broken.load()
+        LayoutCache(path=os.path.join(self.tmp_dir, 'missing.json')).load()
+        self.assertEqual(set(broken.layout(self.graph)), set(self.graph.nodes))
+
+
+if __name__ == '__main__':
+    unittest.main()
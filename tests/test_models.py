@@ -1,5 +1,5 @@
 import unittest
-from models import Customer, Product, OrderItem, Order
+from models import Customer, Product, OrderItem, Order, OrderRow
 from datetime import datetime
 
 class TestModels(unittest.TestCase):
@@ -106,5 +106,20 @@ class TestModels(unittest.TestCase):
         self.assertEqual(order_from_tuple.status, "Оплачен")
         self.assertEqual(order_from_tuple.total_amount, 1000.0)
 
+    def test_order_row_class(self):
+        """
+        Тестирует работоспособность класса `OrderRow`.
+
+        Проверяется создание строки списка заказов из кортежа данных с отбрасыванием микросекунд в дате.
+        """
+        row = OrderRow.from_tuple((7, 3, "Иван Иванов", "2025-08-21 04:57:55.123456", "Новый", 277.5))
+        self.assertIsInstance(row, OrderRow)
+        self.assertEqual(row.id, 7)
+        self.assertEqual(row.customer_id, 3)
+        self.assertEqual(row.customer_name, "Иван Иванов")
+        self.assertEqual(row.date_created, datetime(2025, 8, 21, 4, 57, 55))
+        self.assertEqual(row.status, "Новый")
+        self.assertEqual(row.total_amount, 277.5)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,241 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures.process import BrokenProcessPool
+
+import db
+from connection import PRAGMA_PROFILES
+from controllers import init_analysis_worker, compute_analysis
+from instrumentation import instrumentation
+from models import Customer, Product, OrderItem
+from tasks import TaskRunner
+
+
+def worker_settings():
+    """
+    Возвращает профиль SQLite и настройки инструментирования процесса пула.
+    """
+    return db.connection_manager.profile, instrumentation.settings()
+
+
+class FakeRoot:
+    """
+    Замена главного окна Tkinter: хранит вызовы, запланированные через after().
+    """
+
+    def __init__(self):
+        self.callbacks = {}
+        self.errors = []
+        self._next_id = 0
+
+    def after(self, ms, func):
+        self._next_id += 1
+        self.callbacks[self._next_id] = func
+        return self._next_id
+
+    def after_cancel(self, callback_id):
+        self.callbacks.pop(callback_id, None)
+
+    def report_callback_exception(self, exc_type, exc, tb):
+        self.errors.append(exc)
+
+    def run_pending(self, timeout=30.0):
+        """
+        Выполняет запланированные вызовы, пока они есть (аналог цикла событий).
+        """
+        deadline = time.monotonic() + timeout
+        while self.callbacks:
+            if time.monotonic() > deadline:
+                raise AssertionError("Задачи не завершились за отведённое время")
+            for callback_id, func in list(self.callbacks.items()):
+                del self.callbacks[callback_id]
+                func()
+            time.sleep(0.01)
+
+
+class FakeWidget:
+    """
+    Замена виджета Tkinter с параметром state.
+    """
+
+    def __init__(self, state='normal'):
+        self.state = state
+
+    def cget(self, option):
+        return self.state
+
+    def configure(self, state):
+        self.state = state
+
+
+def fail(message):
+    raise RuntimeError(message)
+
+
+def crash():
+    os._exit(1)
+
+
+class TestTaskRunner(unittest.TestCase):
+    """
+    Юнит-тесты для проверки исполнителя фоновых задач tasks.py.
+    """
+
+    def setUp(self):
+        """
+        Создаёт исполнитель с заменой главного окна.
+        """
+        self.root = FakeRoot()
+        self.busy = []
+        self.runner = TaskRunner(self.root, on_busy=self.busy.append)
+
+    def tearDown(self):
+        """
+        Останавливает пулы исполнителя.
+        """
+        self.runner.shutdown()
+
+    def test_delivery(self):
+        """
+        Тестирует доставку результатов в главный поток.
+
+        Проверяются следующие аспекты:
+        - Результат и исключение передаются обработчикам только при опросе через after().
+        - Исключение без обработчика передаётся report_callback_exception.
+        - Виджеты недоступны, пока выполняется задача, затем восстанавливают исходное состояние.
+        - Индикатор занятости включается и выключается по одному разу.
+        """
+        results, errors = [], []
+        button, combo = FakeWidget(), FakeWidget('readonly')
+        self.runner.submit('sum', sum, [1, 2, 3], on_success=results.append, widgets=[button, combo])
+        self.runner.submit('fail', fail, "ошибка", on_error=errors.append, widgets=[button])
+        self.runner.submit('unhandled', fail, "без обработчика")
+        self.assertEqual((button.state, combo.state), ('disabled', 'disabled'))
+        self.assertEqual(results, [])
+
+        self.root.run_pending()
+        self.assertEqual(results, [6])
+        self.assertEqual([str(e) for e in errors], ["ошибка"])
+        self.assertEqual([str(e) for e in self.root.errors], ["без обработчика"])
+        self.assertEqual((button.state, combo.state), ('normal', 'readonly'))
+        self.assertEqual(self.busy, [True, False])
+        self.assertFalse(self.runner.busy)
+
+        with self.assertRaises(ValueError):
+            self.runner.submit('sum', sum, [1], kind='gpu')
+
+    def test_supersede(self):
+        """
+        Тестирует замену задачи новой задачей с тем же ключом и отмену по ключу.
+
+        Результат заменённой задачи не доставляется, даже если она завершилась позже новой.
+        """
+        results = []
+        release = threading.Event()
+        self.runner.submit('orders', lambda: release.wait(5) and 'старые', on_success=results.append)
+        self.runner.submit('orders', lambda: 'новые', on_success=results.append)
+        self.assertTrue(self.runner.is_running('orders'))
+        self.root.run_pending()
+        release.set()
+        self.assertEqual(results, ['новые'])
+
+        self.runner.submit('orders', lambda: 'отменённые', on_success=results.append)
+        self.runner.cancel('orders')
+        self.root.run_pending()
+        self.assertEqual(results, ['новые'])
+        self.assertFalse(self.runner.is_running('orders'))
+
+    def test_broken_cpu_pool(self):
+        """
+        Тестирует замену пула процессов, процесс которого аварийно завершился во время отменённой задачи.
+
+        Результат отменённой задачи не доставляется, а следующая задача выполняется в новом пуле.
+        """
+        results = []
+        task = self.runner.submit('graph', crash, kind='cpu', on_success=results.append)
+        self.runner.cancel('graph')
+        self.assertIsInstance(task.future.exception(timeout=60), BrokenProcessPool)
+        broken = self.runner._cpu_pool
+
+        self.runner.submit('graph', sum, [1, 2], kind='cpu', on_success=results.append)
+        self.root.run_pending(timeout=60.0)
+        self.assertEqual(results, [3])
+        self.assertEqual(self.root.errors, [])
+        self.assertIsNot(self.runner._cpu_pool, broken)
+
+
+class TestAnalysisWorker(unittest.TestCase):
+    """
+    Тест вычисления аналитики в пуле процессов на временной базе данных.
+    """
+
+    def setUp(self):
+        """
+        Создаёт временную базу данных с заказами.
+        """
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp_dir, 'test.sqlite')
+        db.open_connections(self.db_path)
+        db.create_tables()
+        for i, name in enumerate(("Иван", "Пётр", "Анна")):
+            db.insert_customer(Customer(name=name, email=f"c{i}@example.com", phone=f"8900123456{i}"))
+        for name in ("Хлеб", "Сыр"):
+            db.insert_product(Product(name=name, price=10.0, quantity=100))
+        for customer_id, product_ids in ((1, (1, 2)), (2, (1,)), (3, (2,)), (1, (1,))):
+            db.checkout_order(customer_id, [OrderItem(product_id=i, quantity=1) for i in product_ids])
+
+    def tearDown(self):
+        """
+        Закрывает соединения и удаляет временную базу данных.
+        """
+        db.close_connections()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_compute_analysis_in_process(self):
+        """
+        Тестирует вычисление данных графиков в процессе пула аналитики.
+
+        Проверяется, что процесс открывает базу данных инициализатором и возвращает те же данные,
+        что и вычисление в текущем процессе.
+        """
+        root = FakeRoot()
+        runner = TaskRunner(root, cpu_initializer=init_analysis_worker, cpu_initargs=(self.db_path,))
+        args = ('revenue', 'day', None, None, {'min_weight': 1, 'top_k': 2, 'max_nodes': 10})
+        results = []
+        try:
+            runner.submit('analysis', compute_analysis, *args, kind='cpu', on_success=results.append)
+            root.run_pending(timeout=60.0)
+        finally:
+            runner.shutdown()
+        self.assertEqual(root.errors, [])
+        expected = compute_analysis(*args)
+        top, counts, edges = results[0]
+        self.assertEqual(top.to_dict('list'), expected[0].to_dict('list'))
+        self.assertEqual(counts.to_dict('list'), expected[1].to_dict('list'))
+        self.assertEqual(edges, expected[2])
+        self.assertEqual(edges, [('Анна', 'Иван', 1.0), ('Иван', 'Пётр', 2.0)])
+
+    def test_worker_settings(self):
+        """
+        Тестирует передачу профиля SQLite и настроек журнала медленных запросов в процесс пула аналитики.
+        """
+        root = FakeRoot()
+        settings = {'enabled': True, 'slow_query_ms': 5.0, 'explain_slow': True, 'track_callers': True,
+                    'slow_log_path': os.path.join(self.tmp_dir, 'slow.log')}
+        runner = TaskRunner(root, cpu_initializer=init_analysis_worker,
+                            cpu_initargs=(self.db_path, 'fast', settings))
+        results = []
+        try:
+            runner.submit('settings', worker_settings, kind='cpu', on_success=results.append)
+            root.run_pending(timeout=60.0)
+        finally:
+            runner.shutdown()
+        self.assertEqual(root.errors, [])
+        self.assertEqual(results, [(PRAGMA_PROFILES['fast'], settings)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,402 @@
+import random
+import unittest
+from collections import Counter
+
+from widgets import PageSeek, TreeviewBinding, VirtualTable, sequence_source, stable_positions
+
+
+class FakeTreeview:
+    """
+    Замена ttk.Treeview без вложенных элементов: хранит строки и считает вызовы методов.
+    """
+
+    def __init__(self, height=10):
+        self.children = []
+        self.values = {}
+        self.calls = Counter()
+        self.options = {'height': height}
+        self.idle = []
+        self.focused = ''
+
+    def cget(self, option):
+        return self.options[option]
+
+    def configure(self, **options):
+        self.options.update(options)
+
+    def bind(self, sequence, func, add=None):
+        pass
+
+    def after_idle(self, func):
+        self.idle.append(func)
+        return len(self.idle)
+
+    def run_idle(self):
+        while self.idle:
+            self.idle.pop(0)()
+
+    def yview(self, *args):
+        pass
+
+    def yview_moveto(self, fraction):
+        pass
+
+    def focus(self, iid=None):
+        if iid is None:
+            return self.focused
+        self.focused = iid
+
+    def selection_set(self, iid):
+        pass
+
+    def get_children(self):
+        return tuple(self.children)
+
+    def insert(self, parent, index, iid, values):
+        self.calls['insert'] += 1
+        assert iid not in self.values, f"Строка {iid} уже существует"
+        self.values[iid] = values
+        self._attach(iid, index)
+        return iid
+
+    def item(self, iid, values):
+        self.calls['item'] += 1
+        self.values[iid] = values
+
+    def move(self, iid, parent, index):
+        # Как и в Tk, строка сначала отсоединяется, затем вставляется на позицию index
+        self.calls['move'] += 1
+        if iid in self.children:
+            self.children.remove(iid)
+        self._attach(iid, index)
+
+    def detach(self, *iids):
+        self.calls['detach'] += 1
+        for iid in iids:
+            self.children.remove(iid)
+
+    def delete(self, *iids):
+        self.calls['delete'] += 1
+        for iid in iids:
+            if iid in self.children:
+                self.children.remove(iid)
+            del self.values[iid]
+
+    def _attach(self, iid, index):
+        if index == "end":
+            self.children.append(iid)
+        else:
+            self.children.insert(index, iid)
+
+    def rows(self):
+        return [self.values[iid] for iid in self.children]
+
+
+class FakeScrollbar:
+    """
+    Замена ttk.Scrollbar: хранит положение ползунка и обработчик прокрутки.
+    """
+
+    def __init__(self):
+        self.position = (0.0, 1.0)
+        self.options = {}
+
+    def set(self, first, last):
+        self.position = (float(first), float(last))
+
+    def configure(self, **options):
+        self.options.update(options)
+
+
+class FakeEvent:
+    """
+    Замена события Tkinter с кодом клавиши.
+    """
+
+    def __init__(self, keysym):
+        self.keysym = keysym
+
+
+class TestTreeviewBinding(unittest.TestCase):
+    """
+    Юнит-тесты для проверки обновления дерева по отличиям widgets.py.
+    """
+
+    def setUp(self):
+        """
+        Создаёт привязку к дереву с 1000 строками товаров.
+        """
+        self.treeview = FakeTreeview()
+        self.table = TreeviewBinding(self.treeview)
+        self.rows = [(i, f"Товар {i}", 10.0 * i, i % 7) for i in range(1, 1001)]
+        self.table.set_rows(self.rows)
+        self.treeview.calls.clear()
+
+    def test_minimal_changes(self):
+        """
+        Тестирует, что в дерево вносятся только отличия.
+
+        Проверяются следующие аспекты:
+        - Повторная загрузка тех же данных не изменяет дерево.
+        - Изменение одной строки затрагивает одну строку дерева.
+        - Добавление, удаление и перемещение строк выполняются без пересоздания остальных.
+        """
+        diff = self.table.set_rows(self.rows)
+        self.assertEqual((diff.inserted, diff.updated, diff.moved, diff.deleted), (0, 0, 0, 0))
+        self.assertEqual(sum(self.treeview.calls.values()), 0)
+
+        rows = list(self.rows)
+        rows[499] = (500, "Товар 500 (новый)", 1.0, 3)
+        diff = self.table.set_rows(rows)
+        self.assertEqual((diff.inserted, diff.updated, diff.moved, diff.deleted), (0, 1, 0, 0))
+        self.assertEqual(self.treeview.calls, Counter(item=1))
+        self.assertEqual(self.treeview.rows(), rows)
+
+        # Удаление первой строки, перенос последней в начало, новая строка в середине
+        rows = [rows[-1]] + rows[1:500] + [(2000, "Новый товар", 5.0, 1)] + rows[500:-1]
+        self.treeview.calls.clear()
+        diff = self.table.set_rows(rows)
+        self.assertEqual((diff.inserted, diff.updated, diff.moved, diff.deleted), (1, 0, 1, 1))
+        self.assertEqual(self.treeview.calls, Counter(delete=1, detach=1, move=1, insert=1))
+        self.assertEqual(self.treeview.rows(), rows)
+        self.assertEqual(list(self.treeview.get_children()), [str(row[0]) for row in rows])
+        self.assertEqual(len(self.table), len(rows))
+        self.assertIn(2000, self.table)
+
+        with self.assertRaises(ValueError):
+            self.table.set_rows([(1, "a"), (1, "b")])
+
+    def test_reorder_and_extend(self):
+        """
+        Тестирует произвольное переупорядочивание, подгрузку страниц и очистку.
+
+        Проверяется, что после каждого обновления порядок и значения строк дерева совпадают
+        с новыми данными, а количество перемещений минимально.
+        """
+        generator = random.Random(7)
+        rows = list(self.rows)
+        for _ in range(20):
+            generator.shuffle(rows)
+            rows = rows[:generator.randint(500, 1000)] + [(generator.randint(1, 3000), "x", 0.0, 0)]
+            rows = list({row[0]: row for row in rows}.values())
+            self.table.set_rows(rows)
+            self.assertEqual(self.treeview.rows(), rows)
+
+        # Обратный порядок: на месте остаётся одна строка
+        diff = self.table.set_rows(list(reversed(rows)))
+        self.assertEqual(diff.moved, len(rows) - 1)
+        self.assertEqual(self.treeview.rows(), list(reversed(rows)))
+
+        page = [(5000, "Страница", 1.0, 1), (rows[0][0], "Перенесён", 2.0, 2)]
+        diff = self.table.extend(page)
+        self.assertEqual((diff.inserted, diff.updated, diff.moved), (1, 1, 1))
+        self.assertEqual(self.treeview.rows()[-2:], page)
+
+        self.table.clear()
+        self.assertEqual((self.treeview.children, self.treeview.values, len(self.table)), ([], {}, 0))
+
+    def test_stable_positions(self):
+        """
+        Тестирует выбор строк, остающихся на месте.
+        """
+        self.assertEqual(stable_positions([]), set())
+        self.assertEqual(stable_positions([0, 1, 2]), {0, 1, 2})
+        self.assertEqual(stable_positions([2, 0, 1]), {1, 2})
+        self.assertEqual(len(stable_positions([3, 1, 4, 0, 5, 2, 6])), 4)
+
+
+class TestVirtualTable(unittest.TestCase):
+    """
+    Юнит-тесты для проверки виртуального вывода больших списков widgets.py.
+    """
+
+    def setUp(self):
+        """
+        Создаёт виртуальный список с порогом 50 строк и страницами по 20 строк.
+        """
+        self.treeview = FakeTreeview(height=10)
+        self.scrollbar = FakeScrollbar()
+        self.table = VirtualTable(self.treeview, self.scrollbar, page_size=20, max_pages=5, threshold=50)
+        self.requests = []
+
+    def source(self, count):
+        """
+        Возвращает источник из count строк, запоминающий запрошенные участки.
+        """
+        items = [(i, f"Строка {i}") for i in range(count)]
+        request = sequence_source(items, tuple)
+
+        def recorded(offset, limit, callback, failure, seek):
+            self.requests.append((offset, limit))
+            request(offset, limit, callback, failure, seek)
+        return recorded
+
+    def keyset_source(self, keys):
+        """
+        Возвращает источник строк с ключами keys, загружающий участки только по курсорам, без номеров строк.
+        """
+        def request(offset, limit, callback, failure, seek):
+            self.requests.append(seek)
+            if seek.until is not None:
+                end = max(0, keys.index(seek.until) + 1 - seek.skip)
+                start = max(0, end - limit)
+            else:
+                start = (keys.index(seek.after) + 1 if seek.after is not None else 0) + seek.skip
+                end = start + limit
+            callback([(key, f"Строка {key}") for key in keys[start:end]], keys[start:end])
+        return request
+
+    def test_small_list(self):
+        """
+        Тестирует вывод списка не длиннее порога целиком с прокруткой средствами дерева.
+        """
+        self.table.load(30, self.source(30))
+        self.assertFalse(self.table.virtual)
+        self.assertEqual(len(self.treeview.children), 30)
+        self.assertEqual(self.requests, [(0, 30)])
+        self.assertEqual(self.scrollbar.options['command'], self.treeview.yview)
+
+    def test_virtual_window(self):
+        """
+        Тестирует виртуальный вывод длинного списка.
+
+        Проверяются следующие аспекты:
+        - В дереве находятся только видимые строки, загружены только страницы рядом с ними.
+        - Полоса прокрутки отражает положение видимых строк в оценке длины списка.
+        - Прокрутка на одну строку изменяет две строки дерева.
+        - Кэш страниц ограничен, а завышенная оценка длины уточняется в конце списка.
+        """
+        self.table.load(100000, self.source(100000))
+        self.assertTrue(self.table.virtual)
+        self.assertEqual(self.treeview.rows(), [(i, f"Строка {i}") for i in range(10)])
+        self.assertEqual(self.requests, [(0, 40)])
+        self.assertEqual(self.scrollbar.options['command'], self.table.yview)
+        self.assertEqual(self.scrollbar.position, (0.0, 10 / 100000))
+
+        self.treeview.calls.clear()
+        self.table.yview('scroll', 1, 'units')
+        self.treeview.run_idle()
+        self.assertEqual([row[0] for row in self.treeview.rows()], list(range(1, 11)))
+        self.assertEqual(self.treeview.calls, Counter(delete=1, insert=1))
+
+        self.table.yview('moveto', 0.5)
+        self.treeview.run_idle()
+        self.assertEqual([row[0] for row in self.treeview.rows()], list(range(50000, 50010)))
+        self.assertEqual(self.requests[-1], (49980, 60))
+        for fraction in (0.1, 0.2, 0.3, 0.4):
+            self.table.yview('moveto', fraction)
+            self.treeview.run_idle()
+        self.assertLessEqual(len(self.table._pages), 5)
+        self.assertEqual(len(self.treeview.children), 10)
+
+        # Длина списка завышена: в списке 12345 строк
+        self.requests.clear()
+        self.table.load(12500, self.source(12345), keep_position=False)
+        self.assertEqual(self.treeview.rows()[0][0], 0)
+        self.table.yview('moveto', 1.0)
+        self.treeview.run_idle()
+        self.assertEqual(self.table.total, 12345)
+        self.assertEqual([row[0] for row in self.treeview.rows()], list(range(12335, 12345)))
+
+    def test_async_source_and_keys(self):
+        """
+        Тестирует загрузку участков в фоне и перемещение фокуса клавишами за пределы видимых строк.
+
+        Прежние строки остаются в дереве до загрузки, результат прежнего источника отбрасывается.
+        """
+        pending = []
+        request = self.source(1000)
+        self.table.load(1000, lambda *args: pending.append(args))
+        self.assertEqual(self.treeview.children, [])
+        stale = pending.pop()
+        self.table.load(1000, lambda *args: pending.append(args))
+        request(*stale)
+        self.assertEqual(self.treeview.children, [])
+        request(*pending.pop())
+        self.assertEqual([row[0] for row in self.treeview.rows()], list(range(10)))
+
+        self.treeview.focus(self.treeview.children[-1])
+        self.assertEqual(self.table.on_key(FakeEvent('Down')), "break")
+        self.treeview.run_idle()
+        self.assertEqual(self.table.offset, 1)
+        self.assertEqual(self.treeview.focus(), '10')
+        self.table.on_key(FakeEvent('Next'))
+        self.treeview.run_idle()
+        self.assertEqual(self.table.offset, 11)
+        self.assertEqual([row[0] for row in self.treeview.rows()], list(range(11, 21)))
+
+        self.table.yview('moveto', 0.5)
+        self.treeview.run_idle()
+        # Строки 500-509 ещё не загружены: в дереве остаются прежние строки
+        self.assertEqual([row[0] for row in self.treeview.rows()], list(range(11, 21)))
+        request(*pending.pop())
+        self.assertEqual([row[0] for row in self.treeview.rows()], list(range(500, 510)))
+
+    def test_failed_request(self):
+        """
+        Тестирует повторный запрос участка после ошибки загрузки.
+
+        Пока загрузка ожидается, участок не запрашивается повторно; после ошибки он запрашивается
+        снова при следующей прокрутке, а ошибка прежнего источника не влияет на новый.
+        """
+        pending = []
+        request = self.source(1000)
+        self.table.load(1000, lambda *args: pending.append(args))
+        self.table.scroll_to(5)
+        self.treeview.run_idle()
+        self.assertEqual(len(pending), 1)
+
+        offset, limit, callback, failure, seek = pending.pop()
+        failure(RuntimeError("база данных недоступна"))
+        self.assertEqual(self.treeview.children, [])
+        self.table.scroll_to(5)
+        self.treeview.run_idle()
+        self.assertEqual([args[:2] for args in pending], [(offset, limit)])
+
+        stale_failure = pending.pop()[3]
+        self.table.load(1000, lambda *args: pending.append(args))
+        stale_failure(RuntimeError("прежний источник"))
+        self.assertEqual(self.table._pending, (0, 1))
+        request(*pending.pop())
+        self.assertEqual([row[0] for row in self.treeview.rows()], list(range(5, 15)))
+
+    def test_keyset_source(self):
+        """
+        Тестирует загрузку участков от ближайшей известной страницы по курсорам.
+
+        Проверяются следующие аспекты:
+        - Последовательная прокрутка продолжает список от курсора последней загруженной страницы.
+        - Переход к произвольному месту пропускает строки только от ближайшей известной страницы,
+          причём страницы перед известной читаются назад от её курсора.
+        - Если перед известной страницей строки удалены, страницы загружаются заново.
+        """
+        keys = list(range(0, 20000, 2))
+        self.table.load(len(keys), self.keyset_source(keys))
+        self.assertEqual(self.requests, [PageSeek()])
+        self.table.scroll_to(35)
+        self.treeview.run_idle()
+        self.assertEqual(self.requests[-1], PageSeek(after=keys[39]))
+        self.assertEqual([row[0] for row in self.treeview.rows()], keys[35:45])
+
+        self.table.scroll_to(5000)
+        self.treeview.run_idle()
+        self.assertEqual(self.requests[-1], PageSeek(after=keys[79], skip=4900))
+        self.assertEqual([row[0] for row in self.treeview.rows()], keys[5000:5010])
+
+        self.table.scroll_to(4900)
+        self.treeview.run_idle()
+        self.assertEqual(self.requests[-1], PageSeek(until=keys[4999], skip=60))
+        self.assertEqual([row[0] for row in self.treeview.rows()], keys[4900:4910])
+
+        # Строки перед известной страницей удалены: курсоры больше не соответствуют номерам страниц
+        self.requests.clear()
+        cursor = keys[4899]
+        del keys[:4850]
+        self.table.scroll_to(4800)
+        self.treeview.run_idle()
+        self.assertEqual(self.requests, [PageSeek(until=cursor, skip=60), PageSeek(skip=4780)])
+        self.assertEqual([row[0] for row in self.treeview.rows()], keys[4800:4810])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,591 @@
+"""
+Вспомогательные компоненты графического интерфейса.
+
+TreeviewBinding связывает ttk.Treeview со списком строк: строки хранятся в дереве под
+идентификатором сущности (iid), а при обновлении в дерево вносятся только отличия от
+нового списка — вставки, изменения, перемещения и удаления. Выделение и положение прокрутки
+при этом сохраняются, а изменение одной записи в большом списке затрагивает одну строку дерева.
+
+VirtualTable выводит большие списки виртуально: в дереве находятся только видимые строки,
+участки списка загружаются по мере прокрутки и хранятся в ограниченном кэше страниц,
+а размер полосы прокрутки определяется оценкой числа строк. Участок загружается от ближайшей
+известной строки списка по её ключу (keyset), поэтому прокрутка не зависит от того, насколько
+далеко от начала списка находятся видимые строки. Память и время отрисовки при этом
+не зависят от размера списка.
+"""
+
+from bisect import bisect_left
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import partial
+
+# Количество строк, начиная с которого список выводится виртуально
+VIRTUAL_THRESHOLD = 2000
+
+
+def first_column(values):
+    """
+    Возвращает ключ строки по умолчанию — значение первого столбца (ID).
+    """
+    return values[0]
+
+
+def stable_positions(positions):
+    """
+    Находит строки, которые можно оставить на месте при переупорядочивании.
+
+    Это наибольшая возрастающая подпоследовательность прежних позиций строк, взятых в новом
+    порядке: её элементы уже стоят в нужном порядке друг относительно друга, поэтому
+    перемещать достаточно все остальные строки.
+
+    Parameters
+    ----------
+    positions : list
+        Прежние позиции строк (различные целые числа) в новом порядке.
+
+    Returns
+    -------
+    set
+        Индексы элементов positions, которые не нужно перемещать.
+    """
+    tails = []  # Последние позиции возрастающих подпоследовательностей каждой длины
+    tail_indices = []  # Индексы этих позиций в positions
+    previous = [-1] * len(positions)
+    for i, position in enumerate(positions):
+        length = bisect_left(tails, position)
+        if length == len(tails):
+            tails.append(position)
+            tail_indices.append(i)
+        else:
+            tails[length] = position
+            tail_indices[length] = i
+        previous[i] = tail_indices[length - 1] if length > 0 else -1
+
+    stable = set()
+    i = tail_indices[-1] if tail_indices else -1
+    while i >= 0:
+        stable.add(i)
+        i = previous[i]
+    return stable
+
+
+@dataclass
+class TreeviewDiff:
+    """
+    Количество изменений, внесённых в дерево при обновлении.
+
+    Attributes
+    ----------
+    inserted : int
+        Количество добавленных строк.
+    updated : int
+        Количество строк с изменёнными значениями.
+    moved : int
+        Количество перемещённых строк.
+    deleted : int
+        Количество удалённых строк.
+    """
+    inserted: int = 0
+    updated: int = 0
+    moved: int = 0
+    deleted: int = 0
+
+
+@dataclass
+class PageSeek:
+    """
+    Положение загружаемого участка относительно известной строки списка.
+
+    Attributes
+    ----------
+    after : object, optional
+        Курсор строки, после которой начинается участок. None — участок отсчитывается от начала списка.
+    until : object, optional
+        Курсор строки, которой заканчивается участок; участок читается назад от неё.
+    skip : int
+        Количество строк между курсором (или началом списка) и участком.
+    """
+    after: object = None
+    until: object = None
+    skip: int = 0
+
+
+class TreeviewBinding:
+    """
+    Список строк ttk.Treeview, обновляемый по отличиям от новых данных.
+
+    Attributes
+    ----------
+    treeview : ttk.Treeview
+        Дерево, в которое выводятся строки (без вложенных элементов).
+    key : callable
+        Функция, возвращающая по значениям строки идентификатор сущности.
+    """
+
+    def __init__(self, treeview, key=first_column):
+        self.treeview = treeview
+        self.key = key
+        self._order = []  # iid строк в порядке вывода
+        self._values = {}  # iid -> значения строки
+
+    def __len__(self):
+        return len(self._order)
+
+    def __contains__(self, key):
+        return str(key) in self._values
+
+    def set_rows(self, rows):
+        """
+        Приводит дерево к новому списку строк, внося только отличия.
+
+        Parameters
+        ----------
+        rows : iterable
+            Значения строк (кортежи) в порядке вывода; ключи строк должны быть уникальны.
+
+        Returns
+        -------
+        TreeviewDiff
+            Количество внесённых изменений.
+
+        Raises
+        ------
+        ValueError
+            Если ключи строк повторяются.
+        """
+        rows = [(str(self.key(values)), tuple(values)) for values in rows]
+        new_iids = [iid for iid, _ in rows]
+        if len(set(new_iids)) != len(new_iids):
+            raise ValueError("Ключи строк должны быть уникальны")
+        diff = TreeviewDiff()
+
+        new_set = set(new_iids)
+        deleted = [iid for iid in self._order if iid not in new_set]
+        if deleted:
+            self.treeview.delete(*deleted)
+            for iid in deleted:
+                del self._values[iid]
+            diff.deleted = len(deleted)
+        positions = {iid: position for position, iid in enumerate(iid for iid in self._order if iid in new_set)}
+
+        # Оставшиеся на месте строки сохраняют взаимный порядок, остальные временно отсоединяются,
+        # после чего каждая строка с индексом i в новом порядке вставляется ровно на позицию i
+        kept = [iid for iid in new_iids if iid in positions]
+        stable = stable_positions([positions[iid] for iid in kept])
+        moved = {iid for i, iid in enumerate(kept) if i not in stable}
+        if moved:
+            self.treeview.detach(*moved)
+            diff.moved = len(moved)
+
+        for index, (iid, values) in enumerate(rows):
+            old_values = self._values.get(iid)
+            if old_values is None:
+                self.treeview.insert("", index, iid=iid, values=values)
+                diff.inserted += 1
+                continue
+            if iid in moved:
+                self.treeview.move(iid, "", index)
+            if old_values != values:
+                self.treeview.item(iid, values=values)
+                diff.updated += 1
+
+        self._order = new_iids
+        self._values = dict(rows)
+        return diff
+
+    def extend(self, rows):
+        """
+        Добавляет строки в конец дерева (следующая страница списка).
+
+        Строки с уже выведенными ключами переносятся в конец и обновляются.
+
+        Parameters
+        ----------
+        rows : iterable
+            Значения добавляемых строк.
+
+        Returns
+        -------
+        TreeviewDiff
+            Количество внесённых изменений.
+        """
+        diff = TreeviewDiff()
+        for values in rows:
+            iid, values = str(self.key(values)), tuple(values)
+            old_values = self._values.get(iid)
+            if old_values is None:
+                self.treeview.insert("", "end", iid=iid, values=values)
+                diff.inserted += 1
+            else:
+                self._order.remove(iid)
+                self.treeview.move(iid, "", "end")
+                diff.moved += 1
+                if old_values != values:
+                    self.treeview.item(iid, values=values)
+                    diff.updated += 1
+            self._order.append(iid)
+            self._values[iid] = values
+        return diff
+
+    def clear(self):
+        """
+        Удаляет все строки из дерева.
+        """
+        if self._order:
+            self.treeview.delete(*self._order)
+        self._order = []
+        self._values = {}
+
+
+def sequence_source(items, to_values):
+    """
+    Создаёт источник строк виртуального списка для списка, уже находящегося в памяти.
+
+    Parameters
+    ----------
+    items : sequence
+        Элементы списка (например, объекты Customer).
+    to_values : callable
+        Функция, возвращающая значения строки дерева для элемента.
+
+    Returns
+    -------
+    callable
+        Функция request(offset, limit, callback, failure, seek), передающая callback значения
+        строк участка. Список в памяти доступен по номеру строки, поэтому seek не используется.
+    """
+    def request(offset, limit, callback, failure, seek=None):
+        callback([to_values(item) for item in items[offset:offset + limit]])
+    return request
+
+
+class VirtualTable:
+    """
+    Список строк ttk.Treeview с виртуальным выводом больших списков.
+
+    Строки загружаются функцией request(offset, limit, callback, failure, seek), которая передаёт
+    callback значения строк участка списка — сразу или позже (например, из фоновой задачи), а при
+    ошибке загрузки вызывает failure с исключением. Источник, загружающий строки по ключу (keyset),
+    передаёт callback вторым аргументом курсоры строк: список хранит курсор последней строки каждой
+    загруженной страницы и описывает в seek положение участка относительно ближайшей известной
+    страницы, так что последовательная прокрутка не пропускает ни одной строки, а переход
+    к произвольному месту пропускает только строки до ближайшей известной страницы.
+    Список не длиннее порога выводится в дерево целиком и прокручивается средствами дерева.
+    Для более длинного списка в дереве находятся только видимые строки: полоса прокрутки
+    управляется самим списком, участки загружаются страницами с запасом в одну страницу
+    до и после видимых строк, а загруженные страницы хранятся в кэше ограниченного размера.
+    В обоих режимах строки обновляются через TreeviewBinding, поэтому прокрутка на одну
+    строку изменяет в дереве две строки.
+
+    Attributes
+    ----------
+    treeview : ttk.Treeview
+        Дерево, в которое выводятся строки.
+    scrollbar : ttk.Scrollbar
+        Вертикальная полоса прокрутки дерева.
+    binding : TreeviewBinding
+        Строки, находящиеся в дереве.
+    page_size : int
+        Количество строк, загружаемых за один раз.
+    max_pages : int
+        Максимальное количество страниц в кэше.
+    max_cursors : int
+        Максимальное количество хранимых курсоров страниц.
+    threshold : int
+        Количество строк, начиная с которого список выводится виртуально.
+    total : int
+        Оценка количества строк списка; уточняется, когда загрузка доходит до конца списка.
+    offset : int
+        Номер первой видимой строки (в виртуальном режиме).
+    visible : int
+        Количество видимых строк дерева.
+    virtual : bool
+        Признак виртуального вывода.
+    """
+
+    def __init__(self, treeview, scrollbar, key=first_column, page_size=100, max_pages=50, max_cursors=1000,
+                 threshold=VIRTUAL_THRESHOLD):
+        self.treeview = treeview
+        self.scrollbar = scrollbar
+        self.binding = TreeviewBinding(treeview, key)
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.max_cursors = max_cursors
+        self.threshold = threshold
+        self.total = 0
+        self.offset = 0
+        self.visible = max(1, int(treeview.cget('height')))
+        self.virtual = False
+        self._request = None
+        self._generation = 0  # Номер источника строк; результаты прежних источников отбрасываются
+        self._pages = OrderedDict()  # Номер страницы -> значения строк
+        self._cursors = OrderedDict()  # Номер полной страницы -> курсор её последней строки
+        self._pending = None  # Диапазон страниц, загрузка которого ожидается
+        self._requesting = False
+        self._render_id = None
+        self._focus_index = None  # Номер строки, на которую переходит фокус после отрисовки
+        treeview.bind('<Configure>', self.on_resize, add='+')
+        for sequence in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+            treeview.bind(sequence, self.on_wheel, add='+')
+        for sequence in ('<Prior>', '<Next>', '<Up>', '<Down>'):
+            treeview.bind(sequence, self.on_key, add='+')
+        self._configure_scrolling()
+
+    def __len__(self):
+        return self.total
+
+    def load(self, total, request, keep_position=True):
+        """
+        Задаёт новый источник строк и выводит список.
+
+        Parameters
+        ----------
+        total : int
+            Количество строк списка или его оценка сверху.
+        request : callable
+            Функция request(offset, limit, callback, failure, seek), загружающая участок списка.
+        keep_position : bool, optional
+            Сохранить положение прокрутки (при обновлении тех же данных). False — вывести
+            список с начала (при новом поиске или смене сортировки).
+        """
+        self._generation += 1
+        self._request = request
+        self._pages.clear()
+        self._cursors.clear()
+        self._pending = None
+        self._focus_index = None
+        self.total = max(0, total)
+        if not keep_position:
+            self.offset = 0
+        virtual = self.total > self.threshold
+        if virtual != self.virtual:
+            self.virtual = virtual
+            self._configure_scrolling()
+        if self.virtual:
+            self._render()
+        else:
+            request(0, self.total, partial(self._show_all, self._generation, keep_position),
+                    partial(self._request_failed, self._generation), PageSeek())
+
+    def scroll_to(self, offset):
+        """
+        Прокручивает виртуальный список к строке с указанным номером.
+
+        Parameters
+        ----------
+        offset : int
+            Номер строки, которая должна стать первой видимой.
+        """
+        self.offset = self._clamp(offset)
+        self._update_scrollbar()
+        if self._render_id is None:
+            self._render_id = self.treeview.after_idle(self._render)
+
+    def yview(self, *args):
+        """
+        Обработчик полосы прокрутки в виртуальном режиме (аналог Treeview.yview).
+        """
+        if args[0] == 'moveto':
+            self.scroll_to(int(float(args[1]) * self.total))
+        elif args[0] == 'scroll':
+            step = self.visible if args[2] == 'pages' else 1
+            self.scroll_to(self.offset + int(args[1]) * step)
+
+    def on_wheel(self, event):
+        """
+        Прокручивает виртуальный список колесом мыши.
+        """
+        if not self.virtual:
+            return None
+        if event.num == 4 or getattr(event, 'delta', 0) > 0:
+            self.scroll_to(self.offset - 3)
+        else:
+            self.scroll_to(self.offset + 3)
+        return "break"
+
+    def on_key(self, event):
+        """
+        Прокручивает виртуальный список клавишами, когда фокус уходит за пределы видимых строк.
+        """
+        if not self.virtual:
+            return None
+        if event.keysym in ('Prior', 'Next'):
+            self.scroll_to(self.offset + (self.visible if event.keysym == 'Next' else -self.visible))
+            return "break"
+        children = self.treeview.get_children()
+        focus = self.treeview.focus()
+        if not children or focus not in (children[0], children[-1]):
+            return None
+        index = self.offset + children.index(focus) + (1 if event.keysym == 'Down' else -1)
+        if focus == children[-1] and event.keysym == 'Down' and index < self.total:
+            self._focus_index = index
+            self.scroll_to(self.offset + 1)
+            return "break"
+        if focus == children[0] and event.keysym == 'Up' and index >= 0:
+            self._focus_index = index
+            self.scroll_to(self.offset - 1)
+            return "break"
+        return None
+
+    def on_resize(self, event):
+        """
+        Пересчитывает количество видимых строк при изменении размера дерева.
+        """
+        children = self.treeview.get_children()
+        bbox = self.treeview.bbox(children[0]) if children else ''
+        if not bbox:
+            return
+        top, row_height = bbox[1], bbox[3]
+        visible = max(1, (event.height - top) // max(1, row_height))
+        if visible != self.visible:
+            self.visible = visible
+            if self.virtual:
+                self.scroll_to(self.offset)
+
+    def _configure_scrolling(self):
+        """
+        Подключает полосу прокрутки к дереву или к виртуальному списку.
+        """
+        if self.virtual:
+            self.treeview.configure(yscrollcommand='')
+            self.scrollbar.configure(command=self.yview)
+            self._update_scrollbar()
+        else:
+            self.treeview.configure(yscrollcommand=self.scrollbar.set)
+            self.scrollbar.configure(command=self.treeview.yview)
+
+    def _show_all(self, generation, keep_position, rows, cursors=None):
+        """
+        Выводит в дерево весь список (список не длиннее порога).
+        """
+        if generation != self._generation:
+            return
+        self.total = len(rows)
+        self.binding.set_rows(rows)
+        if not keep_position:
+            self.treeview.yview_moveto(0)
+
+    def _clamp(self, offset):
+        """
+        Ограничивает номер первой видимой строки размером списка.
+        """
+        return max(0, min(offset, self.total - self.visible))
+
+    def _update_scrollbar(self):
+        """
+        Устанавливает размер и положение ползунка по оценке количества строк.
+        """
+        if self.total <= 0:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self.offset / self.total, min(1.0, (self.offset + self.visible) / self.total))
+
+    def _render(self):
+        """
+        Выводит видимые строки, если их страницы загружены, и запрашивает недостающие страницы.
+        """
+        self._render_id = None
+        if not self.virtual:
+            return
+        total = None
+        while total != self.total:
+            # Загрузка могла уточнить длину списка: положение и недостающие страницы пересчитываются
+            total = self.total
+            self.offset = self._clamp(self.offset)
+            self._update_scrollbar()
+            page_count = -(-self.total // self.page_size)
+            first = max(0, (self.offset - self.page_size) // self.page_size)
+            last = min(page_count - 1, (self.offset + self.visible + self.page_size - 1) // self.page_size)
+            missing = [page for page in range(first, last + 1) if page not in self._pages]
+            if missing and self._pending != (missing[0], missing[-1]):
+                self._pending = (missing[0], missing[-1])
+                limit = (missing[-1] - missing[0] + 1) * self.page_size
+                seek = self._seek(missing[0], missing[-1])
+                self._requesting = True
+                try:
+                    self._request(missing[0] * self.page_size, limit,
+                                  partial(self._store_pages, self._generation, missing[0], limit, seek),
+                                  partial(self._request_failed, self._generation), seek)
+                finally:
+                    self._requesting = False
+
+        rows = self._window_rows()
+        if rows is None:
+            return  # Прежние строки остаются в дереве до загрузки страниц
+        self.binding.set_rows(rows)
+        self.treeview.yview_moveto(0)
+        if self._focus_index is not None and self.offset <= self._focus_index < self.offset + len(rows):
+            iid = self.treeview.get_children()[self._focus_index - self.offset]
+            self.treeview.focus(iid)
+            self.treeview.selection_set(iid)
+            self._focus_index = None
+
+    def _window_rows(self):
+        """
+        Возвращает значения видимых строк или None, если не все их страницы загружены.
+        """
+        end = min(self.total, self.offset + self.visible)
+        rows = []
+        for page in range(self.offset // self.page_size, (end - 1) // self.page_size + 1 if end else 0):
+            if page not in self._pages:
+                return None
+            self._pages.move_to_end(page)
+            start = page * self.page_size
+            rows.extend(self._pages[page][max(0, self.offset - start):end - start])
+        return rows
+
+    def _seek(self, first_page, last_page):
+        """
+        Описывает положение страниц first_page..last_page относительно ближайшей известной страницы.
+
+        Курсоры хранятся только для полных страниц, поэтому все страницы до известной тоже полные
+        и количество пропускаемых строк определяется разностью номеров страниц.
+        """
+        seek, distance = PageSeek(skip=first_page * self.page_size), first_page
+        for page, cursor in self._cursors.items():
+            if page < first_page and first_page - page - 1 < distance:
+                distance = first_page - page - 1
+                seek = PageSeek(after=cursor, skip=distance * self.page_size)
+            elif page >= last_page and page - last_page < distance:
+                distance = page - last_page
+                seek = PageSeek(until=cursor, skip=distance * self.page_size)
+        return seek
+
+    def _store_pages(self, generation, first_page, limit, seek, rows, cursors=None):
+        """
+        Сохраняет загруженный участок списка по страницам и выводит видимые строки.
+        """
+        if generation != self._generation:
+            return
+        self._pending = None
+        if seek.until is not None and len(rows) < limit:
+            # Перед известной страницей оказалось меньше строк, чем ожидалось (строки удалены):
+            # положение страниц больше не соответствует их номерам, загрузка начинается заново
+            self._pages.clear()
+            self._cursors.clear()
+            self.scroll_to(self.offset)
+            return
+        for i in range(0, len(rows), self.page_size):
+            page = first_page + i // self.page_size
+            self._pages[page] = rows[i:i + self.page_size]
+            self._pages.move_to_end(page)
+            if cursors is not None and len(self._pages[page]) == self.page_size:
+                self._cursors[page] = cursors[i + self.page_size - 1]
+                self._cursors.move_to_end(page)
+        while len(self._cursors) > self.max_cursors:
+            self._cursors.popitem(last=False)
+        if len(rows) < limit:
+            # Список закончился раньше, чем ожидалось (например, строки удалены после подсчёта):
+            # длина уточняется, а если участок пуст, конец списка ищется на следующей отрисовке
+            self.total = min(self.total, first_page * self.page_size + len(rows))
+        while len(self._pages) > self.max_pages:
+            self._pages.popitem(last=False)
+        if not self._requesting:
+            self._render()
+
+    def _request_failed(self, generation, error):
+        """
+        Обрабатывает ошибку загрузки участка: участок будет запрошен снова при следующей отрисовке.
+        """
+        if generation == self._generation:
+            self._pending = None